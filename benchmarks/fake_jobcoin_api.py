@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+"""A local stand-in for the Jobcoin API, for benchmarks.
+
+Implements GET /addresses/<address>, GET /transactions and POST /transactions
+with configurable latency, error rate and history depth.
+"""
+
+import datetime
+import json
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from urllib.parse import parse_qs
+
+import click
+
+HISTORY_START = datetime.datetime(2020, 1, 1)
+
+
+class FakeJobcoinLedger:
+    def __init__(self, latency=0.0, error_rate=0.0, history_depth=0) -> None:
+        self.latency = latency
+        self.error_rate = error_rate
+        self.history_depth = history_depth
+        self.lock = threading.Lock()
+        self.balances = defaultdict(Decimal)
+        self.transactions = []
+        self.address_transactions = defaultdict(list)
+        self.request_counts = defaultdict(int)
+
+    def seed_history(self, address):
+        """Give address history_depth old transactions and return the last one.
+
+        Callers treat the seeded history as already processed.
+        """
+        transaction = None
+        for i in range(self.history_depth):
+            timestamp = HISTORY_START + datetime.timedelta(seconds=i)
+            if i % 2:
+                transaction = self._record(address, "old", "1", timestamp)
+            else:
+                transaction = self._record("old", address, "1", timestamp)
+        return transaction
+
+    def create_coins(self, address, amount):
+        with self.lock:
+            self.balances[address] += Decimal(amount)
+            self._record(None, address, amount)
+
+    def send(self, from_address, to_address, amount):
+        with self.lock:
+            if self.balances[from_address] < Decimal(amount):
+                return False
+            self.balances[from_address] -= Decimal(amount)
+            self.balances[to_address] += Decimal(amount)
+            self._record(from_address, to_address, amount)
+            return True
+
+    def reset_request_counts(self):
+        with self.lock:
+            counts = dict(self.request_counts)
+            self.request_counts.clear()
+        return counts
+
+    def _record(self, from_address, to_address, amount, timestamp=None):
+        if timestamp is None:
+            timestamp = datetime.datetime.utcnow()
+        transaction = {
+            "timestamp": timestamp.strftime("%Y-%m-%dT%H:%M:%S.")
+            + f"{timestamp.microsecond // 1000:03d}Z",
+            "toAddress": to_address,
+            "amount": str(amount),
+        }
+        if from_address is not None:
+            transaction["fromAddress"] = from_address
+            self.address_transactions[from_address].append(transaction)
+        self.address_transactions[to_address].append(transaction)
+        self.transactions.append(transaction)
+        return transaction
+
+
+class FakeJobcoinRequestHandler(BaseHTTPRequestHandler):
+    ledger = None
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if not self._begin("GET"):
+            return
+        if self.path.startswith("/addresses/"):
+            address = self.path[len("/addresses/") :]
+            with self.ledger.lock:
+                body = {
+                    "balance": str(self.ledger.balances[address]),
+                    "transactions": list(self.ledger.address_transactions[address]),
+                }
+            self._send_json(200, body)
+        elif self.path == "/transactions":
+            with self.ledger.lock:
+                body = list(self.ledger.transactions)
+            self._send_json(200, body)
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if not self._begin("POST"):
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        form = {
+            key: values[0]
+            for key, values in parse_qs(self.rfile.read(length).decode()).items()
+        }
+        if self.path != "/transactions":
+            self._send_json(404, {"error": "Not found"})
+        elif self.ledger.send(form["fromAddress"], form["toAddress"], form["amount"]):
+            self._send_json(200, {"status": "OK"})
+        else:
+            self._send_json(422, {"error": "Insufficient Funds"})
+
+    def log_message(self, format, *args):
+        pass
+
+    def _begin(self, method):
+        endpoint = self.path.split("/")[1]
+        with self.ledger.lock:
+            self.ledger.request_counts[f"{method} /{endpoint}"] += 1
+        if self.ledger.latency:
+            time.sleep(self.ledger.latency)
+        if random.random() < self.ledger.error_rate:
+            if method == "POST":
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self._send_json(500, {"error": "Injected error"})
+            return False
+        return True
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def create_fake_jobcoin_api(ledger, host="127.0.0.1", port=0):
+    handler = type(
+        "BoundFakeJobcoinRequestHandler",
+        (FakeJobcoinRequestHandler,),
+        {"ledger": ledger},
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_fake_jobcoin_api(ledger, host="127.0.0.1", port=0):
+    """Serve ledger in a background thread and return (server, base_url)."""
+    server = create_fake_jobcoin_api(ledger, host, port)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=8091, show_default=True)
+@click.option("--latency", default=0.0, show_default=True, help="Seconds per request.")
+@click.option("--error-rate", default=0.0, show_default=True)
+def main(host, port, latency, error_rate):
+    ledger = FakeJobcoinLedger(latency=latency, error_rate=error_rate)
+    server = create_fake_jobcoin_api(ledger, host, port)
+    click.echo(f"Fake Jobcoin API listening on http://{host}:{port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
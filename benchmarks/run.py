@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+"""Measure how the mixer's periodic tasks scale against a local fake API.
+
+Usage: python -m benchmarks.run [--scenario 100] [--mode feed] ...
+"""
+
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+import click
+
+from benchmarks.fake_jobcoin_api import FakeJobcoinLedger, start_fake_jobcoin_api
+from jobcoin.api_client import ApiClient
+from jobcoin.constants import (
+    DEPOSIT_DETECTION_MODE_ADDRESS,
+    DEPOSIT_DETECTION_MODE_FEED,
+    GET_NEW_DEPOSITS_CONCURRENCY,
+)
+from jobcoin.jobcoin_mixer import JobCoinMixer
+from jobcoin.planner import PayoutPlanner
+from jobcoin.transactions import Transaction
+
+SCENARIOS = {"100": 100, "10k": 10000, "100k": 100000}
+WITHDRAWAL_ADDRESSES_PER_ACCOUNT = 3
+DEPOSIT_AMOUNT = "10"
+
+
+def run_scenario(
+    num_addresses, mode, deposit_ratio, latency, error_rate, history_depth, concurrency
+):
+    ledger = FakeJobcoinLedger(
+        latency=latency, error_rate=error_rate, history_depth=history_depth
+    )
+    server, url = start_fake_jobcoin_api(ledger)
+    client = ApiClient(base_url=url, pool_size=concurrency, rate_limit=None)
+    # One cycle pays every funded account: the transfer cap is not measured.
+    mixer = JobCoinMixer(
+        client=client,
+        polling_concurrency=concurrency,
+        payout_planner=PayoutPlanner(max_transfers_per_sec=num_addresses),
+    )
+
+    tracemalloc.start()
+    deposit_addresses = mixer.get_new_deposit_addresses(
+        [
+            [f"withdrawal_{i}_{j}" for j in range(WITHDRAWAL_ADDRESSES_PER_ACCOUNT)]
+            for i in range(num_addresses)
+        ]
+    )
+    account_memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Seeded history counts as already processed, as it would be for
+    # long-lived accounts.
+    for deposit_address in deposit_addresses:
+        last_transaction = ledger.seed_history(deposit_address)
+        if last_transaction is not None:
+            _set_cursor(mixer, deposit_address, last_transaction)
+    if ledger.transactions:
+        mixer.last_seen_feed_transaction = Transaction.from_json(
+            ledger.transactions[-1]
+        )
+
+    for deposit_address in random.sample(
+        deposit_addresses, int(num_addresses * deposit_ratio)
+    ):
+        ledger.create_coins(deposit_address, DEPOSIT_AMOUNT)
+
+    transfer_latencies = []
+    send_jobcoins = client.send_jobcoins
+
+    def timed_send_jobcoins(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return send_jobcoins(*args, **kwargs)
+        finally:
+            transfer_latencies.append(time.perf_counter() - start)
+
+    client.send_jobcoins = timed_send_jobcoins
+
+    ledger.reset_request_counts()
+    start = time.perf_counter()
+    if mode == DEPOSIT_DETECTION_MODE_FEED:
+        mixer.get_new_deposits_from_feed()
+    else:
+        mixer.get_new_deposits()
+    get_new_deposits_sec = time.perf_counter() - start
+    get_new_deposits_requests = sum(ledger.reset_request_counts().values())
+
+    start = time.perf_counter()
+    mixer.distribute_deposits(now=time.monotonic())
+    distribute_deposits_sec = time.perf_counter() - start
+    distribute_deposits_requests = sum(ledger.reset_request_counts().values())
+
+    server.shutdown()
+    server.server_close()
+    return {
+        "get_new_deposits_sec": get_new_deposits_sec,
+        "get_new_deposits_requests": get_new_deposits_requests,
+        "distribute_deposits_sec": distribute_deposits_sec,
+        "distribute_deposits_requests": distribute_deposits_requests,
+        "transfer_p50_ms": _percentile(transfer_latencies, 50) * 1000,
+        "transfer_p99_ms": _percentile(transfer_latencies, 99) * 1000,
+        "account_bytes": account_memory / num_addresses,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def _set_cursor(mixer, deposit_address, transaction):
+    decoded = Transaction.from_json(transaction)
+    account = mixer.deposit_address_store[deposit_address]
+    account.last_transaction_timestamp = decoded.timestamp
+    account.last_transaction_key = decoded.key
+
+
+def _percentile(values, percentile):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, len(values) * percentile // 100)]
+
+
+@click.command()
+@click.option(
+    "--scenario",
+    "scenarios",
+    multiple=True,
+    type=click.Choice(list(SCENARIOS)),
+    help="Number of deposit addresses. Runs every scenario if omitted.",
+)
+@click.option(
+    "--mode",
+    "modes",
+    multiple=True,
+    type=click.Choice([DEPOSIT_DETECTION_MODE_ADDRESS, DEPOSIT_DETECTION_MODE_FEED]),
+    help="Deposit detection mode. Runs both if omitted.",
+)
+@click.option("--deposit-ratio", default=0.1, show_default=True)
+@click.option("--latency", default=0.0, show_default=True, help="Seconds per request.")
+@click.option("--error-rate", default=0.0, show_default=True)
+@click.option("--history-depth", default=10, show_default=True)
+@click.option("--concurrency", default=GET_NEW_DEPOSITS_CONCURRENCY, show_default=True)
+def main(
+    scenarios, modes, deposit_ratio, latency, error_rate, history_depth, concurrency
+):
+    header = (
+        f"{'scenario':>8} {'mode':>7} {'poll s':>8} {'poll req':>8} "
+        f"{'dist s':>8} {'dist req':>8} {'p50 ms':>7} {'p99 ms':>7} "
+        f"{'B/acct':>7} {'rss MB':>7}"
+    )
+    click.echo(header)
+    for scenario in scenarios or SCENARIOS:
+        for mode in modes or [
+            DEPOSIT_DETECTION_MODE_ADDRESS,
+            DEPOSIT_DETECTION_MODE_FEED,
+        ]:
+            result = run_scenario(
+                SCENARIOS[scenario],
+                mode,
+                deposit_ratio,
+                latency,
+                error_rate,
+                history_depth,
+                concurrency,
+            )
+            click.echo(
+                f"{scenario:>8} {mode:>7} "
+                f"{result['get_new_deposits_sec']:>8.2f} "
+                f"{result['get_new_deposits_requests']:>8} "
+                f"{result['distribute_deposits_sec']:>8.2f} "
+                f"{result['distribute_deposits_requests']:>8} "
+                f"{result['transfer_p50_ms']:>7.2f} "
+                f"{result['transfer_p99_ms']:>7.2f} "
+                f"{result['account_bytes']:>7.0f} "
+                f"{result['max_rss_mb']:>7.1f}"
+            )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
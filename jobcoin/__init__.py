@@ -1,8 +1,3 @@
-import logging
+from jobcoin.logs import configure_logging
 
-logging.basicConfig(
-    filename="/tmp/jobcoin-mixer",
-    level=logging.INFO,
-    format="%(asctime)s %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
+configure_logging()
@@ -1,12 +1,46 @@
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional
 
-from jobcoin.constants import FIRST_WITHDRAWAL_ADDRESS_INDEX, WITHDRAWAL_INCREMENT
+from jobcoin.amounts import to_units
+from jobcoin.constants import (
+    ACCOUNT_STATE_ACTIVE,
+    FIRST_WITHDRAWAL_ADDRESS_INDEX,
+    WITHDRAWAL_INCREMENT,
+)
 
 
-@dataclass
+@dataclass(slots=True)
 class Account:
+    """The state of one deposit address.
+
+    Amounts are integer fixed-point units (see jobcoin.amounts), so credits
+    and payouts never drift. Accounts have __slots__ rather than a __dict__,
+    as a store holds one per live deposit address.
+    """
+
     withdrawal_addresses: List[str]
-    total_amount: float = 0
-    withdrawal_amount: int = WITHDRAWAL_INCREMENT
+    total_amount: int = 0
+    withdrawal_amount: int = to_units(WITHDRAWAL_INCREMENT)
     withdrawal_addresses_index: int = FIRST_WITHDRAWAL_ADDRESS_INDEX
+    distributed_amount: int = 0
+    last_transaction_timestamp: Optional[int] = None
+    last_transaction_key: Optional[str] = None
+    # Sweeps to the house address are numbered per account. A sweep is
+    # credited at most once: when its number exceeds credited_sweep_sequence.
+    sweep_sequence: int = 0
+    credited_sweep_sequence: int = 0
+    # Lifecycle state and the wall-clock time it was entered, if known.
+    state: str = ACCOUNT_STATE_ACTIVE
+    state_since: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, fields):
+        """Build an account from asdict() output, as stored.
+
+        Accounts stored before amounts were kept in units have them as
+        floats of whole Jobcoins, which are converted.
+        """
+        for name in ("total_amount", "withdrawal_amount", "distributed_amount"):
+            if isinstance(fields.get(name), float):
+                fields[name] = to_units(fields[name])
+        return cls(**fields)
@@ -0,0 +1,124 @@
+from array import array
+from itertools import compress
+
+from jobcoin.account import Account
+from jobcoin.amounts import to_units
+from jobcoin.constants import FIRST_WITHDRAWAL_ADDRESS_INDEX, WITHDRAWAL_INCREMENT
+
+
+class AccountTable:
+    """Accounts stored column-wise in contiguous fixed-point integer arrays.
+
+    Each account is one row. Balances and withdrawal amounts are integer
+    units (see jobcoin.amounts), the same as Account's amounts. Withdrawal
+    addresses of all accounts share one flat list, addressed by a per-row
+    offset and count. Transaction cursors are not part of the table.
+    """
+
+    __slots__ = (
+        "deposit_addresses",
+        "rows",
+        "balances",
+        "withdrawal_amounts",
+        "withdrawal_indexes",
+        "address_offsets",
+        "address_counts",
+        "withdrawal_addresses",
+        "_increment",
+    )
+
+    def __init__(self, withdrawal_increment=WITHDRAWAL_INCREMENT) -> None:
+        self.deposit_addresses = []
+        self.rows = {}
+        self.balances = array("q")
+        self.withdrawal_amounts = array("q")
+        self.withdrawal_indexes = array("q")
+        self.address_offsets = array("q")
+        self.address_counts = array("q")
+        self.withdrawal_addresses = []
+        self._increment = to_units(withdrawal_increment)
+
+    def __len__(self):
+        return len(self.deposit_addresses)
+
+    @classmethod
+    def from_accounts(cls, accounts):
+        table = cls()
+        for deposit_address, account in accounts.items():
+            table.add(
+                deposit_address,
+                account.withdrawal_addresses,
+                balance=account.total_amount,
+                withdrawal_amount=account.withdrawal_amount,
+                withdrawal_index=account.withdrawal_addresses_index,
+            )
+        return table
+
+    def add(
+        self,
+        deposit_address,
+        withdrawal_addresses,
+        balance=0,
+        withdrawal_amount=None,
+        withdrawal_index=FIRST_WITHDRAWAL_ADDRESS_INDEX,
+    ):
+        row = len(self.deposit_addresses)
+        self.rows[deposit_address] = row
+        self.deposit_addresses.append(deposit_address)
+        self.balances.append(balance)
+        self.withdrawal_amounts.append(
+            self._increment if withdrawal_amount is None else withdrawal_amount
+        )
+        self.withdrawal_indexes.append(withdrawal_index)
+        self.address_offsets.append(len(self.withdrawal_addresses))
+        self.address_counts.append(len(withdrawal_addresses))
+        self.withdrawal_addresses.extend(withdrawal_addresses)
+        return row
+
+    def credit(self, deposit_address, units):
+        self.balances[self.rows[deposit_address]] += units
+
+    def plan_payouts(self):
+        """Return (row, withdrawal address, units) for every funded account.
+
+        Payout amounts and target addresses for the whole table are computed
+        column by column in a single pass, without touching per-account
+        objects.
+        """
+        amounts = list(map(min, self.withdrawal_amounts, self.balances))
+        funded = [amount > 0 for amount in amounts]
+        targets = map(
+            self.withdrawal_addresses.__getitem__,
+            map(
+                int.__add__,
+                compress(self.address_offsets, funded),
+                compress(self.withdrawal_indexes, funded),
+            ),
+        )
+        return list(
+            zip(
+                compress(range(len(amounts)), funded),
+                targets,
+                compress(amounts, funded),
+            )
+        )
+
+    def apply_payout(self, row, units):
+        """Record a successful payout and advance the round-robin index."""
+        self.balances[row] -= units
+        index = (self.withdrawal_indexes[row] + 1) % self.address_counts[row]
+        self.withdrawal_indexes[row] = index
+        if index == FIRST_WITHDRAWAL_ADDRESS_INDEX:
+            self.withdrawal_amounts[row] += self._increment
+
+    def to_account(self, deposit_address):
+        row = self.rows[deposit_address]
+        offset = self.address_offsets[row]
+        return Account(
+            withdrawal_addresses=self.withdrawal_addresses[
+                offset : offset + self.address_counts[row]
+            ],
+            total_amount=self.balances[row],
+            withdrawal_amount=self.withdrawal_amounts[row],
+            withdrawal_addresses_index=self.withdrawal_indexes[row],
+        )
@@ -0,0 +1,13 @@
+from decimal import Decimal
+
+from jobcoin.constants import AMOUNT_DECIMALS, AMOUNT_SCALE
+
+
+def to_units(amount):
+    """Convert an API amount (string or number) to integer fixed-point units."""
+    return int(Decimal(str(amount)) * AMOUNT_SCALE)
+
+
+def from_units(units):
+    """Convert integer fixed-point units to the API's decimal string form."""
+    return format(Decimal(units).scaleb(-AMOUNT_DECIMALS).normalize(), "f")
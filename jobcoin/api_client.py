@@ -0,0 +1,141 @@
+import random
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from jobcoin.constants import (
+    API_BASE_URL,
+    API_POOL_SIZE,
+    API_PRIORITY_PAYOUT,
+    API_PRIORITY_POLL,
+    API_RATE_LIMIT_PER_SEC,
+    API_RETRIES,
+    API_RETRY_BACKOFF_MAX_SEC,
+    API_RETRY_BACKOFF_SEC,
+    API_TIMEOUT_SEC,
+)
+from jobcoin.metrics import api_request_duration_seconds, api_request_errors_total
+from jobcoin.rate_limiter import RateLimiter
+
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+
+
+class ApiClient:
+    """Jobcoin API client sharing one pool of keep-alive connections.
+
+    GETs are idempotent and retried on connection errors, timeouts and
+    retryable status codes with exponential backoff and full jitter. POSTs
+    move coins and are sent once; callers decide what to do on failure.
+
+    Every request, retries included, first takes a token from rate_limiter
+    at the caller's priority. Retryable status codes lower the rate.
+    rate_limit=None sends requests unthrottled.
+    """
+
+    def __init__(
+        self,
+        base_url=API_BASE_URL,
+        pool_size=API_POOL_SIZE,
+        timeout=API_TIMEOUT_SEC,
+        retries=API_RETRIES,
+        backoff=API_RETRY_BACKOFF_SEC,
+        backoff_max=API_RETRY_BACKOFF_MAX_SEC,
+        rate_limit=API_RATE_LIMIT_PER_SEC,
+    ) -> None:
+        self.base_url = base_url
+        self.address_url = f"{base_url}/addresses"
+        self.transactions_url = f"{base_url}/transactions"
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.rate_limiter = (
+            RateLimiter(max_rate=rate_limit) if rate_limit is not None else None
+        )
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def share_rate_limit(self, share):
+        """Keep share of the rate limit, as one of several processes using it.
+
+        Must be called before any request is sent.
+        """
+        if self.rate_limiter is not None:
+            limiter = self.rate_limiter
+            self.rate_limiter = RateLimiter(
+                max_rate=limiter.max_rate * share,
+                burst=max(1, limiter.burst * share),
+                min_rate=limiter.min_rate * share,
+                decrease_factor=limiter.decrease_factor,
+                recovery=limiter.recovery * share,
+                clock=limiter.clock,
+            )
+
+    def get_address_info(self, address, priority=API_PRIORITY_POLL):
+        return self.get(f"{self.address_url}/{address}", priority)
+
+    def get_transactions(self, priority=API_PRIORITY_POLL):
+        return self.get(self.transactions_url, priority)
+
+    def send_jobcoins(
+        self, from_address, to_address, amount, priority=API_PRIORITY_PAYOUT
+    ):
+        return self.post(
+            self.transactions_url,
+            data={
+                "fromAddress": from_address,
+                "toAddress": to_address,
+                "amount": str(amount),
+            },
+            priority=priority,
+        )
+
+    def get(self, url, priority=API_PRIORITY_POLL):
+        for attempt in range(self.retries + 1):
+            try:
+                response = self._send("GET", url, self.session.get, priority)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == self.retries:
+                    raise
+            else:
+                if (
+                    response.status_code not in RETRY_STATUS_CODES
+                    or attempt == self.retries
+                ):
+                    return response
+            time.sleep(self._get_backoff(attempt))
+
+    def post(self, url, data, priority=API_PRIORITY_PAYOUT):
+        return self._send("POST", url, self.session.post, priority, data=data)
+
+    def _send(self, method, url, send, priority, **kwargs):
+        endpoint = url[len(self.base_url) :].split("/")[1]
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(priority)
+        start = time.perf_counter()
+        try:
+            response = send(url, timeout=self.timeout, **kwargs)
+        except requests.exceptions.RequestException:
+            api_request_errors_total.inc(method=method, endpoint=endpoint)
+            raise
+        finally:
+            api_request_duration_seconds.observe(
+                time.perf_counter() - start, method=method, endpoint=endpoint
+            )
+        if not response.ok:
+            api_request_errors_total.inc(method=method, endpoint=endpoint)
+        if self.rate_limiter is not None:
+            if response.status_code in RETRY_STATUS_CODES:
+                self.rate_limiter.throttle()
+            else:
+                self.rate_limiter.recover()
+        return response
+
+    def _get_backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2**attempt))
+
+
+api_client = ApiClient()
@@ -0,0 +1,43 @@
+import threading
+import time
+from collections import OrderedDict
+
+from jobcoin.constants import IN_USE_ADDRESS_CACHE_SIZE, IN_USE_ADDRESS_CACHE_TTL_SEC
+
+
+class TTLCache:
+    """Bounded set of keys that expire ttl seconds after they were added.
+
+    When full, the least recently used key is evicted to make room.
+    """
+
+    def __init__(self, max_size, ttl, clock=time.monotonic) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._expires_at = OrderedDict()
+
+    def __contains__(self, key):
+        with self._lock:
+            expires_at = self._expires_at.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= self._clock():
+                del self._expires_at[key]
+                return False
+            self._expires_at.move_to_end(key)
+            return True
+
+    def __len__(self):
+        return len(self._expires_at)
+
+    def add(self, key):
+        with self._lock:
+            self._expires_at[key] = self._clock() + self.ttl
+            self._expires_at.move_to_end(key)
+            while len(self._expires_at) > self.max_size:
+                self._expires_at.popitem(last=False)
+
+
+in_use_addresses = TTLCache(IN_USE_ADDRESS_CACHE_SIZE, IN_USE_ADDRESS_CACHE_TTL_SEC)
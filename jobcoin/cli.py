@@ -1,31 +1,42 @@
 #!/usr/bin/env python
 import sys
-from threading import Thread
 
 import click
+import requests
 
+from jobcoin.constants import MIXER_SERVICE_TIMEOUT_SEC, MIXER_SERVICE_URL
 from jobcoin.exceptions import (
-    CheckAddressInUseException,
     InvalidWithdrawalAddressException,
-    WithdrawalAddressInUseException,
+    MixerServiceRequestException,
+    MixerServiceUnavailableException,
 )
-from jobcoin.jobcoin_mixer import jobcoin_mixer
-from jobcoin.tasks import distribute_deposits, get_new_deposits
-from jobcoin.utils import convert_input_to_withdrawal_addresses
+from jobcoin.utils import parse_withdrawal_addresses
 
 
-def start_background_tasks():
-    thread1 = Thread(target=get_new_deposits, daemon=True)
-    thread2 = Thread(target=distribute_deposits, daemon=True)
-    thread1.start()
-    thread2.start()
-    return [thread1, thread2]
+def create_deposit_address(withdrawal_addresses, service_url=MIXER_SERVICE_URL):
+    try:
+        response = requests.post(
+            f"{service_url}/deposit_addresses",
+            json={"withdrawal_addresses": [withdrawal_addresses]},
+            timeout=MIXER_SERVICE_TIMEOUT_SEC,
+        )
+        body = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        raise MixerServiceUnavailableException(e)
+    if "error" in body:
+        raise MixerServiceRequestException(body["error"])
+    return body["deposit_addresses"][0]
 
 
 @click.command()
-def main(args=None):
+@click.option(
+    "--service-url",
+    default=MIXER_SERVICE_URL,
+    show_default=True,
+    help="URL of the running Jobcoin mixer service (python -m jobcoin.service).",
+)
+def main(service_url=MIXER_SERVICE_URL):
     print("Welcome to the Jobcoin mixer!\n")
-    tasks = start_background_tasks()
 
     while True:
         addresses = click.prompt(
@@ -39,19 +50,17 @@ def main(args=None):
             sys.exit(0)
 
         try:
-            withdrawal_addresses = convert_input_to_withdrawal_addresses(addresses)
+            withdrawal_addresses = parse_withdrawal_addresses(addresses)
+            deposit_address = create_deposit_address(withdrawal_addresses, service_url)
         except (
             InvalidWithdrawalAddressException,
-            CheckAddressInUseException,
-            WithdrawalAddressInUseException,
+            MixerServiceRequestException,
+            MixerServiceUnavailableException,
         ) as e:
             click.echo(e)
         else:
-            deposit_address = jobcoin_mixer.get_new_deposit_address(
-                withdrawal_addresses
-            )
             click.echo(
-                "\nYou may now send Jobcoins to address {deposit_address} They "
+                "\nYou may now send Jobcoins to address {deposit_address}. They "
                 "will be mixed and sent to your destination addresses.\n".format(
                     deposit_address=deposit_address
                 )
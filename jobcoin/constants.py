@@ -1,11 +1,128 @@
+LOG_PATH = "/tmp/jobcoin-mixer"
+LOG_FORMAT = "%(asctime)s %(message)s"
+LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+# In queued mode, log records are written to LOG_PATH by a listener thread
+# and dropped if more than LOG_QUEUE_SIZE are waiting.
+LOG_MODE_SYNC = "sync"
+LOG_MODE_QUEUED = "queued"
+LOG_MODE = LOG_MODE_QUEUED
+LOG_QUEUE_SIZE = 10000
+LOG_TRANSFER_LINES_PER_SEC = 20
+
 API_BASE_URL = "https://jobcoin.gemini.com/deputize-green/api"
 API_ADDRESS_URL = "{}/addresses".format(API_BASE_URL)
 API_TRANSACTIONS_URL = "{}/transactions".format(API_BASE_URL)
 
 HOUSE_ADDRESS = "Lucia"
+# Sweeps are spread over the house addresses by hash of the deposit address
+# and payouts are sent from the one with the largest balance.
+HOUSE_ADDRESSES = [HOUSE_ADDRESS]
 
 WITHDRAWAL_INCREMENT = 2.5
 FIRST_WITHDRAWAL_ADDRESS_INDEX = 0
 
 DISTRIBUTE_DEPOSITS_INTERVAL_SEC = 5.0
-GET_NEW_DEPOSITS_INTERVAL_SEC = 10.0
+# Accounts aim to pay out their balance within PAYOUT_TARGET_DRAIN_SEC, with
+# at most PAYOUT_MAX_TRANSFERS_PER_SEC payouts across all accounts.
+PAYOUT_TARGET_DRAIN_SEC = 60 * 60.0
+PAYOUT_MAX_TRANSFERS_PER_SEC = 20.0
+# Tick of the deposit detection task. In address mode each tick only polls
+# the addresses that are due; in feed mode each tick downloads the whole
+# transactions ledger, so it runs less often.
+GET_NEW_DEPOSITS_INTERVAL_SEC = 2.0
+GET_NEW_DEPOSITS_FROM_FEED_INTERVAL_SEC = 10.0
+GET_NEW_DEPOSITS_CONCURRENCY = 16
+
+# Each deposit address is polled at its own interval: back to the minimum
+# after any activity, multiplied by the backoff factor after an idle poll.
+ADDRESS_POLL_INTERVAL_MIN_SEC = 2.0
+ADDRESS_POLL_INTERVAL_MAX_SEC = 10 * 60.0
+ADDRESS_POLL_BACKOFF_FACTOR = 2.0
+
+DEPOSIT_DETECTION_MODE_ADDRESS = "address"
+DEPOSIT_DETECTION_MODE_FEED = "feed"
+DEPOSIT_DETECTION_MODE = DEPOSIT_DETECTION_MODE_ADDRESS
+
+ACCOUNT_STORE_LOAD_BATCH_SIZE = 10000
+ACCOUNT_LOCK_STRIPES = 64
+
+# Accounts with a balance or deposits being swept are active, drained once
+# paid out to zero, and idle after ACCOUNT_IDLE_AFTER_SEC unfunded. Accounts
+# idle for ACCOUNT_ARCHIVE_TTL_SEC are archived: they are no longer polled,
+# and a deposit seen in the transactions feed reactivates them.
+ACCOUNT_STATE_ACTIVE = "active"
+ACCOUNT_STATE_DRAINED = "drained"
+ACCOUNT_STATE_IDLE = "idle"
+ACCOUNT_STATE_ARCHIVED = "archived"
+ACCOUNT_IDLE_AFTER_SEC = 60 * 60.0
+ACCOUNT_ARCHIVE_TTL_SEC = 7 * 24 * 60 * 60.0
+ACCOUNT_LIFECYCLE_CHECK_INTERVAL_SEC = 60.0
+
+# Detected deposits are swept to the house address by SWEEP_CONCURRENCY
+# threads, each with a queue of at most SWEEP_QUEUE_SIZE sweeps.
+SWEEP_CONCURRENCY = 8
+# Sweep all new deposits of an address found by one poll with one transfer.
+COALESCE_SWEEPS = True
+SWEEP_QUEUE_SIZE = 1000
+SWEEP_RETRY_BACKOFF_SEC = 0.5
+SWEEP_RETRY_BACKOFF_MAX_SEC = 30.0
+# A sweep still not sent after SWEEP_MAX_ATTEMPTS is marked failed in the
+# journal and left for an operator, so later sweeps are not held up.
+SWEEP_MAX_ATTEMPTS = 10
+
+# Outcomes of a transfer. A transfer that timed out, lost its connection or
+# got a 5xx response may still have gone through; a 4xx means it did not.
+TRANSFER_SENT = "sent"
+TRANSFER_REJECTED = "rejected"
+TRANSFER_UNKNOWN = "unknown"
+
+API_POOL_SIZE = 16
+API_TIMEOUT_SEC = 1
+API_RETRIES = 3
+API_RETRY_BACKOFF_SEC = 0.1
+API_RETRY_BACKOFF_MAX_SEC = 2.0
+
+# All Jobcoin API requests share one token bucket. Its rate is multiplied by
+# the decrease factor on every 429 or 5xx response and regains
+# API_RATE_LIMIT_RECOVERY requests per second with every successful one.
+API_RATE_LIMIT_PER_SEC = 50.0
+API_RATE_LIMIT_BURST = 50
+API_RATE_LIMIT_MIN_PER_SEC = 1.0
+API_RATE_LIMIT_DECREASE_FACTOR = 0.5
+API_RATE_LIMIT_RECOVERY = 0.5
+# With worker processes, each process has its own token bucket. The service
+# process keeps this share of the limit for interactive address checks and
+# the workers split the rest evenly.
+API_RATE_LIMIT_SERVICE_SHARE = 0.2
+
+# Priorities of API requests waiting for the rate limiter, lowest first.
+API_PRIORITY_INTERACTIVE = 0
+API_PRIORITY_SWEEP = 1
+API_PRIORITY_PAYOUT = 2
+API_PRIORITY_POLL = 3
+
+# Fixed-point amounts are stored as integer multiples of 10 ** -AMOUNT_DECIMALS.
+AMOUNT_DECIMALS = 8
+AMOUNT_SCALE = 10**AMOUNT_DECIMALS
+
+ADDRESS_CHECK_CONCURRENCY = 8
+IN_USE_ADDRESS_CACHE_SIZE = 100000
+IN_USE_ADDRESS_CACHE_TTL_SEC = 24 * 60 * 60
+
+MIXER_SERVICE_HOST = "127.0.0.1"
+MIXER_SERVICE_PORT = 8090
+MIXER_SERVICE_URL = f"http://{MIXER_SERVICE_HOST}:{MIXER_SERVICE_PORT}"
+# Creating a deposit address checks its withdrawal addresses with the
+# Jobcoin API, which may wait on the rate limiter.
+MIXER_SERVICE_TIMEOUT_SEC = 30
+
+# Deposit addresses are hashed into SHARD_COUNT shards, which are spread over
+# the worker processes on a consistent hash ring.
+SHARD_COUNT = 256
+SHARD_VIRTUAL_NODES = 64
+WORKER_CHECK_INTERVAL_SEC = 5.0
+# Before giving up shards, a worker waits this long for its sweeps in flight,
+# and exits if they are not done. The pool waits a little longer for it to
+# answer a command before stopping it.
+WORKER_SWEEP_JOIN_TIMEOUT_SEC = 300.0
+WORKER_RESPONSE_TIMEOUT_SEC = 330.0
@@ -16,3 +16,18 @@ class CheckAddressInUseException(Exception):
     def __init__(self, response_text):
         message = f"Unable to check if input addresses are already in use. Please try again. Request response: {response_text}"
         super().__init__(message)
+
+
+class MixerServiceUnavailableException(Exception):
+    def __init__(self, response_text):
+        message = (
+            "Unable to reach the Jobcoin mixer service. Please try again. "
+            f"Request response: {response_text}"
+        )
+        super().__init__(message)
+
+
+class MixerServiceRequestException(Exception):
+    def __init__(self, error):
+        # The service already phrases its errors for the user.
+        super().__init__(error)
@@ -0,0 +1,62 @@
+import logging
+import threading
+
+import requests
+
+from jobcoin.amounts import to_units
+from jobcoin.constants import API_PRIORITY_PAYOUT, HOUSE_ADDRESSES
+from jobcoin.sharding import get_shard
+
+
+class HouseAddressPool:
+    """House addresses that deposits are swept to and payouts are sent from.
+
+    Each deposit address is always swept to the same house address, picked
+    by hash. Balances are tracked locally in fixed-point units: a sweep adds
+    to its house address, and a payout reserves its amount from the house
+    address with the largest balance until the transfer is done. Payouts
+    running at the same time therefore draw on different addresses once
+    the richest one runs low. If no address covers a payout, the largest
+    balance is still used and the API decides.
+    """
+
+    def __init__(self, addresses=HOUSE_ADDRESSES) -> None:
+        self.addresses = list(addresses)
+        self._lock = threading.Lock()
+        self._balances = dict.fromkeys(self.addresses, 0)
+
+    def get_sweep_address(self, deposit_address):
+        return self.addresses[get_shard(deposit_address, len(self.addresses))]
+
+    def get_balance(self, address):
+        with self._lock:
+            return self._balances[address]
+
+    def credit(self, address, amount):
+        """Add amount, in fixed-point units, to a house address."""
+        with self._lock:
+            self._balances[address] += amount
+
+    def reserve(self, amount):
+        """Take amount from the richest house address and return the address."""
+        with self._lock:
+            address = max(self.addresses, key=self._balances.__getitem__)
+            self._balances[address] -= amount
+            return address
+
+    def release(self, address, amount):
+        """Give back amount reserved for a payout that was not sent."""
+        self.credit(address, amount)
+
+    def load_balances(self, client):
+        """Start tracking from the balances the API reports."""
+        for address in self.addresses:
+            try:
+                response = client.get_address_info(address, API_PRIORITY_PAYOUT)
+                response.raise_for_status()
+                balance = to_units(response.json()["balance"])
+            except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                logging.info("Error getting house address info %s: %s", address, e)
+                continue
+            with self._lock:
+                self._balances[address] = balance
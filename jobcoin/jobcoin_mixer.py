@@ -1,117 +1,681 @@
-import datetime
 import logging
+import threading
+import time
 import uuid
-from typing import Dict
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 
 from jobcoin.account import Account
+from jobcoin.amounts import from_units, to_units
+from jobcoin.api_client import api_client
+from jobcoin.cache import in_use_addresses
 from jobcoin.constants import (
-    API_ADDRESS_URL,
-    API_TRANSACTIONS_URL,
+    ACCOUNT_ARCHIVE_TTL_SEC,
+    ACCOUNT_IDLE_AFTER_SEC,
+    ACCOUNT_LIFECYCLE_CHECK_INTERVAL_SEC,
+    ACCOUNT_STATE_ACTIVE,
+    ACCOUNT_STATE_ARCHIVED,
+    ACCOUNT_STATE_DRAINED,
+    ACCOUNT_STATE_IDLE,
+    ADDRESS_POLL_BACKOFF_FACTOR,
+    ADDRESS_POLL_INTERVAL_MAX_SEC,
+    ADDRESS_POLL_INTERVAL_MIN_SEC,
+    API_PRIORITY_PAYOUT,
+    API_PRIORITY_POLL,
+    API_PRIORITY_SWEEP,
+    COALESCE_SWEEPS,
+    DISTRIBUTE_DEPOSITS_INTERVAL_SEC,
     FIRST_WITHDRAWAL_ADDRESS_INDEX,
-    HOUSE_ADDRESS,
+    GET_NEW_DEPOSITS_CONCURRENCY,
+    TRANSFER_REJECTED,
+    TRANSFER_SENT,
+    TRANSFER_UNKNOWN,
     WITHDRAWAL_INCREMENT,
 )
+from jobcoin.exceptions import WithdrawalAddressInUseException
+from jobcoin.house import HouseAddressPool
+from jobcoin.logs import transfer_logger
+from jobcoin.planner import PayoutPlanner
+from jobcoin.scheduler import DueTimeScheduler
+from jobcoin.sharding import get_shard
+from jobcoin.store import AccountStore
+from jobcoin.transactions import datetime_to_timestamp, decode_new_transactions
 
 
 class JobCoinMixer:
-    def __init__(self) -> None:
-        self.deposit_address_store: Dict[str, Account] = {}
+    """Detects deposits and distributes them for the accounts in its store.
 
-    def get_new_deposit_address(self, withdrawal_addresses):
-        new_address = "deposit_address_" + uuid.uuid4().hex
-        self.deposit_address_store[new_address] = Account(
-            withdrawal_addresses=withdrawal_addresses,
+    shards limits the mixer to the deposit addresses in those shards, so that
+    several worker processes can share one store. None serves every address.
+
+    Accounts idle for archive_ttl seconds are archived, see
+    manage_account_lifecycle. Deposits are swept to, and payouts sent from,
+    the addresses of house_addresses, see jobcoin.house.
+    """
+
+    def __init__(
+        self,
+        store=None,
+        client=None,
+        polling_concurrency=GET_NEW_DEPOSITS_CONCURRENCY,
+        shards=None,
+        coalesce_sweeps=COALESCE_SWEEPS,
+        payout_planner=None,
+        archive_ttl=ACCOUNT_ARCHIVE_TTL_SEC,
+        house_addresses=None,
+    ) -> None:
+        self.client = client if client is not None else api_client
+        self.polling_concurrency = polling_concurrency
+        self.coalesce_sweeps = coalesce_sweeps
+        self.payout_planner = (
+            payout_planner if payout_planner is not None else PayoutPlanner()
+        )
+        self.archive_ttl = archive_ttl
+        self.house_addresses = (
+            house_addresses if house_addresses is not None else HouseAddressPool()
         )
-        logging.info(
-            f"New {new_address} for withdrawal addresses {withdrawal_addresses}"
+        self.last_seen_feed_transaction = None
+        self.last_seen_archive_transaction = None
+        # Until a transaction is seen, the feed is read for archived accounts
+        # from this wall-clock time in milliseconds, not from its start.
+        self._archive_feed_since = int(time.time() * 1000)
+        self._next_lifecycle_check = (
+            time.monotonic() + ACCOUNT_LIFECYCLE_CHECK_INTERVAL_SEC
         )
-        return new_address
+        # Sweeps run inline unless a jobcoin.sweeper.Sweeper is attached.
+        self.sweeper = None
+        # Inline sweeps: units swept but not credited yet, by deposit
+        # address, and the addresses whose last transfer may have gone through.
+        self._uncredited_sweeps = {}
+        self._unconfirmed_sweeps = set()
+        self.shards = frozenset(shards) if shards is not None else None
+        self._registration_lock = threading.Lock()
+        self.use_store(store if store is not None else AccountStore())
+
+    def use_store(self, store):
+        self.deposit_address_store: AccountStore = store
+        self.distribution_scheduler = DueTimeScheduler()
+        self.polling_scheduler = DueTimeScheduler()
+        self.poll_intervals = {}
+        for deposit_address, account in store.snapshot():
+            if self.owns(deposit_address):
+                self._schedule_account(deposit_address, account, 0)
+
+    def owns(self, deposit_address):
+        return self.shards is None or get_shard(deposit_address) in self.shards
+
+    def set_shards(self, shards):
+        """Serve the deposit addresses in shards from now on.
 
-    def get_new_deposits(self, offset):
-        for deposit_address in self.deposit_address_store.keys():
-            try:
-                response = requests.get(
-                    f"{API_ADDRESS_URL}/{deposit_address}", timeout=1
+        Pending changes are committed first, so whoever takes over a shard
+        given up here reads its latest state. All accounts are then re-read,
+        as the ones gained may have been updated by their previous owner.
+        Must not run concurrently with the periodic tasks.
+        """
+        self.deposit_address_store.commit()
+        self.shards = frozenset(shards)
+        self.deposit_address_store.reload()
+        self.use_store(self.deposit_address_store)
+
+    def refresh_accounts(self, now=None):
+        """Start serving owned accounts created by other processes."""
+        if now is None:
+            now = time.monotonic()
+        for deposit_address in self.deposit_address_store.refresh():
+            if self.owns(deposit_address):
+                self._schedule_account(
+                    deposit_address, self.deposit_address_store[deposit_address], now
+                )
+
+    def reload_unowned_accounts(self, deposit_addresses=None):
+        """Re-read accounts served by other processes, which may have changed."""
+        if self.shards is None:
+            return
+        if deposit_addresses is None:
+            self.deposit_address_store.refresh()
+            deposit_addresses = [
+                deposit_address
+                for deposit_address, _ in self.deposit_address_store.snapshot()
+            ]
+        self.deposit_address_store.reload(
+            [
+                deposit_address
+                for deposit_address in deposit_addresses
+                if not self.owns(deposit_address)
+            ]
+        )
+
+    def _schedule_account(self, deposit_address, account, now):
+        self.polling_scheduler.schedule(deposit_address, now)
+        if account.total_amount > 0:
+            self.distribution_scheduler.schedule(deposit_address, now)
+
+    def get_new_deposit_address(self, withdrawal_addresses):
+        return self.get_new_deposit_addresses([withdrawal_addresses])[0]
+
+    def get_new_deposit_addresses(self, withdrawal_addresses_list):
+        """Create one deposit address per list of withdrawal addresses.
+
+        All new accounts are committed to the store together. Nothing is
+        created if a withdrawal address is already paid by an account or
+        given more than once.
+        """
+        new_addresses = []
+        now = time.monotonic()
+        with self._registration_lock:
+            self.check_withdrawal_addresses(withdrawal_addresses_list)
+            for withdrawal_addresses in withdrawal_addresses_list:
+                new_address = "deposit_address_" + uuid.uuid4().hex
+                self.deposit_address_store[new_address] = Account(
+                    withdrawal_addresses=withdrawal_addresses,
                 )
-                response.raise_for_status()
-            except requests.exceptions.RequestException as e:
                 logging.info(
-                    f"Error getting deposit address info {deposit_address}: {e.response.text}"
+                    "New %s for withdrawal addresses %s",
+                    new_address,
+                    withdrawal_addresses,
                 )
-                continue
+                new_addresses.append(new_address)
+        self.deposit_address_store.commit()
+        for new_address in new_addresses:
+            if self.owns(new_address):
+                self.polling_scheduler.schedule(new_address, now)
+        return new_addresses
+
+    def check_withdrawal_addresses(self, withdrawal_addresses_list):
+        """Raise if an address is paid by an account already or repeated."""
+        addresses = [
+            address
+            for withdrawal_addresses in withdrawal_addresses_list
+            for address in withdrawal_addresses
+        ]
+        conflicts = self.deposit_address_store.get_paid_addresses(addresses)
+        seen = set()
+        for address in addresses:
+            if address in seen and address not in conflicts:
+                conflicts.append(address)
+            seen.add(address)
+        if conflicts:
+            raise WithdrawalAddressInUseException(",".join(conflicts))
+
+    def get_new_deposits(self, offset=None, now=None):
+        """Poll the deposit addresses that are due and sweep new deposits.
 
-            transactions = response.json()["transactions"]
-            for transaction in transactions[::-1]:
-                if self._should_process_transaction(
-                    transaction, offset, deposit_address
+        Every address has its own polling interval, see _reschedule_poll.
+        """
+        if now is None:
+            now = time.monotonic()
+        deposit_addresses = self.polling_scheduler.pop_due(now)
+        if self.polling_concurrency > 1:
+            with ThreadPoolExecutor(max_workers=self.polling_concurrency) as executor:
+                results = executor.map(self._get_transactions, deposit_addresses)
+                for deposit_address, transactions in zip(deposit_addresses, results):
+                    self._poll(deposit_address, transactions, offset, now)
+        else:
+            for deposit_address in deposit_addresses:
+                transactions = self._get_transactions(deposit_address)
+                self._poll(deposit_address, transactions, offset, now)
+        self.deposit_address_store.commit()
+        self._manage_account_lifecycle_if_due(check_feed=True)
+
+    def get_new_deposits_from_feed(self, offset=None):
+        new_transactions = self._get_feed_transactions(
+            self.last_seen_feed_transaction, offset
+        )
+        if new_transactions is None:
+            return
+
+        self._remember_addresses_in_use(new_transactions)
+        self._reactivate_archived_accounts(new_transactions)
+
+        transactions_by_address = {}
+        for transaction in new_transactions:
+            deposit_address = transaction.to_address
+            if deposit_address in self.deposit_address_store and self.owns(
+                deposit_address
+            ):
+                transactions_by_address.setdefault(deposit_address, []).append(
+                    transaction
+                )
+        failed_addresses = {
+            deposit_address
+            for deposit_address, transactions in transactions_by_address.items()
+            if not self._process_new_transactions(deposit_address, transactions)
+        }
+
+        # The feed cursor only moves past entries that were fully processed, so a
+        # failed sweep is retried next cycle; account cursors skip the rest.
+        for transaction in new_transactions:
+            if transaction.to_address in failed_addresses:
+                break
+            self.last_seen_feed_transaction = transaction
+        self.deposit_address_store.commit()
+        self._manage_account_lifecycle_if_due(check_feed=False)
+
+    def _get_feed_transactions(self, feed_cursor, offset=None, after_timestamp=None):
+        """Return the transactions of the feed after feed_cursor, or None.
+
+        Without a cursor, those from offset or after_timestamp on are returned.
+        """
+        try:
+            response = self.client.get_transactions(API_PRIORITY_POLL)
+            response.raise_for_status()
+            transactions = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logging.info("Error getting transactions feed: %s", _error_text(e))
+            return None
+        if feed_cursor is not None:
+            return decode_new_transactions(
+                transactions, feed_cursor.timestamp, feed_cursor.key
+            )
+        if after_timestamp is None:
+            after_timestamp = _get_offset_timestamp(offset)
+        return decode_new_transactions(transactions, after_timestamp)
+
+    def _get_transactions(self, deposit_address):
+        try:
+            response = self.client.get_address_info(deposit_address, API_PRIORITY_POLL)
+            response.raise_for_status()
+            return response.json()["transactions"]
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            logging.info(
+                "Error getting deposit address info %s: %s",
+                deposit_address,
+                _error_text(e),
+            )
+            return None
+
+    def _poll(self, deposit_address, transactions, offset, now):
+        account = self.deposit_address_store[deposit_address]
+        last_transaction_key = account.last_transaction_key
+        processed = self._process_transactions(deposit_address, transactions, offset)
+        if transactions is None:
+            active = None
+        else:
+            active = (
+                not processed or account.last_transaction_key != last_transaction_key
+            )
+        self._reschedule_poll(deposit_address, active, now)
+
+    def _reschedule_poll(self, deposit_address, active, now):
+        """Poll active addresses soon and back off exponentially on idle ones.
+
+        An address is active when it had new transactions or a sweep failed.
+        active is None when the poll itself failed, which keeps the interval.
+        """
+        interval = self.poll_intervals.get(
+            deposit_address, ADDRESS_POLL_INTERVAL_MIN_SEC
+        )
+        if active:
+            interval = ADDRESS_POLL_INTERVAL_MIN_SEC
+        elif active is not None:
+            interval = min(
+                interval * ADDRESS_POLL_BACKOFF_FACTOR, ADDRESS_POLL_INTERVAL_MAX_SEC
+            )
+        self.poll_intervals[deposit_address] = interval
+        self.polling_scheduler.schedule(deposit_address, now + interval)
+
+    def _process_transactions(self, deposit_address, transactions, offset):
+        if transactions is None:
+            return False
+        account = self.deposit_address_store[deposit_address]
+        if account.last_transaction_key is not None:
+            new_transactions = decode_new_transactions(
+                transactions,
+                account.last_transaction_timestamp,
+                account.last_transaction_key,
+            )
+        else:
+            new_transactions = decode_new_transactions(
+                transactions, _get_offset_timestamp(offset)
+            )
+        self._remember_addresses_in_use(new_transactions)
+        return self._process_new_transactions(deposit_address, new_transactions)
+
+    def _process_new_transactions(self, deposit_address, transactions):
+        account = self.deposit_address_store[deposit_address]
+        if account.last_transaction_key is not None:
+            transactions = [
+                transaction
+                for transaction in transactions
+                if transaction.timestamp >= account.last_transaction_timestamp
+                and transaction.key != account.last_transaction_key
+            ]
+        if self.coalesce_sweeps:
+            return self._process_coalesced(deposit_address, transactions)
+        for transaction in transactions:
+            if transaction.to_address == deposit_address and not self._sweep_deposit(
+                deposit_address, transaction.amount
+            ):
+                return False
+            self._advance_cursor(deposit_address, transaction)
+        return True
+
+    def _process_coalesced(self, deposit_address, transactions):
+        """Sweep all new incoming amounts of an address with one transfer.
+
+        The cursor only moves past the batch once the whole sum is swept.
+        """
+        amount = sum(
+            transaction.amount
+            for transaction in transactions
+            if transaction.to_address == deposit_address
+        )
+        if amount and not self._sweep_deposit(deposit_address, amount):
+            return False
+        if transactions:
+            self._advance_cursor(deposit_address, transactions[-1])
+        return True
+
+    def _advance_cursor(self, deposit_address, transaction):
+        account = self.deposit_address_store[deposit_address]
+        account.last_transaction_timestamp = transaction.timestamp
+        account.last_transaction_key = transaction.key
+        self.deposit_address_store.save(deposit_address)
+
+    def _remember_addresses_in_use(self, transactions):
+        for transaction in transactions:
+            if transaction.from_address is not None:
+                in_use_addresses.add(transaction.from_address)
+            in_use_addresses.add(transaction.to_address)
+
+    def _sweep_deposit(self, deposit_address, amount):
+        """Sweep amount, in fixed-point units, to the house address."""
+        if self.sweeper is not None:
+            return self.sweeper.submit(deposit_address, amount)
+        # A failed sweep is retried with the same deposits, plus any found
+        # since, so what earlier attempts swept is not sent again.
+        swept = self._uncredited_sweeps.pop(deposit_address, 0)
+        if deposit_address in self._unconfirmed_sweeps:
+            uncredited = self.get_uncredited_sweeps(deposit_address)
+            if uncredited is None:
+                if swept:
+                    self._uncredited_sweeps[deposit_address] = swept
+                return False
+            self._unconfirmed_sweeps.discard(deposit_address)
+            if uncredited > swept:
+                self.house_addresses.credit(
+                    self.house_addresses.get_sweep_address(deposit_address),
+                    uncredited - swept,
+                )
+                swept = uncredited
+        if swept < amount:
+            outcome = self.transfer_to_house_address(deposit_address, amount - swept)
+            if outcome == TRANSFER_SENT:
+                swept = amount
+            elif outcome == TRANSFER_UNKNOWN:
+                self._unconfirmed_sweeps.add(deposit_address)
+        if swept < amount:
+            if swept:
+                self._uncredited_sweeps[deposit_address] = swept
+            return False
+        self.credit_deposit(deposit_address, amount)
+        return True
+
+    def get_uncredited_sweeps(self, deposit_address):
+        """Return the units swept from an address but not credited to it.
+
+        Every transfer out of a deposit address is a sweep and every sweep
+        is credited once it is known to be sent, so this is what the address
+        sent beyond what its account was credited. None if the API could
+        not tell.
+        """
+        try:
+            response = self.client.get_address_info(deposit_address, API_PRIORITY_SWEEP)
+            response.raise_for_status()
+            sent = sum(
+                to_units(transaction["amount"])
+                for transaction in response.json()["transactions"]
+                if transaction.get("fromAddress") == deposit_address
+            )
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            logging.info(
+                "Error getting deposit address info %s: %s",
+                deposit_address,
+                _error_text(e),
+            )
+            return None
+        account = self.deposit_address_store[deposit_address]
+        with self.deposit_address_store.account_lock(deposit_address):
+            credited = account.total_amount + account.distributed_amount
+        return sent - credited
+
+    def credit_deposit(self, deposit_address, amount, now=None, sweep_sequence=None):
+        """Add amount, in fixed-point units, to the account and schedule it.
+
+        sweep_sequence, if given, is recorded as credited in the same update.
+        """
+        account = self.deposit_address_store[deposit_address]
+        with self.deposit_address_store.account_lock(deposit_address):
+            account.total_amount += amount
+            if sweep_sequence is not None:
+                account.credited_sweep_sequence = sweep_sequence
+            account.state = ACCOUNT_STATE_ACTIVE
+            account.state_since = time.time()
+        self.deposit_address_store.save(deposit_address)
+        if deposit_address not in self.distribution_scheduler:
+            self.distribution_scheduler.schedule(
+                deposit_address, time.monotonic() if now is None else now
+            )
+
+    def distribute_deposits(self, now=None):
+        """Pay out the planned payouts of every account that is due.
+
+        Only funded accounts are ever scheduled, so a tick costs time
+        proportional to the accounts with something to pay out. The
+        payout_planner decides how many payouts each account gets.
+        """
+        if now is None:
+            now = time.monotonic()
+        deposit_addresses = self.distribution_scheduler.pop_due(now)
+        payouts = self.payout_planner.plan(
+            [
+                (deposit_address, self.deposit_address_store[deposit_address])
+                for deposit_address in deposit_addresses
+            ],
+            now,
+        )
+        for deposit_address in deposit_addresses:
+            account = self.deposit_address_store[deposit_address]
+            for units in payouts.get(deposit_address, ()):
+                if not self.transfer_to_withdrawal_address(
+                    account.withdrawal_addresses[account.withdrawal_addresses_index],
+                    units,
                 ):
-                    if self.transfer_to_house_address(
-                        transaction["toAddress"], transaction["amount"]
-                    ):
-                        self.deposit_address_store[
-                            transaction["toAddress"]
-                        ].total_amount += float(transaction["amount"])
-
-    def distribute_deposits(self):
-        for _, account in self.deposit_address_store.items():
-            withdrawl_amount = (
-                account.withdrawal_amount
-                if account.withdrawal_amount < account.total_amount
-                else account.total_amount
+                    break
+                self._apply_payout(deposit_address, account, units)
+                self.deposit_address_store.save(deposit_address)
+            if account.total_amount > 0:
+                self.distribution_scheduler.schedule(
+                    deposit_address, now + DISTRIBUTE_DEPOSITS_INTERVAL_SEC
+                )
+            else:
+                self.payout_planner.forget(deposit_address)
+                self._set_state(
+                    deposit_address, account, ACCOUNT_STATE_DRAINED, time.time()
+                )
+        self.deposit_address_store.commit()
+
+    def _apply_payout(self, deposit_address, account, units):
+        with self.deposit_address_store.account_lock(deposit_address):
+            account.total_amount -= units
+            account.distributed_amount += units
+            account.withdrawal_addresses_index = (
+                account.withdrawal_addresses_index + 1
+            ) % len(account.withdrawal_addresses)
+            if account.withdrawal_addresses_index == FIRST_WITHDRAWAL_ADDRESS_INDEX:
+                account.withdrawal_amount += to_units(WITHDRAWAL_INCREMENT)
+
+    def manage_account_lifecycle(self, now=None, check_feed=True):
+        """Reactivate archived accounts with deposits and archive idle ones.
+
+        Deposits to archived addresses are looked for in the transactions
+        feed, unless check_feed is False because get_new_deposits_from_feed
+        already did, or no owned account is archived. Owned accounts without
+        a balance or sweeps in flight become idle after ACCOUNT_IDLE_AFTER_SEC
+        in their state and are archived after archive_ttl more. Each is
+        polled once more before it is archived; deposits after that show up
+        in the next feed check. now is a wall-clock time. Must run on the
+        polling thread.
+        """
+        if now is None:
+            now = time.time()
+        if check_feed:
+            self._check_feed_for_archived_accounts(now)
+        for deposit_address, account in self.deposit_address_store.snapshot():
+            if not self.owns(deposit_address) or _is_funded(account):
+                continue
+            if account.state_since is None:
+                self._set_state(deposit_address, account, account.state, now)
+            elif account.state != ACCOUNT_STATE_IDLE:
+                if now - account.state_since >= ACCOUNT_IDLE_AFTER_SEC:
+                    self._set_state(deposit_address, account, ACCOUNT_STATE_IDLE, now)
+            elif now - account.state_since >= self.archive_ttl:
+                self._archive_if_quiet(deposit_address, account, now)
+        self.deposit_address_store.commit()
+
+    def _check_feed_for_archived_accounts(self, now):
+        if not any(
+            self.owns(deposit_address)
+            for deposit_address in self.deposit_address_store.get_archived_addresses()
+        ):
+            # Accounts archived from now on were polled after this point, so
+            # the next check reads the feed from here.
+            self.last_seen_archive_transaction = None
+            self._archive_feed_since = int(now * 1000)
+            return
+        new_transactions = self._get_feed_transactions(
+            self.last_seen_archive_transaction,
+            after_timestamp=self._archive_feed_since,
+        )
+        if new_transactions:
+            self._reactivate_archived_accounts(new_transactions)
+            self.last_seen_archive_transaction = new_transactions[-1]
+
+    def _manage_account_lifecycle_if_due(self, check_feed):
+        if time.monotonic() >= self._next_lifecycle_check:
+            self._next_lifecycle_check = (
+                time.monotonic() + ACCOUNT_LIFECYCLE_CHECK_INTERVAL_SEC
             )
-            if not withdrawl_amount:
+            self.manage_account_lifecycle(check_feed=check_feed)
+
+    def _archive_if_quiet(self, deposit_address, account, now):
+        transactions = self._get_transactions(deposit_address)
+        if transactions is None:
+            return
+        last_transaction_key = account.last_transaction_key
+        if (
+            not self._process_transactions(deposit_address, transactions, None)
+            or account.last_transaction_key != last_transaction_key
+        ):
+            self._set_state(deposit_address, account, ACCOUNT_STATE_ACTIVE, now)
+            return
+        self._set_state(deposit_address, account, ACCOUNT_STATE_ARCHIVED, now)
+        self.polling_scheduler.unschedule(deposit_address)
+        self.distribution_scheduler.unschedule(deposit_address)
+        self.poll_intervals.pop(deposit_address, None)
+        self.payout_planner.forget(deposit_address)
+        self.deposit_address_store.archive(deposit_address)
+        logging.info("Archived %s", deposit_address)
+
+    def _reactivate_archived_accounts(self, transactions):
+        """Move owned archived accounts with new deposits back into service."""
+        store = self.deposit_address_store
+        transactions_by_address = {}
+        for transaction in transactions:
+            if transaction.to_address not in store:
+                transactions_by_address.setdefault(transaction.to_address, []).append(
+                    transaction
+                )
+        if not transactions_by_address:
+            return
+        for deposit_address in store.get_archived_addresses(transactions_by_address):
+            if not self.owns(deposit_address):
                 continue
-            if self.transfer_to_withdrawal_address(
-                account.withdrawal_addresses[account.withdrawal_addresses_index],
-                withdrawl_amount,
+            account = store.get_archived(deposit_address)
+            # The feed is read from before the account was archived, so
+            # deposits made before that can come up again.
+            if account.last_transaction_key is not None and not any(
+                transaction.timestamp >= account.last_transaction_timestamp
+                and transaction.key != account.last_transaction_key
+                for transaction in transactions_by_address[deposit_address]
             ):
-                account.total_amount -= withdrawl_amount
-                account.withdrawal_addresses_index = (
-                    account.withdrawal_addresses_index + 1
-                ) % len(account.withdrawal_addresses)
-                if account.withdrawal_addresses_index == FIRST_WITHDRAWAL_ADDRESS_INDEX:
-                    account.withdrawal_amount += WITHDRAWAL_INCREMENT
+                continue
+            account = store.unarchive(deposit_address)
+            self._set_state(deposit_address, account, ACCOUNT_STATE_ACTIVE, time.time())
+            self._schedule_account(deposit_address, account, time.monotonic())
+            logging.info("Reactivated archived %s", deposit_address)
+
+    def _set_state(self, deposit_address, account, state, now):
+        with self.deposit_address_store.account_lock(deposit_address):
+            account.state = state
+            account.state_since = now
+        self.deposit_address_store.save(deposit_address)
 
-    def transfer_to_house_address(self, from_address, amount):
-        return self._send_jobcoins(from_address, HOUSE_ADDRESS, amount)
+    def transfer_to_house_address(self, from_address, units):
+        """Sweep units to the house address and return the outcome."""
+        house_address = self.house_addresses.get_sweep_address(from_address)
+        outcome = self._send_jobcoins(
+            from_address, house_address, from_units(units), API_PRIORITY_SWEEP
+        )
+        if outcome == TRANSFER_SENT:
+            self.house_addresses.credit(house_address, units)
+        return outcome
 
-    def transfer_to_withdrawal_address(self, to_address, amount):
-        return self._send_jobcoins(HOUSE_ADDRESS, to_address, amount)
+    def transfer_to_withdrawal_address(self, to_address, units):
+        """Pay units out from a house address and return whether it was sent."""
+        house_address = self.house_addresses.reserve(units)
+        if (
+            self._send_jobcoins(
+                house_address, to_address, from_units(units), API_PRIORITY_PAYOUT
+            )
+            != TRANSFER_SENT
+        ):
+            self.house_addresses.release(house_address, units)
+            return False
+        in_use_addresses.add(to_address)
+        return True
 
-    def _send_jobcoins(self, from_address, to_address, amount):
+    def _send_jobcoins(self, from_address, to_address, amount, priority):
         try:
-            response = requests.post(
-                API_TRANSACTIONS_URL,
-                data={
-                    "fromAddress": from_address,
-                    "toAddress": to_address,
-                    "amount": str(amount),
-                },
-                timeout=1,
+            response = self.client.send_jobcoins(
+                from_address, to_address, amount, priority
             )
             response.raise_for_status()
         except requests.exceptions.RequestException as e:
             logging.info(
-                f"Error transferring {amount} from {from_address} to {to_address}: {e.response.text}."
+                "Error transferring %s from %s to %s: %s.",
+                amount,
+                from_address,
+                to_address,
+                _error_text(e),
             )
-            return False
+            response = getattr(e, "response", None)
+            if response is not None and 400 <= response.status_code < 500:
+                return TRANSFER_REJECTED
+            return TRANSFER_UNKNOWN
         else:
-            logging.info(f"Transfered {amount} from {from_address} to {to_address}.")
-            return True
+            transfer_logger.info(
+                "Transfered %s from %s to %s.", amount, from_address, to_address
+            )
+            return TRANSFER_SENT
+
+
+def _is_funded(account):
+    return (
+        account.total_amount > 0
+        or account.sweep_sequence > account.credited_sweep_sequence
+    )
+
+
+def _get_offset_timestamp(offset):
+    return datetime_to_timestamp(offset) if offset is not None else None
 
-    def _should_process_transaction(self, transaction, offset, deposit_address):
-        return (
-            self._is_after_offset(transaction["timestamp"], offset)
-            and transaction["toAddress"] == deposit_address
-        )
 
-    def _is_after_offset(self, timestamp, offset):
-        transaction_time = datetime.datetime.strptime(
-            timestamp, "%Y-%m-%dT%H:%M:%S.%f%z"
-        ).replace(tzinfo=None)
-        return transaction_time >= offset
+def _error_text(error):
+    # Connection errors and timeouts carry no response to report.
+    response = getattr(error, "response", None)
+    return response.text if response is not None else error
 
 
 jobcoin_mixer = JobCoinMixer()
@@ -0,0 +1,104 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+from jobcoin.constants import (
+    LOG_DATE_FORMAT,
+    LOG_FORMAT,
+    LOG_MODE,
+    LOG_MODE_QUEUED,
+    LOG_PATH,
+    LOG_QUEUE_SIZE,
+    LOG_TRANSFER_LINES_PER_SEC,
+)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that leaves formatting to the listener thread.
+
+    The stock QueueHandler formats each record before queueing it, so the
+    logging thread pays for it. Records here stay in the same process, so
+    they can be queued as they are. When the queue is full, records are
+    dropped and counted rather than blocking the caller.
+    """
+
+    def __init__(self, log_queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RateLimitFilter(logging.Filter):
+    """Let through at most rate records per second.
+
+    The first record let through after some were suppressed says how many.
+    """
+
+    def __init__(self, rate, clock=time.monotonic) -> None:
+        super().__init__()
+        self.rate = rate
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._window = None
+        self._count = 0
+        self._suppressed = 0
+
+    def filter(self, record):
+        with self._lock:
+            window = int(self.clock())
+            if window != self._window:
+                self._window = window
+                self._count = 0
+            if self._count >= self.rate:
+                self._suppressed += 1
+                return False
+            self._count += 1
+            suppressed, self._suppressed = self._suppressed, 0
+        if suppressed and isinstance(record.args, tuple):
+            record.msg = f"{record.msg} (%d similar lines suppressed)"
+            record.args = record.args + (suppressed,)
+        return True
+
+
+# Successful transfers log one line each, so they are rate limited.
+transfer_logger = logging.getLogger("jobcoin.transfers")
+transfer_logger.addFilter(RateLimitFilter(LOG_TRANSFER_LINES_PER_SEC))
+
+
+def configure_logging(logger=None, path=LOG_PATH, mode=LOG_MODE):
+    """Log to path, through a queue and a listener thread in queued mode.
+
+    In queued mode the callers only append records to a queue; formatting
+    and file I/O happen on the listener thread.
+    """
+    if logger is None:
+        logger = logging.getLogger()
+    file_handler = logging.FileHandler(path)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT))
+    logger.setLevel(logging.INFO)
+    if mode != LOG_MODE_QUEUED:
+        logger.addHandler(file_handler)
+        return None
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    logger.addHandler(DeferredQueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, file_handler)
+    listener.start()
+    atexit.register(_stop_listener, listener)
+    return listener
+
+
+def _stop_listener(listener):
+    # Writes out the records still queued, unless already stopped.
+    if listener._thread is not None:
+        listener.stop()
@@ -0,0 +1,200 @@
+import bisect
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Metric:
+    """Base class for metrics rendered in the Prometheus text format."""
+
+    type = None
+
+    def __init__(self, name, description, registry=None) -> None:
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+        if registry is None:
+            registry = metrics_registry
+        registry.register(self)
+
+    def render(self, others=()):
+        """Render the metric, adding the values collected in other processes."""
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        lines.extend(self._render_samples(others))
+        return "\n".join(lines)
+
+    def collect(self):
+        """Return a copy of the values, to be rendered by another process."""
+        return None
+
+    def _render_samples(self, others):
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name, description, registry=None) -> None:
+        super().__init__(name, description, registry)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _get_label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self._values.get(_get_label_key(labels), 0)
+
+    def collect(self):
+        with self._lock:
+            return dict(self._values)
+
+    def _render_samples(self, others):
+        values = self.collect()
+        for other in others:
+            for key, value in other.items():
+                values[key] = values.get(key, 0) + value
+        values = sorted(values.items())
+        return [f"{self.name}{_format_labels(key)} {value}" for key, value in values]
+
+
+class Gauge(Metric):
+    """A single value, either set directly or read from a function at scrape."""
+
+    type = "gauge"
+
+    def __init__(self, name, description, registry=None) -> None:
+        super().__init__(name, description, registry)
+        self._value = 0
+        self._function = None
+
+    def set(self, value):
+        self._value = value
+
+    def set_function(self, function):
+        self._function = function
+
+    def get(self):
+        return self._function() if self._function is not None else self._value
+
+    def _render_samples(self, others):
+        # Gauges describe the process they live in and are not added up.
+        return [f"{self.name} {self.get()}"]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, description, buckets=DEFAULT_BUCKETS, registry=None):
+        super().__init__(name, description, registry)
+        self.buckets = tuple(buckets)
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = _get_label_key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One count per bucket, then +Inf count and sum.
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    def get_count(self, **labels):
+        counts = self._values.get(_get_label_key(labels))
+        return sum(counts[:-1]) if counts is not None else 0
+
+    def collect(self):
+        with self._lock:
+            return {key: list(counts) for key, counts in self._values.items()}
+
+    def _render_samples(self, others):
+        values = self.collect()
+        for other in others:
+            for key, counts in other.items():
+                if key in values:
+                    values[key] = [a + b for a, b in zip(values[key], counts)]
+                else:
+                    values[key] = list(counts)
+        values = sorted(values.items())
+        lines = []
+        for key, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                bucket_key = key + (("le", str(bound)),)
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(bucket_key)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(key)} {counts[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def collect(self):
+        """Return the values of the counters and histograms by metric name."""
+        collected = {}
+        for metric in self._metrics:
+            values = metric.collect()
+            if values is not None:
+                collected[metric.name] = values
+        return collected
+
+    def render(self, collected=()):
+        """Render every metric, adding up the values of collect() elsewhere."""
+        return "".join(
+            metric.render(
+                [values[metric.name] for values in collected if metric.name in values]
+            )
+            + "\n"
+            for metric in self._metrics
+        )
+
+
+def _get_label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key):
+    if not key:
+        return ""
+    labels = ",".join(f'{name}="{value}"' for name, value in key)
+    return f"{{{labels}}}"
+
+
+metrics_registry = MetricsRegistry()
+
+task_duration_seconds = Histogram(
+    "jobcoin_task_duration_seconds", "Duration of one run of a periodic task."
+)
+task_overruns_total = Counter(
+    "jobcoin_task_overruns_total",
+    "Runs of a periodic task that took longer than its interval.",
+)
+task_failures_total = Counter(
+    "jobcoin_task_failures_total",
+    "Runs of a periodic task that raised an exception.",
+)
+api_request_duration_seconds = Histogram(
+    "jobcoin_api_request_duration_seconds", "Latency of Jobcoin API requests."
+)
+api_request_errors_total = Counter(
+    "jobcoin_api_request_errors_total",
+    "Jobcoin API requests that failed or returned an error status.",
+)
+live_accounts = Gauge("jobcoin_live_accounts", "Deposit addresses being served.")
+undistributed_balance = Gauge(
+    "jobcoin_undistributed_balance",
+    "Jobcoins received and not yet distributed to withdrawal addresses.",
+)
@@ -0,0 +1,86 @@
+import math
+
+from jobcoin.constants import (
+    DISTRIBUTE_DEPOSITS_INTERVAL_SEC,
+    PAYOUT_MAX_TRANSFERS_PER_SEC,
+    PAYOUT_TARGET_DRAIN_SEC,
+)
+
+
+class PayoutPlanner:
+    """Decides how many payouts each account gets per distribution tick.
+
+    An account gets a drain deadline target_drain_sec after it is first
+    planned while funded. Each tick it pays out its balance divided by the
+    ticks left until the deadline, in at most one payout per withdrawal
+    address, each of at least the account's withdrawal_amount. Small
+    balances therefore still go out one increment per tick, and large ones
+    in fewer, larger payouts spread over the round robin.
+
+    Balances are in fixed-point units (see jobcoin.amounts) and so are the
+    planned payouts, so every payout is an exact decimal of at most
+    AMOUNT_DECIMALS places.
+
+    Every tick has a budget of max_transfers_per_sec * interval transfers,
+    given to the accounts with the earliest deadlines first. Accounts left
+    out get no payout this tick and larger ones later on.
+    """
+
+    def __init__(
+        self,
+        target_drain_sec=PAYOUT_TARGET_DRAIN_SEC,
+        max_transfers_per_sec=PAYOUT_MAX_TRANSFERS_PER_SEC,
+        interval=DISTRIBUTE_DEPOSITS_INTERVAL_SEC,
+    ) -> None:
+        self.target_drain_sec = target_drain_sec
+        self.max_transfers_per_sec = max_transfers_per_sec
+        self.interval = interval
+        self._deadlines = {}
+
+    def plan(self, accounts, now):
+        """Return the payouts of one tick, in units, for each funded account.
+
+        accounts is a list of (deposit_address, account) pairs.
+        """
+        funded = []
+        for deposit_address, account in accounts:
+            if account.total_amount <= 0:
+                self.forget(deposit_address)
+                continue
+            deadline = self._deadlines.setdefault(
+                deposit_address, now + self.target_drain_sec
+            )
+            funded.append((deadline, deposit_address, account))
+        funded.sort(key=lambda planned: planned[0])
+
+        budget = max(1, int(self.max_transfers_per_sec * self.interval))
+        payouts = {}
+        for deadline, deposit_address, account in funded:
+            amounts = self._plan_account(account, deadline, now)[:budget]
+            budget -= len(amounts)
+            payouts[deposit_address] = amounts
+        return payouts
+
+    def forget(self, deposit_address):
+        """Drop the deadline of a drained account."""
+        self._deadlines.pop(deposit_address, None)
+
+    def _plan_account(self, account, deadline, now):
+        ticks_left = max(1, math.ceil((deadline - now) / self.interval))
+        balance = account.total_amount
+        increment = account.withdrawal_amount
+        quota = _ceil_div(balance, ticks_left)
+        count = max(
+            1, min(len(account.withdrawal_addresses), _ceil_div(quota, increment))
+        )
+        size = max(increment, _ceil_div(quota, count))
+        amounts = []
+        while len(amounts) < count and balance > 0:
+            units = min(size, balance)
+            amounts.append(units)
+            balance -= units
+        return amounts
+
+
+def _ceil_div(a, b):
+    return -(-a // b)
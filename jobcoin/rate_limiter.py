@@ -0,0 +1,90 @@
+import heapq
+import itertools
+import threading
+import time
+
+from jobcoin.constants import (
+    API_RATE_LIMIT_BURST,
+    API_RATE_LIMIT_DECREASE_FACTOR,
+    API_RATE_LIMIT_MIN_PER_SEC,
+    API_RATE_LIMIT_PER_SEC,
+    API_RATE_LIMIT_RECOVERY,
+)
+
+
+class RateLimiter:
+    """Token bucket shared by all callers, granting tokens by priority.
+
+    Callers waiting for a token are served lowest priority value first, then
+    in arrival order, so interactive requests never queue behind a polling
+    burst. The rate is multiplied by decrease_factor whenever the API
+    signals overload and regains recovery requests per second with every
+    successful response, up to max_rate.
+    """
+
+    def __init__(
+        self,
+        max_rate=API_RATE_LIMIT_PER_SEC,
+        burst=API_RATE_LIMIT_BURST,
+        min_rate=API_RATE_LIMIT_MIN_PER_SEC,
+        decrease_factor=API_RATE_LIMIT_DECREASE_FACTOR,
+        recovery=API_RATE_LIMIT_RECOVERY,
+        clock=time.monotonic,
+    ) -> None:
+        self.max_rate = max_rate
+        self.rate = max_rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.decrease_factor = decrease_factor
+        self.recovery = recovery
+        self.clock = clock
+        self._tokens = burst
+        self._updated = clock()
+        self._waiters = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+
+    def acquire(self, priority):
+        """Block until the caller may send one request."""
+        ticket = (priority, next(self._counter))
+        with self._condition:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    self._refill()
+                    if self._waiters[0] == ticket and self._tokens >= 1:
+                        self._tokens -= 1
+                        heapq.heappop(self._waiters)
+                        self._condition.notify_all()
+                        return
+                    # Only the first waiter needs to wake up for the next token.
+                    self._condition.wait(
+                        (1 - self._tokens) / self.rate
+                        if self._waiters[0] == ticket
+                        else None
+                    )
+            except BaseException:
+                if ticket in self._waiters:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+                    self._condition.notify_all()
+                raise
+
+    def throttle(self):
+        """Lower the rate after the API signalled it is overloaded."""
+        with self._condition:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+
+    def recover(self):
+        """Raise the rate back towards max_rate after a successful request."""
+        with self._condition:
+            if self.rate < self.max_rate:
+                self._refill()
+                self.rate = min(self.max_rate, self.rate + self.recovery)
+                self._condition.notify_all()
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
@@ -0,0 +1,42 @@
+import heapq
+import threading
+
+
+class DueTimeScheduler:
+    """Keys ordered by the time they are next due, backed by a min-heap.
+
+    A key is scheduled at most once: scheduling it again moves it to the new
+    due time. Entries left behind in the heap by a move are dropped lazily
+    when they reach the top.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._heap = []
+        self._due_times = {}
+
+    def __contains__(self, key):
+        return key in self._due_times
+
+    def __len__(self):
+        return len(self._due_times)
+
+    def schedule(self, key, due_time):
+        with self._lock:
+            self._due_times[key] = due_time
+            heapq.heappush(self._heap, (due_time, key))
+
+    def unschedule(self, key):
+        with self._lock:
+            self._due_times.pop(key, None)
+
+    def pop_due(self, now):
+        """Remove and return every key due at or before now, earliest first."""
+        due_keys = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                due_time, key = heapq.heappop(self._heap)
+                if self._due_times.get(key) == due_time:
+                    del self._due_times[key]
+                    due_keys.append(key)
+        return due_keys
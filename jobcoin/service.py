@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+import json
+import logging
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import click
+
+from jobcoin.amounts import from_units
+from jobcoin.api_client import api_client
+from jobcoin.constants import (
+    API_RATE_LIMIT_SERVICE_SHARE,
+    MIXER_SERVICE_HOST,
+    MIXER_SERVICE_PORT,
+    WORKER_CHECK_INTERVAL_SEC,
+)
+from jobcoin.exceptions import (
+    CheckAddressInUseException,
+    InvalidWithdrawalAddressException,
+    WithdrawalAddressInUseException,
+)
+from jobcoin.jobcoin_mixer import jobcoin_mixer
+from jobcoin.metrics import live_accounts, metrics_registry, undistributed_balance
+from jobcoin.store import SQLiteAccountStore
+from jobcoin.sweeper import start_sweeper
+from jobcoin.tasks import distribute_deposits, get_new_deposits, run_at_fixed_rate
+from jobcoin.utils import check_addresses_in_use, check_empty_addresses
+from jobcoin.workers import WorkerPool
+
+DEPOSIT_ADDRESSES_PATH = "/deposit_addresses"
+METRICS_PATH = "/metrics"
+STATUS_PATH = "/status"
+
+
+def start_background_tasks():
+    jobcoin_mixer.house_addresses.load_balances(jobcoin_mixer.client)
+    start_sweeper(jobcoin_mixer)
+    thread1 = Thread(target=get_new_deposits, daemon=True)
+    thread2 = Thread(target=distribute_deposits, daemon=True)
+    thread1.start()
+    thread2.start()
+    return [thread1, thread2]
+
+
+def start_worker_pool(store_path, num_workers):
+    """Run the periodic tasks in worker processes instead of this one.
+
+    This process keeps API_RATE_LIMIT_SERVICE_SHARE of the API rate limit
+    for the address checks of new deposit addresses.
+    """
+    api_client.share_rate_limit(API_RATE_LIMIT_SERVICE_SHARE)
+    pool = WorkerPool(store_path)
+    pool.start(num_workers)
+    Thread(
+        target=run_at_fixed_rate,
+        args=("check_workers", pool.check_workers, WORKER_CHECK_INTERVAL_SEC),
+        daemon=True,
+    ).start()
+    return pool
+
+
+def create_deposit_addresses(mixer, withdrawal_addresses_list):
+    """Validate every list of withdrawal addresses, then create them in bulk.
+
+    Addresses already paid by an account are rejected before any network
+    call. The others are checked for use in one concurrent pass, and nothing
+    is created unless every list is valid.
+    """
+    for withdrawal_addresses in withdrawal_addresses_list:
+        check_empty_addresses(withdrawal_addresses)
+    mixer.check_withdrawal_addresses(withdrawal_addresses_list)
+    check_addresses_in_use(
+        [
+            address
+            for withdrawal_addresses in withdrawal_addresses_list
+            for address in withdrawal_addresses
+        ]
+    )
+    return mixer.get_new_deposit_addresses(withdrawal_addresses_list)
+
+
+def get_account_status(deposit_address, account):
+    return {
+        "deposit_address": deposit_address,
+        "withdrawal_addresses": account.withdrawal_addresses,
+        "balance": _to_jobcoins(account.total_amount),
+        "distributed": _to_jobcoins(account.distributed_amount),
+        "state": account.state,
+    }
+
+
+def get_metrics(handler):
+    """Render the metrics of this process and of the workers, if any.
+
+    The tasks run in the workers, so their counters and histograms are
+    added to the ones of this process. The accounts are re-read first, as
+    the balance gauges are computed from this process's copies of them.
+    """
+    handler.mixer.reload_unowned_accounts()
+    collected = ()
+    if handler.worker_pool is not None:
+        collected = handler.worker_pool.collect_metrics()
+    return metrics_registry.render(collected)
+
+
+def get_status(mixer):
+    mixer.reload_unowned_accounts()
+    snapshot = mixer.deposit_address_store.snapshot()
+    return {
+        "accounts": [
+            get_account_status(deposit_address, account)
+            for deposit_address, account in snapshot
+        ],
+        "total_balance": _to_jobcoins(
+            sum(account.total_amount for _, account in snapshot)
+        ),
+        "total_distributed": _to_jobcoins(
+            sum(account.distributed_amount for _, account in snapshot)
+        ),
+    }
+
+
+def _to_jobcoins(units):
+    return float(from_units(units))
+
+
+class MixerRequestHandler(BaseHTTPRequestHandler):
+    mixer = jobcoin_mixer
+    worker_pool = None
+
+    def do_GET(self):
+        if self.path == STATUS_PATH:
+            self._send_json(200, get_status(self.mixer))
+        elif self.path == METRICS_PATH:
+            self._send(200, "text/plain; version=0.0.4", get_metrics(self).encode())
+        elif self.path.startswith(f"{DEPOSIT_ADDRESSES_PATH}/"):
+            deposit_address = self.path[len(DEPOSIT_ADDRESSES_PATH) + 1 :]
+            self.mixer.reload_unowned_accounts([deposit_address])
+            store = self.mixer.deposit_address_store
+            account = store.get(deposit_address) or store.get_archived(deposit_address)
+            if account is None:
+                self._send_json(404, {"error": f"Unknown address {deposit_address}."})
+            else:
+                self._send_json(200, get_account_status(deposit_address, account))
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}."})
+
+    def do_POST(self):
+        if self.path != DEPOSIT_ADDRESSES_PATH:
+            self._send_json(404, {"error": f"Unknown path {self.path}."})
+            return
+
+        withdrawal_addresses_list = self._read_withdrawal_addresses_list()
+        if withdrawal_addresses_list is None:
+            self._send_json(
+                400,
+                {
+                    "error": "Expected a JSON body of the form "
+                    '{"withdrawal_addresses": [[address, ...], ...]}.'
+                },
+            )
+            return
+
+        try:
+            deposit_addresses = create_deposit_addresses(
+                self.mixer, withdrawal_addresses_list
+            )
+        except (
+            InvalidWithdrawalAddressException,
+            WithdrawalAddressInUseException,
+        ) as e:
+            self._send_json(400, {"error": str(e)})
+        except CheckAddressInUseException as e:
+            self._send_json(503, {"error": str(e)})
+        else:
+            self._send_json(201, {"deposit_addresses": deposit_addresses})
+
+    def log_message(self, format, *args):
+        logging.info("[Service] " + format, *args)
+
+    def _read_withdrawal_addresses_list(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            withdrawal_addresses_list = json.loads(self.rfile.read(length))[
+                "withdrawal_addresses"
+            ]
+        except (ValueError, KeyError, TypeError):
+            return None
+        if not isinstance(withdrawal_addresses_list, list) or not all(
+            isinstance(withdrawal_addresses, list)
+            and withdrawal_addresses
+            and all(isinstance(address, str) for address in withdrawal_addresses)
+            for withdrawal_addresses in withdrawal_addresses_list
+        ):
+            return None
+        return withdrawal_addresses_list
+
+    def _send_json(self, status, body):
+        self._send(status, "application/json", json.dumps(body).encode())
+
+    def _send(self, status, content_type, payload):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def bind_metrics(mixer):
+    live_accounts.set_function(lambda: len(mixer.deposit_address_store))
+    undistributed_balance.set_function(
+        lambda: _to_jobcoins(
+            sum(
+                account.total_amount
+                for _, account in mixer.deposit_address_store.snapshot()
+            )
+        )
+    )
+
+
+def create_server(host, port, mixer=jobcoin_mixer, worker_pool=None):
+    handler = type(
+        "BoundMixerRequestHandler",
+        (MixerRequestHandler,),
+        {"mixer": mixer, "worker_pool": worker_pool},
+    )
+    return ThreadingHTTPServer((host, port), handler)
+
+
+@click.command()
+@click.option("--host", default=MIXER_SERVICE_HOST, show_default=True)
+@click.option("--port", default=MIXER_SERVICE_PORT, show_default=True)
+@click.option(
+    "--store",
+    "store_path",
+    default=None,
+    help="SQLite file to persist deposit addresses in. Kept in memory if omitted.",
+)
+@click.option(
+    "--workers",
+    "num_workers",
+    default=0,
+    show_default=True,
+    help="Worker processes to shard deposit addresses across. Requires --store. "
+    "With 0, the periodic tasks run in the service process.",
+)
+def main(host, port, store_path=None, num_workers=0):
+    if num_workers and not store_path:
+        raise click.UsageError("--workers requires --store.")
+    if store_path:
+        jobcoin_mixer.use_store(SQLiteAccountStore(store_path))
+    bind_metrics(jobcoin_mixer)
+    worker_pool = None
+    if num_workers:
+        # The service only creates accounts and reads the ones workers serve.
+        jobcoin_mixer.set_shards(())
+        worker_pool = start_worker_pool(store_path, num_workers)
+    else:
+        start_background_tasks()
+    server = create_server(host, port, worker_pool=worker_pool)
+    click.echo(f"Jobcoin mixer service listening on http://{host}:{port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
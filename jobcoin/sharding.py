@@ -0,0 +1,84 @@
+import bisect
+import hashlib
+
+from jobcoin.constants import SHARD_COUNT, SHARD_VIRTUAL_NODES
+
+
+def get_shard(deposit_address, shard_count=SHARD_COUNT):
+    """Return the shard of a deposit address, stable across processes."""
+    return _hash(deposit_address) % shard_count
+
+
+class HashRing:
+    """Consistent hash ring mapping keys to nodes.
+
+    Each node owns SHARD_VIRTUAL_NODES points on the ring, so adding or
+    removing a node only moves the keys next to its points.
+    """
+
+    def __init__(self, nodes=(), virtual_nodes=SHARD_VIRTUAL_NODES) -> None:
+        self.virtual_nodes = virtual_nodes
+        self._points = []
+        self._nodes = {}
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len(set(self._nodes.values()))
+
+    def add(self, node):
+        for i in range(self.virtual_nodes):
+            point = _hash(f"{node}#{i}")
+            self._nodes[point] = node
+            bisect.insort(self._points, point)
+
+    def remove(self, node):
+        for i in range(self.virtual_nodes):
+            point = _hash(f"{node}#{i}")
+            if self._nodes.get(point) == node:
+                del self._nodes[point]
+                self._points.remove(point)
+
+    def get_node(self, key):
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._nodes[self._points[index]]
+
+
+class ShardCoordinator:
+    """Assigns the SHARD_COUNT shards to workers by consistent hashing.
+
+    join() and leave() return the assignment before and after the change,
+    so the caller can revoke moved shards from their old owner before
+    granting them to the new one.
+    """
+
+    def __init__(self, shard_count=SHARD_COUNT) -> None:
+        self.shard_count = shard_count
+        self.ring = HashRing()
+        self.workers = set()
+
+    def join(self, worker_id):
+        old_assignment = self.get_assignment()
+        self.workers.add(worker_id)
+        self.ring.add(worker_id)
+        return old_assignment, self.get_assignment()
+
+    def leave(self, worker_id):
+        old_assignment = self.get_assignment()
+        self.workers.discard(worker_id)
+        self.ring.remove(worker_id)
+        return old_assignment, self.get_assignment()
+
+    def get_assignment(self):
+        assignment = {worker_id: set() for worker_id in self.workers}
+        for shard in range(self.shard_count):
+            worker_id = self.ring.get_node(f"shard-{shard}")
+            if worker_id is not None:
+                assignment[worker_id].add(shard)
+        return assignment
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
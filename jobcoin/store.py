@@ -0,0 +1,508 @@
+import json
+import sqlite3
+import threading
+from dataclasses import asdict
+
+from jobcoin.account import Account
+from jobcoin.constants import ACCOUNT_LOCK_STRIPES, ACCOUNT_STORE_LOAD_BATCH_SIZE
+from jobcoin.sweeper import Sweep
+
+# Stays below SQLite's default limit of 999 bound parameters.
+RELOAD_BATCH_SIZE = 500
+
+
+class AccountStore(dict):
+    """Deposit address to Account mapping kept in memory only.
+
+    Everything stored here is lost when the process exits. Subclasses persist
+    accounts: callers mark modified accounts with save() and flush them all
+    at once with commit(), typically once per task cycle.
+
+    The store also journals the sweeps of deposits to the house address
+    that are not done yet, see jobcoin.sweeper.
+
+    Accounts may be added while other threads read the store. Readers that
+    iterate use snapshot(), which is only copied again after the set of
+    accounts changed. Changes to an account's balance are made under
+    account_lock(), which commit() also holds while writing the account.
+
+    Every withdrawal address is indexed to the deposit address paying it, so
+    that an address already paid by an account can be found without
+    scanning the accounts.
+
+    Archived accounts are moved out of the store into a cold archive, which
+    is only looked up by deposit address, until they are unarchived. Their
+    withdrawal addresses stay in the index, so that no new account can be
+    registered to pay them in the meantime. The archived deposit addresses
+    are kept in memory too, but not their accounts.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._sweeps = {}
+        self._failed_sweeps = {}
+        self._registry_lock = threading.Lock()
+        self._version = 0
+        self._snapshot = (None, ())
+        self._paying_accounts = {}
+        self._archived_addresses = set()
+        self._archive = {}
+        self._account_locks = [threading.Lock() for _ in range(ACCOUNT_LOCK_STRIPES)]
+
+    def __setitem__(self, deposit_address, account):
+        with self._registry_lock:
+            self._set_account(deposit_address, account)
+            self._version += 1
+
+    def __delitem__(self, deposit_address):
+        self._remove(deposit_address)
+
+    def get_paying_account(self, withdrawal_address):
+        """Return the deposit address paying withdrawal_address, if any."""
+        return self._paying_accounts.get(withdrawal_address)
+
+    def get_paid_addresses(self, withdrawal_addresses):
+        """Return those of withdrawal_addresses paid by some account."""
+        return [
+            address
+            for address in withdrawal_addresses
+            if address in self._paying_accounts
+        ]
+
+    def snapshot(self):
+        """Return the (deposit_address, account) pairs as of now."""
+        version, items = self._snapshot
+        if version != self._version:
+            with self._registry_lock:
+                version = self._version
+                items = tuple(super().items())
+                self._snapshot = (version, items)
+        return items
+
+    def account_lock(self, deposit_address):
+        """Lock guarding the balances of an account, shared with a few others."""
+        return self._account_locks[hash(deposit_address) % len(self._account_locks)]
+
+    def archive(self, deposit_address):
+        """Move an account from the store to the archive."""
+        self._archive[deposit_address] = self._remove(deposit_address, reserve=True)
+
+    def unarchive(self, deposit_address):
+        """Move an archived account back into the store and return it."""
+        account = self._archive.pop(deposit_address)
+        self[deposit_address] = account
+        return account
+
+    def get_archived(self, deposit_address):
+        """Return the archived account of deposit_address, if any."""
+        return self._archive.get(deposit_address)
+
+    def get_archived_addresses(self, deposit_addresses=None):
+        """Return those of deposit_addresses that are archived, all if None."""
+        if deposit_addresses is None:
+            with self._registry_lock:
+                return list(self._archived_addresses)
+        return [
+            deposit_address
+            for deposit_address in deposit_addresses
+            if deposit_address in self._archive
+        ]
+
+    def _remove(self, deposit_address, reserve=False):
+        with self._registry_lock:
+            account = self[deposit_address]
+            if reserve:
+                self._archived_addresses.add(deposit_address)
+            else:
+                self._unindex(deposit_address, account)
+            super().__delitem__(deposit_address)
+            self._version += 1
+        return account
+
+    def _update(self, accounts):
+        with self._registry_lock:
+            for deposit_address, account in accounts:
+                self._set_account(deposit_address, account)
+            self._version += 1
+
+    def _set_account(self, deposit_address, account):
+        previous = self.get(deposit_address)
+        if previous is not None:
+            self._unindex(deposit_address, previous)
+        super().__setitem__(deposit_address, account)
+        self._archived_addresses.discard(deposit_address)
+        for withdrawal_address in account.withdrawal_addresses:
+            self._paying_accounts[withdrawal_address] = deposit_address
+
+    def _reserve(self, accounts):
+        # Indexes the withdrawal addresses of accounts that are not in the
+        # store, without taking them from accounts that are.
+        with self._registry_lock:
+            for deposit_address, account in accounts:
+                if deposit_address not in self:
+                    self._archived_addresses.add(deposit_address)
+                for withdrawal_address in account.withdrawal_addresses:
+                    self._paying_accounts.setdefault(
+                        withdrawal_address, deposit_address
+                    )
+
+    def _unindex(self, deposit_address, account):
+        for withdrawal_address in account.withdrawal_addresses:
+            if self._paying_accounts.get(withdrawal_address) == deposit_address:
+                del self._paying_accounts[withdrawal_address]
+
+    def add_sweep(self, sweep):
+        self._sweeps[sweep.key] = sweep
+
+    def complete_sweep(self, sweep):
+        self._sweeps.pop(sweep.key, None)
+
+    def fail_sweep(self, sweep):
+        """Keep a sweep given up on in the journal, but not as pending."""
+        self._sweeps.pop(sweep.key, None)
+        self._failed_sweeps[sweep.key] = sweep
+
+    def get_pending_sweeps(self):
+        return list(self._sweeps.values())
+
+    def get_failed_sweeps(self):
+        return list(self._failed_sweeps.values())
+
+    def save(self, deposit_address):
+        pass
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+    def refresh(self):
+        """Load accounts added by other processes and return their addresses."""
+        return []
+
+    def reload(self, deposit_addresses=None):
+        """Re-read accounts, all of them if deposit_addresses is None."""
+        pass
+
+
+class SQLiteAccountStore(AccountStore):
+    """AccountStore backed by an embedded SQLite database in WAL mode.
+
+    All accounts are read into memory when the store is opened. Modified
+    accounts are written back in a single transaction on each commit().
+
+    Journaled sweeps are written in the same transaction as the accounts,
+    so the cursor past a deposit is never written before its sweep. Failed
+    sweeps keep their rows, flagged as failed.
+
+    Several processes may share one database as long as each account is
+    written by one of them only. Every write gives the row a new rowid, so
+    rows with a rowid above the highest one seen are new to this process.
+
+    Archived accounts keep their rows, flagged as archived, but are not
+    read into memory. Rows are never deleted, which keeps rowids increasing.
+
+    save() and the sweep journal only take a lock guarding the buffers of
+    changes. commit() swaps those out and writes them under a separate lock
+    that serialises use of the database connection.
+    """
+
+    def __init__(self, path, load_batch_size=ACCOUNT_STORE_LOAD_BATCH_SIZE):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._connection_lock = threading.Lock()
+        self._dirty = set()
+        self._added_sweeps = {}
+        self._completed_sweeps = set()
+        self._failed_sweeps = {}
+        self._archived = {}
+        self._last_rowid = 0
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS accounts "
+            "(deposit_address TEXT PRIMARY KEY, account TEXT NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS sweeps (deposit_address TEXT NOT NULL, "
+            "sequence INTEGER NOT NULL, amount INTEGER NOT NULL, "
+            "PRIMARY KEY (deposit_address, sequence))"
+        )
+        columns = [
+            row[1] for row in self._connection.execute("PRAGMA table_info(accounts)")
+        ]
+        if "archived" not in columns:
+            self._connection.execute(
+                "ALTER TABLE accounts ADD COLUMN archived INTEGER NOT NULL DEFAULT 0"
+            )
+        columns = [
+            row[1] for row in self._connection.execute("PRAGMA table_info(sweeps)")
+        ]
+        if "failed" not in columns:
+            self._connection.execute(
+                "ALTER TABLE sweeps ADD COLUMN failed INTEGER NOT NULL DEFAULT 0"
+            )
+        self._connection.commit()
+        self._load(load_batch_size)
+
+    def __setitem__(self, deposit_address, account):
+        super().__setitem__(deposit_address, account)
+        self.save(deposit_address)
+
+    def save(self, deposit_address):
+        with self._lock:
+            self._dirty.add(deposit_address)
+
+    def archive(self, deposit_address):
+        # Under the lock, so the account never sits in neither the store nor
+        # the buffer of archived accounts while a commit swaps them out.
+        with self._lock:
+            account = self._remove(deposit_address, reserve=True)
+            self._dirty.discard(deposit_address)
+            self._archived[deposit_address] = account
+
+    def unarchive(self, deposit_address):
+        with self._connection_lock:
+            with self._lock:
+                account = self._archived.pop(deposit_address, None)
+            if account is None:
+                account = self._read_archived(deposit_address)
+        self[deposit_address] = account
+        return account
+
+    def get_archived(self, deposit_address):
+        with self._connection_lock:
+            with self._lock:
+                account = self._archived.get(deposit_address)
+            if account is None and deposit_address not in self:
+                account = self._read_archived(deposit_address)
+            return account
+
+    def get_archived_addresses(self, deposit_addresses=None):
+        # All of them are known from the archived rows read so far.
+        if deposit_addresses is None:
+            return super().get_archived_addresses()
+        deposit_addresses = list(deposit_addresses)
+        with self._connection_lock:
+            with self._lock:
+                archived = {
+                    deposit_address
+                    for deposit_address in deposit_addresses
+                    if deposit_address in self._archived
+                }
+            for start in range(0, len(deposit_addresses), RELOAD_BATCH_SIZE):
+                batch = deposit_addresses[start : start + RELOAD_BATCH_SIZE]
+                cursor = self._connection.execute(
+                    "SELECT deposit_address FROM accounts WHERE archived AND "
+                    f"deposit_address IN ({','.join('?' * len(batch))})",
+                    batch,
+                )
+                archived.update(
+                    deposit_address
+                    for deposit_address, in cursor
+                    if deposit_address not in self
+                )
+            return list(archived)
+
+    def _read_archived(self, deposit_address):
+        row = self._connection.execute(
+            "SELECT account FROM accounts WHERE archived AND deposit_address = ?",
+            (deposit_address,),
+        ).fetchone()
+        return Account.from_dict(json.loads(row[0])) if row is not None else None
+
+    def add_sweep(self, sweep):
+        with self._lock:
+            self._added_sweeps[sweep.key] = sweep
+
+    def complete_sweep(self, sweep):
+        with self._lock:
+            if self._added_sweeps.pop(sweep.key, None) is None:
+                self._completed_sweeps.add(sweep.key)
+
+    def fail_sweep(self, sweep):
+        with self._lock:
+            self._added_sweeps.pop(sweep.key, None)
+            self._failed_sweeps[sweep.key] = sweep
+
+    def get_pending_sweeps(self):
+        with self._connection_lock, self._lock:
+            rows = self._connection.execute(
+                "SELECT deposit_address, sequence, amount FROM sweeps WHERE NOT failed"
+            ).fetchall()
+            sweeps = {
+                (deposit_address, sequence): Sweep(deposit_address, sequence, amount)
+                for deposit_address, sequence, amount in rows
+                if (deposit_address, sequence) not in self._completed_sweeps
+                and (deposit_address, sequence) not in self._failed_sweeps
+            }
+            sweeps.update(self._added_sweeps)
+            return list(sweeps.values())
+
+    def get_failed_sweeps(self):
+        with self._connection_lock, self._lock:
+            rows = self._connection.execute(
+                "SELECT deposit_address, sequence, amount FROM sweeps WHERE failed"
+            ).fetchall()
+            sweeps = {
+                (deposit_address, sequence): Sweep(deposit_address, sequence, amount)
+                for deposit_address, sequence, amount in rows
+            }
+            sweeps.update(self._failed_sweeps)
+            return list(sweeps.values())
+
+    def commit(self):
+        # Commits run one at a time, so an older copy of an account is never
+        # written after a newer one.
+        with self._connection_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+                added_sweeps, self._added_sweeps = self._added_sweeps, {}
+                completed_sweeps = self._completed_sweeps
+                self._completed_sweeps = set()
+                failed_sweeps, self._failed_sweeps = self._failed_sweeps, {}
+                archived, self._archived = self._archived, {}
+            if not (
+                dirty or added_sweeps or completed_sweeps or failed_sweeps or archived
+            ):
+                return
+            rows = []
+            for deposit_address in dirty:
+                account = self.get(deposit_address)
+                if account is None:
+                    # Archived since it was saved, and written as archived.
+                    continue
+                with self.account_lock(deposit_address):
+                    account = asdict(account)
+                rows.append((deposit_address, json.dumps(account), False))
+            rows.extend(
+                (deposit_address, json.dumps(asdict(account)), True)
+                for deposit_address, account in archived.items()
+            )
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO accounts "
+                    "(deposit_address, account, archived) VALUES (?, ?, ?)",
+                    rows,
+                )
+                if added_sweeps:
+                    self._connection.executemany(
+                        "INSERT OR IGNORE INTO sweeps "
+                        "(deposit_address, sequence, amount) VALUES (?, ?, ?)",
+                        [
+                            (sweep.deposit_address, sweep.sequence, sweep.amount)
+                            for sweep in added_sweeps.values()
+                        ],
+                    )
+                if failed_sweeps:
+                    self._connection.executemany(
+                        "INSERT OR REPLACE INTO sweeps "
+                        "(deposit_address, sequence, amount, failed) "
+                        "VALUES (?, ?, ?, 1)",
+                        [
+                            (sweep.deposit_address, sweep.sequence, sweep.amount)
+                            for sweep in failed_sweeps.values()
+                        ],
+                    )
+                if completed_sweeps:
+                    self._connection.executemany(
+                        "DELETE FROM sweeps WHERE deposit_address = ? AND sequence = ?",
+                        completed_sweeps,
+                    )
+
+    def close(self):
+        self.commit()
+        with self._connection_lock:
+            self._connection.close()
+
+    def refresh(self):
+        with self._connection_lock:
+            cursor = self._connection.execute(
+                "SELECT rowid, deposit_address, account, archived FROM accounts "
+                "WHERE rowid > ?",
+                (self._last_rowid,),
+            )
+            new_addresses = []
+            archived_accounts = []
+            for rowid, deposit_address, account, archived in cursor:
+                self._last_rowid = max(self._last_rowid, rowid)
+                if archived:
+                    archived_accounts.append(
+                        (deposit_address, Account.from_dict(json.loads(account)))
+                    )
+                # Rows rewritten by this process come back too; the in-memory
+                # copy of those may already be ahead of the database.
+                elif deposit_address not in self:
+                    new_addresses.append(
+                        (deposit_address, Account.from_dict(json.loads(account)))
+                    )
+            self._update(new_addresses)
+            self._forget(deposit_address for deposit_address, _ in archived_accounts)
+            self._reserve(archived_accounts)
+            return [deposit_address for deposit_address, _ in new_addresses]
+
+    def reload(self, deposit_addresses=None):
+        with self._connection_lock:
+            if deposit_addresses is None:
+                self._load(ACCOUNT_STORE_LOAD_BATCH_SIZE)
+                return
+            deposit_addresses = list(deposit_addresses)
+            for start in range(0, len(deposit_addresses), RELOAD_BATCH_SIZE):
+                batch = deposit_addresses[start : start + RELOAD_BATCH_SIZE]
+                cursor = self._connection.execute(
+                    "SELECT rowid, deposit_address, account FROM accounts "
+                    "WHERE NOT archived AND "
+                    f"deposit_address IN ({','.join('?' * len(batch))})",
+                    batch,
+                )
+                # Leaves _last_rowid alone: rows between it and these were
+                # not read and still have to be picked up by refresh().
+                found = self._update_rows(cursor.fetchall())
+                self._forget(set(batch) - found)
+
+    def _load(self, load_batch_size):
+        cursor = self._connection.execute(
+            "SELECT rowid, deposit_address, account FROM accounts WHERE NOT archived"
+        )
+        found = set()
+        while True:
+            rows = cursor.fetchmany(load_batch_size)
+            if not rows:
+                break
+            self._last_rowid = max(self._last_rowid, max(row[0] for row in rows))
+            found.update(self._update_rows(rows))
+        self._forget(
+            deposit_address
+            for deposit_address, _ in self.snapshot()
+            if deposit_address not in found
+        )
+        cursor = self._connection.execute(
+            "SELECT deposit_address, account FROM accounts WHERE archived"
+        )
+        while True:
+            rows = cursor.fetchmany(load_batch_size)
+            if not rows:
+                break
+            self._reserve(
+                (deposit_address, Account.from_dict(json.loads(account)))
+                for deposit_address, account in rows
+            )
+
+    def _update_rows(self, rows):
+        accounts = [
+            (deposit_address, Account.from_dict(json.loads(account)))
+            for _, deposit_address, account in rows
+        ]
+        self._update(accounts)
+        return {deposit_address for deposit_address, _ in accounts}
+
+    def _forget(self, deposit_addresses):
+        # Drops accounts archived by another process from memory, keeping
+        # those with changes not committed yet, and their withdrawal
+        # addresses reserved.
+        with self._lock:
+            for deposit_address in deposit_addresses:
+                if deposit_address in self and deposit_address not in self._dirty:
+                    self._remove(deposit_address, reserve=True)
@@ -0,0 +1,235 @@
+import logging
+import queue
+import threading
+import time
+import zlib
+
+from jobcoin.constants import (
+    SWEEP_CONCURRENCY,
+    SWEEP_MAX_ATTEMPTS,
+    SWEEP_QUEUE_SIZE,
+    SWEEP_RETRY_BACKOFF_MAX_SEC,
+    SWEEP_RETRY_BACKOFF_SEC,
+    TRANSFER_SENT,
+    TRANSFER_UNKNOWN,
+)
+
+
+class Sweep:
+    """Transfer of deposits, in fixed-point units, to the house address."""
+
+    __slots__ = ("deposit_address", "sequence", "amount", "attempted")
+
+    def __init__(self, deposit_address, sequence, amount, attempted=False) -> None:
+        self.deposit_address = deposit_address
+        self.sequence = sequence
+        self.amount = amount
+        # Whether a transfer may already have gone through: it timed out,
+        # got a 5xx response, or was sent before a crash.
+        self.attempted = attempted
+
+    @property
+    def key(self):
+        return self.deposit_address, self.sequence
+
+
+class Sweeper:
+    """Sweeps detected deposits to the house address off the polling path.
+
+    Polling journals each sweep in the account store, to be committed with
+    the account's cursor, and hands it to a bounded queue. Each deposit
+    address always maps to the same queue and thread, so its sweeps run in
+    order. A sweep is retried until it succeeds and only then credited, up
+    to max_attempts times. After that it is marked failed in the journal,
+    logged, and left for an operator, so that it does not hold up the later
+    sweeps of its queue. Its deposits are not credited.
+
+    Transfers cannot be deduplicated by the API, so before resending a sweep
+    that may have gone through, the outgoing transfers of the deposit
+    address are added up. Sweeps of an address run in order and all of them
+    are credited, so the previous attempt went through if they exceed what
+    the account was credited by this sweep's amount. A rejected transfer
+    (4xx) is known not to have gone through and is simply sent again.
+    Journaled sweeps left over from a crash are replayed this way.
+    """
+
+    def __init__(
+        self,
+        mixer,
+        concurrency=SWEEP_CONCURRENCY,
+        queue_size=SWEEP_QUEUE_SIZE,
+        sleep=time.sleep,
+        max_attempts=SWEEP_MAX_ATTEMPTS,
+    ) -> None:
+        self.mixer = mixer
+        self.max_attempts = max_attempts
+        self.queues = [queue.Queue(queue_size) for _ in range(concurrency)]
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._pending = set()
+
+    def submit(self, deposit_address, amount):
+        """Journal and queue the sweep of amount from a deposit address.
+
+        Returns False when the queue is full, so the deposit is picked up
+        again by the next poll.
+        """
+        store = self.mixer.deposit_address_store
+        account = store[deposit_address]
+        sweep = Sweep(deposit_address, account.sweep_sequence + 1, amount)
+        # Already journaled if a crash lost the cursor but not the journal.
+        if sweep.key not in self._pending:
+            sweep_queue = self._get_queue(deposit_address)
+            if sweep_queue.full():
+                logging.info(
+                    "Sweep queue full, deferring deposit to %s", deposit_address
+                )
+                return False
+            store.add_sweep(sweep)
+            self._track(sweep)
+            sweep_queue.put_nowait(sweep)
+        account.sweep_sequence = sweep.sequence
+        store.save(deposit_address)
+        return True
+
+    def replay(self):
+        """Queue the journaled sweeps of owned accounts that are not queued."""
+        store = self.mixer.deposit_address_store
+        for sweep in store.get_pending_sweeps():
+            if (
+                sweep.key in self._pending
+                or sweep.deposit_address not in store
+                or not self.mixer.owns(sweep.deposit_address)
+            ):
+                continue
+            sweep.attempted = True
+            self._track(sweep)
+            self._get_queue(sweep.deposit_address).put(sweep)
+
+    def start(self):
+        threads = [
+            threading.Thread(target=self._run, args=(sweep_queue,), daemon=True)
+            for sweep_queue in self.queues
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def join(self, timeout=None):
+        """Wait until every queued sweep is done, or timeout seconds.
+
+        Returns whether they are all done.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for sweep_queue in self.queues:
+            with sweep_queue.all_tasks_done:
+                while sweep_queue.unfinished_tasks:
+                    if deadline is None:
+                        sweep_queue.all_tasks_done.wait()
+                        continue
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    sweep_queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _run(self, sweep_queue):
+        while True:
+            sweep = sweep_queue.get()
+            try:
+                self._process_until_done(sweep)
+            finally:
+                sweep_queue.task_done()
+
+    def _process_until_done(self, sweep):
+        # Later sweeps of the address must wait for this one, so it is
+        # retried rather than skipped, until it is given up on.
+        backoff = SWEEP_RETRY_BACKOFF_SEC
+        for _ in range(self.max_attempts - 1):
+            try:
+                self.process(sweep)
+                return
+            except Exception:
+                logging.exception("Error processing sweep of %s", sweep.deposit_address)
+            self.sleep(backoff)
+            backoff = min(backoff * 2, SWEEP_RETRY_BACKOFF_MAX_SEC)
+        try:
+            self.process(sweep)
+        except Exception:
+            logging.exception("Error processing sweep of %s", sweep.deposit_address)
+            self._fail(sweep)
+
+    def process(self, sweep):
+        store = self.mixer.deposit_address_store
+        account = store[sweep.deposit_address]
+        if sweep.sequence > account.credited_sweep_sequence:
+            backoff = SWEEP_RETRY_BACKOFF_SEC
+            attempts = 1
+            while not self._send(sweep):
+                if attempts >= self.max_attempts:
+                    self._fail(sweep)
+                    return
+                attempts += 1
+                self.sleep(backoff)
+                backoff = min(backoff * 2, SWEEP_RETRY_BACKOFF_MAX_SEC)
+            self.mixer.credit_deposit(
+                sweep.deposit_address,
+                sweep.amount,
+                sweep_sequence=sweep.sequence,
+            )
+        store.complete_sweep(sweep)
+        self._untrack(sweep)
+
+    def _send(self, sweep):
+        if sweep.attempted:
+            sent = self._is_sent(sweep)
+            if sent is None:
+                return False
+            if sent:
+                house_addresses = self.mixer.house_addresses
+                house_addresses.credit(
+                    house_addresses.get_sweep_address(sweep.deposit_address),
+                    sweep.amount,
+                )
+                return True
+            sweep.attempted = False
+        outcome = self.mixer.transfer_to_house_address(
+            sweep.deposit_address, sweep.amount
+        )
+        sweep.attempted = outcome == TRANSFER_UNKNOWN
+        return outcome == TRANSFER_SENT
+
+    def _is_sent(self, sweep):
+        uncredited = self.mixer.get_uncredited_sweeps(sweep.deposit_address)
+        return None if uncredited is None else uncredited >= sweep.amount
+
+    def _fail(self, sweep):
+        logging.error(
+            "Giving up on sweep %d of %s after %d attempts; it %s",
+            sweep.sequence,
+            sweep.deposit_address,
+            self.max_attempts,
+            "may have been sent" if sweep.attempted else "was not sent",
+        )
+        self.mixer.deposit_address_store.fail_sweep(sweep)
+        self._untrack(sweep)
+
+    def _track(self, sweep):
+        with self._lock:
+            self._pending.add(sweep.key)
+
+    def _untrack(self, sweep):
+        with self._lock:
+            self._pending.discard(sweep.key)
+
+    def _get_queue(self, deposit_address):
+        return self.queues[zlib.crc32(deposit_address.encode()) % len(self.queues)]
+
+
+def start_sweeper(mixer):
+    """Sweep the mixer's deposits in the background from now on."""
+    sweeper = Sweeper(mixer)
+    mixer.sweeper = sweeper
+    sweeper.start()
+    sweeper.replay()
+    return sweeper
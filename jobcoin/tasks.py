@@ -1,28 +1,83 @@
-import datetime
 import logging
+import math
 import time
+from contextlib import contextmanager
 
 from jobcoin.constants import (
+    DEPOSIT_DETECTION_MODE,
+    DEPOSIT_DETECTION_MODE_FEED,
     DISTRIBUTE_DEPOSITS_INTERVAL_SEC,
+    GET_NEW_DEPOSITS_FROM_FEED_INTERVAL_SEC,
     GET_NEW_DEPOSITS_INTERVAL_SEC,
 )
 from jobcoin.jobcoin_mixer import jobcoin_mixer
+from jobcoin.metrics import (
+    task_duration_seconds,
+    task_failures_total,
+    task_overruns_total,
+)
 
 
 def get_new_deposits():
-    global jobcoin_mixer
-    while True:
-        logging.info("[Task] get_new_deposits")
-        offset = datetime.datetime.utcnow() - datetime.timedelta(
-            seconds=GET_NEW_DEPOSITS_INTERVAL_SEC
-        )
-        jobcoin_mixer.get_new_deposits(offset)
-        time.sleep(GET_NEW_DEPOSITS_INTERVAL_SEC)
+    run_at_fixed_rate(
+        "get_new_deposits",
+        (
+            jobcoin_mixer.get_new_deposits_from_feed
+            if DEPOSIT_DETECTION_MODE == DEPOSIT_DETECTION_MODE_FEED
+            else jobcoin_mixer.get_new_deposits
+        ),
+        get_new_deposits_interval(),
+    )
+
+
+def get_new_deposits_interval():
+    if DEPOSIT_DETECTION_MODE == DEPOSIT_DETECTION_MODE_FEED:
+        return GET_NEW_DEPOSITS_FROM_FEED_INTERVAL_SEC
+    return GET_NEW_DEPOSITS_INTERVAL_SEC
 
 
 def distribute_deposits():
-    global jobcoin_mixer
+    run_at_fixed_rate(
+        "distribute_deposits",
+        jobcoin_mixer.distribute_deposits,
+        DISTRIBUTE_DEPOSITS_INTERVAL_SEC,
+    )
+
+
+def run_at_fixed_rate(task, work, interval, clock=time.monotonic, sleep=time.sleep):
+    """Run work every interval seconds, measured from start to start.
+
+    Runs are aligned to a fixed grid so the period does not drift by however
+    long work took. A run that overruns skips the grid slots it missed
+    instead of running back to back to catch up.
+
+    A run that raises is logged and counted, and the schedule goes on, so
+    one bad run does not stop the task for good.
+    """
+    next_run = clock()
     while True:
-        logging.info("[Task] distribute_deposits")
-        jobcoin_mixer.distribute_deposits()
-        time.sleep(DISTRIBUTE_DEPOSITS_INTERVAL_SEC)
+        logging.info("[Task] %s", task)
+        with _timed_task(task, interval):
+            try:
+                work()
+            except Exception:
+                logging.exception("[Task] %s failed", task)
+                task_failures_total.inc(task=task)
+        next_run += interval
+        now = clock()
+        if next_run < now:
+            next_run += math.ceil((now - next_run) / interval) * interval
+        sleep(next_run - now)
+
+
+@contextmanager
+def _timed_task(task, interval):
+    """Record how long a task run took and whether it overran its interval."""
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        duration = time.monotonic() - start
+        task_duration_seconds.observe(duration, task=task)
+        if duration > interval:
+            task_overruns_total.inc(task=task)
@@ -0,0 +1,92 @@
+import calendar
+import datetime
+from functools import lru_cache
+
+from jobcoin.amounts import to_units
+
+
+class Transaction:
+    """A decoded API transaction.
+
+    timestamp is integer milliseconds since the epoch and amount is integer
+    fixed-point units, so comparing and summing them needs no further parsing.
+    """
+
+    __slots__ = ("timestamp", "from_address", "to_address", "amount")
+
+    def __init__(self, timestamp, from_address, to_address, amount) -> None:
+        self.timestamp = timestamp
+        self.from_address = from_address
+        self.to_address = to_address
+        self.amount = amount
+
+    def __repr__(self):
+        return (
+            f"Transaction({self.timestamp}, {self.from_address!r}, "
+            f"{self.to_address!r}, {self.amount})"
+        )
+
+    @classmethod
+    def from_json(cls, transaction, timestamp=None):
+        return cls(
+            (
+                parse_timestamp(transaction["timestamp"])
+                if timestamp is None
+                else timestamp
+            ),
+            transaction.get("fromAddress"),
+            transaction["toAddress"],
+            to_units(transaction["amount"]),
+        )
+
+    @property
+    def key(self):
+        """Identity of the transaction; the API does not assign ids."""
+        return f"{self.timestamp}|{self.from_address}|{self.to_address}|{self.amount}"
+
+
+def decode_new_transactions(transactions, after_timestamp=None, after_key=None):
+    """Decode the transactions after a cursor, oldest first.
+
+    transactions is the API's list, oldest first. It is walked newest to
+    oldest and the walk stops at the first entry older than after_timestamp
+    or whose key is after_key. Only the timestamp of that entry is parsed;
+    older entries are never looked at.
+    """
+    new_transactions = []
+    for transaction in reversed(transactions):
+        timestamp = parse_timestamp(transaction["timestamp"])
+        if after_timestamp is not None and timestamp < after_timestamp:
+            break
+        decoded = Transaction.from_json(transaction, timestamp)
+        if timestamp == after_timestamp and decoded.key == after_key:
+            break
+        new_transactions.append(decoded)
+    new_transactions.reverse()
+    return new_transactions
+
+
+def parse_timestamp(timestamp):
+    """Return an ISO-8601 timestamp as integer milliseconds since the epoch."""
+    # Fast path for the API's own format, e.g. 2022-10-13T03:17:31.170Z.
+    if len(timestamp) == 24 and timestamp[23] == "Z" and timestamp[19] == ".":
+        return (
+            _get_epoch_day_seconds(timestamp[:10])
+            + int(timestamp[11:13]) * 3600
+            + int(timestamp[14:16]) * 60
+            + int(timestamp[17:19])
+        ) * 1000 + int(timestamp[20:23])
+    parsed = datetime.datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%S.%f%z")
+    return calendar.timegm(parsed.utctimetuple()) * 1000 + parsed.microsecond // 1000
+
+
+def datetime_to_timestamp(value):
+    """Return a naive UTC datetime as integer milliseconds since the epoch."""
+    return calendar.timegm(value.timetuple()) * 1000 + value.microsecond // 1000
+
+
+@lru_cache(maxsize=4096)
+def _get_epoch_day_seconds(date):
+    return calendar.timegm(
+        (int(date[0:4]), int(date[5:7]), int(date[8:10]), 0, 0, 0, 0, 0, 0)
+    )
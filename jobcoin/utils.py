@@ -1,6 +1,10 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 
-from jobcoin.constants import API_ADDRESS_URL
+from jobcoin.api_client import api_client
+from jobcoin.cache import in_use_addresses
+from jobcoin.constants import ADDRESS_CHECK_CONCURRENCY, API_PRIORITY_INTERACTIVE
 from jobcoin.exceptions import (
     CheckAddressInUseException,
     InvalidWithdrawalAddressException,
@@ -9,10 +13,15 @@ from jobcoin.exceptions import (
 
 
 def convert_input_to_withdrawal_addresses(input):
+    withdrawal_addresses = parse_withdrawal_addresses(input)
+    check_addresses_in_use(withdrawal_addresses)
+    return withdrawal_addresses
+
+
+def parse_withdrawal_addresses(input):
     withdrawal_addresses = input.split(",")
     withdrawal_addresses = [address.strip() for address in withdrawal_addresses]
     check_empty_addresses(withdrawal_addresses)
-    check_addresses_in_use(withdrawal_addresses)
     return withdrawal_addresses
 
 
@@ -25,16 +34,33 @@ def check_empty_addresses(withdrawal_addresses):
 
 
 def check_addresses_in_use(withdrawal_addresses):
-    addresses_in_use = []
-    for address in withdrawal_addresses:
-        try:
-            response = requests.get(f"{API_ADDRESS_URL}/{address}", timeout=1)
-            response.raise_for_status()
-        except requests.exceptions.RequestException as e:
-            raise CheckAddressInUseException(e.response.text)
-        address_info = response.json()
-        if address_info["balance"] != "0" or address_info["transactions"]:
-            addresses_in_use.append(address)
+    # Addresses already known to be in use are rejected without a network call.
+    addresses_in_use = [
+        address for address in withdrawal_addresses if address in in_use_addresses
+    ]
+    if not addresses_in_use:
+        with ThreadPoolExecutor(max_workers=ADDRESS_CHECK_CONCURRENCY) as executor:
+            results = executor.map(is_address_in_use, withdrawal_addresses)
+            addresses_in_use = [
+                address
+                for address, in_use in zip(withdrawal_addresses, results)
+                if in_use
+            ]
     if addresses_in_use:
         addresses_in_use_str = ",".join(addresses_in_use)
         raise WithdrawalAddressInUseException(addresses_in_use_str)
+
+
+def is_address_in_use(address):
+    try:
+        response = api_client.get_address_info(address, API_PRIORITY_INTERACTIVE)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        raise CheckAddressInUseException(
+            e.response.text if e.response is not None else e
+        )
+    address_info = response.json()
+    in_use = address_info["balance"] != "0" or bool(address_info["transactions"])
+    if in_use:
+        in_use_addresses.add(address)
+    return in_use
@@ -0,0 +1,264 @@
+import logging
+import multiprocessing
+import os
+import threading
+
+from jobcoin.api_client import api_client
+from jobcoin.constants import (
+    API_RATE_LIMIT_SERVICE_SHARE,
+    DEPOSIT_DETECTION_MODE,
+    DEPOSIT_DETECTION_MODE_FEED,
+    DISTRIBUTE_DEPOSITS_INTERVAL_SEC,
+    WORKER_RESPONSE_TIMEOUT_SEC,
+    WORKER_SWEEP_JOIN_TIMEOUT_SEC,
+)
+from jobcoin.jobcoin_mixer import JobCoinMixer
+from jobcoin.metrics import metrics_registry
+from jobcoin.sharding import ShardCoordinator
+from jobcoin.store import SQLiteAccountStore
+from jobcoin.sweeper import Sweeper
+from jobcoin.tasks import get_new_deposits_interval, run_at_fixed_rate
+
+# Worker processes are spawned rather than forked, as the parent runs threads.
+multiprocessing_context = multiprocessing.get_context("spawn")
+
+ASSIGN_COMMAND = "assign"
+METRICS_COMMAND = "metrics"
+STOP_COMMAND = "stop"
+
+
+class MixerWorker:
+    """A mixer serving the shards assigned to it, run in a worker process.
+
+    Ownership only changes between task runs, so no shard is ever served
+    by two workers at once.
+    """
+
+    def __init__(self, store) -> None:
+        self.mixer = JobCoinMixer(store=store, shards=())
+        self.sweeper = self.mixer.sweeper = Sweeper(self.mixer)
+        self._polling_lock = threading.Lock()
+        self._distribution_lock = threading.Lock()
+
+    def get_new_deposits(self):
+        with self._polling_lock:
+            self.mixer.refresh_accounts()
+            if DEPOSIT_DETECTION_MODE == DEPOSIT_DETECTION_MODE_FEED:
+                self.mixer.get_new_deposits_from_feed()
+            else:
+                self.mixer.get_new_deposits()
+
+    def distribute_deposits(self):
+        with self._distribution_lock:
+            self.mixer.distribute_deposits()
+
+    def assign(self, shards):
+        """Serve shards from now on, and return whether that was possible.
+
+        Sweeps in flight finish first, so their credit is committed before
+        a shard given up here is taken over. If they do not finish within
+        WORKER_SWEEP_JOIN_TIMEOUT_SEC, False is returned and the worker must
+        exit, so that none of them is sent alongside its new owner's replay.
+        """
+        with self._polling_lock, self._distribution_lock:
+            if not self.sweeper.join(WORKER_SWEEP_JOIN_TIMEOUT_SEC):
+                return False
+            self.mixer.set_shards(shards)
+            self.sweeper.replay()
+            return True
+
+    def stop(self):
+        with self._polling_lock, self._distribution_lock:
+            if not self.sweeper.join(WORKER_SWEEP_JOIN_TIMEOUT_SEC):
+                logging.info("[Worker] Stopping with sweeps still in flight")
+            self.mixer.deposit_address_store.close()
+
+    def start_background_tasks(self):
+        self.mixer.house_addresses.load_balances(self.mixer.client)
+        sweeper_threads = self.sweeper.start()
+        threads = [
+            threading.Thread(
+                target=run_at_fixed_rate,
+                args=(
+                    "get_new_deposits",
+                    self.get_new_deposits,
+                    get_new_deposits_interval(),
+                ),
+                daemon=True,
+            ),
+            threading.Thread(
+                target=run_at_fixed_rate,
+                args=(
+                    "distribute_deposits",
+                    self.distribute_deposits,
+                    DISTRIBUTE_DEPOSITS_INTERVAL_SEC,
+                ),
+                daemon=True,
+            ),
+        ]
+        for thread in threads:
+            thread.start()
+        return sweeper_threads + threads
+
+
+def run_worker(worker_id, store_path, connection, rate_share=1.0):
+    """Entry point of a worker process, driven by commands from its pool.
+
+    The worker sends at most rate_share of the API rate limit.
+    """
+    api_client.share_rate_limit(rate_share)
+    worker = MixerWorker(SQLiteAccountStore(store_path))
+    worker.start_background_tasks()
+    while True:
+        command, shards = connection.recv()
+        if command == METRICS_COMMAND:
+            connection.send(metrics_registry.collect())
+            continue
+        if command == STOP_COMMAND:
+            worker.stop()
+            connection.send(worker_id)
+            return
+        if not worker.assign(shards):
+            logging.error(
+                "[Worker] %s could not finish its sweeps in time, exiting", worker_id
+            )
+            # Ends the sweep threads too; the pool replaces this worker.
+            os._exit(1)
+        logging.info("[Worker] %s serves %d shards", worker_id, len(shards))
+        connection.send(worker_id)
+
+
+class WorkerPool:
+    """Runs mixer workers in separate processes sharing one SQLite store.
+
+    Shards are assigned by a ShardCoordinator. When a worker joins or
+    leaves, the shards that move are first revoked from their old owners,
+    which commit and acknowledge, and only then granted to the new ones.
+
+    The workers split the part of the API rate limit the service process
+    does not keep, see API_RATE_LIMIT_SERVICE_SHARE.
+
+    A worker that does not answer a command within
+    WORKER_RESPONSE_TIMEOUT_SEC is terminated, and replaced by
+    check_workers().
+    """
+
+    def __init__(self, store_path, coordinator=None) -> None:
+        self.store_path = store_path
+        self.coordinator = (
+            coordinator if coordinator is not None else ShardCoordinator()
+        )
+        self.workers = {}
+        self._next_worker_id = 0
+        self._lock = threading.Lock()
+        self.rate_share = 1 - API_RATE_LIMIT_SERVICE_SHARE
+
+    def start(self, num_workers):
+        self.rate_share = (1 - API_RATE_LIMIT_SERVICE_SHARE) / num_workers
+        for _ in range(num_workers):
+            self.add_worker()
+
+    def add_worker(self):
+        with self._lock:
+            worker_id = f"worker-{self._next_worker_id}"
+            self._next_worker_id += 1
+            connection, child_connection = multiprocessing_context.Pipe()
+            process = multiprocessing_context.Process(
+                target=run_worker,
+                args=(worker_id, self.store_path, child_connection, self.rate_share),
+                daemon=True,
+            )
+            process.start()
+            child_connection.close()
+            self.workers[worker_id] = (process, connection)
+            self._rebalance(*self.coordinator.join(worker_id))
+            return worker_id
+
+    def remove_worker(self, worker_id):
+        with self._lock:
+            process, connection = self.workers.pop(worker_id)
+            if process.is_alive() and self._send(
+                worker_id, connection, (STOP_COMMAND, None)
+            ):
+                self._receive(worker_id, process, connection)
+            process.join()
+            self._rebalance(*self.coordinator.leave(worker_id))
+
+    def check_workers(self):
+        """Replace workers whose process died."""
+        for worker_id, (process, _) in list(self.workers.items()):
+            if not process.is_alive():
+                logging.info("[Worker] %s exited, replacing it", worker_id)
+                self.remove_worker(worker_id)
+                self.add_worker()
+
+    def collect_metrics(self):
+        """Return the counters and histograms collected in every worker."""
+        with self._lock:
+            connections = [
+                (worker_id, process, connection)
+                for worker_id, (process, connection) in self.workers.items()
+                if self._send(worker_id, connection, (METRICS_COMMAND, None))
+            ]
+            collected = [
+                self._receive(worker_id, process, connection)
+                for worker_id, process, connection in connections
+            ]
+        return [values for values in collected if values is not None]
+
+    def stop(self):
+        for worker_id in list(self.workers):
+            self.remove_worker(worker_id)
+
+    def _rebalance(self, old_assignment, new_assignment):
+        current = {
+            worker_id: shards
+            for worker_id, shards in old_assignment.items()
+            if worker_id in self.workers
+        }
+        revoked = {
+            worker_id: shards & new_assignment.get(worker_id, set())
+            for worker_id, shards in current.items()
+            if not shards <= new_assignment.get(worker_id, set())
+        }
+        self._assign(revoked)
+        current.update(revoked)
+        self._assign(
+            {
+                worker_id: shards
+                for worker_id, shards in new_assignment.items()
+                if current.get(worker_id) != shards
+            }
+        )
+
+    def _assign(self, assignment):
+        # Send every command before waiting, so workers commit in parallel.
+        connections = []
+        for worker_id, shards in assignment.items():
+            process, connection = self.workers[worker_id]
+            if self._send(worker_id, connection, (ASSIGN_COMMAND, sorted(shards))):
+                connections.append((worker_id, process, connection))
+        for worker_id, process, connection in connections:
+            self._receive(worker_id, process, connection)
+
+    def _send(self, worker_id, connection, command):
+        try:
+            connection.send(command)
+        except OSError as e:
+            logging.info("[Worker] Error sending to %s: %s", worker_id, e)
+            return False
+        return True
+
+    def _receive(self, worker_id, process, connection):
+        # A worker that does not answer is stopped, so that the shards it
+        # was asked to give up can be served by another one.
+        try:
+            if connection.poll(WORKER_RESPONSE_TIMEOUT_SEC):
+                return connection.recv()
+        except (EOFError, OSError) as e:
+            logging.info("[Worker] Error receiving from %s: %r", worker_id, e)
+            return None
+        logging.info("[Worker] %s did not answer, terminating it", worker_id)
+        process.terminate()
+        process.join()
+        return None
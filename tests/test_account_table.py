@@ -0,0 +1,47 @@
+from unittest import TestCase
+
+from jobcoin.account import Account
+from jobcoin.account_table import AccountTable
+from jobcoin.amounts import to_units
+from jobcoin.constants import WITHDRAWAL_INCREMENT
+
+
+class TestAccountTable(TestCase):
+    def setUp(self):
+        self.table = AccountTable()
+        self.table.add("d1", ["a1", "a2"])
+        self.table.add("d2", ["b1", "b2", "b3"])
+        self.table.add("d3", ["c1"])
+
+    def test_plan_payouts_skips_empty_accounts(self):
+        self.table.credit("d1", to_units("50"))
+        self.table.credit("d3", to_units("0.1"))
+        self.assertEqual(
+            self.table.plan_payouts(),
+            [(0, "a1", to_units(WITHDRAWAL_INCREMENT)), (2, "c1", to_units("0.1"))],
+        )
+
+    def test_apply_payout_advances_round_robin(self):
+        self.table.credit("d1", to_units("50"))
+        for _ in range(2):
+            row, _, units = self.table.plan_payouts()[0]
+            self.table.apply_payout(row, units)
+        self.assertEqual(self.table.plan_payouts(), [(0, "a1", to_units("5"))])
+        self.assertEqual(self.table.balances[0], to_units("45"))
+
+    def test_balances_do_not_drift(self):
+        self.table.credit("d3", to_units("0.3"))
+        for _ in range(3):
+            self.table.apply_payout(2, to_units("0.1"))
+        self.assertEqual(self.table.balances[2], 0)
+        self.assertEqual(self.table.plan_payouts(), [])
+
+    def test_round_trip_accounts(self):
+        account = Account(
+            withdrawal_addresses=["a1", "a2"],
+            total_amount=to_units("12.5"),
+            withdrawal_amount=to_units("5"),
+            withdrawal_addresses_index=1,
+        )
+        table = AccountTable.from_accounts({"d1": account})
+        self.assertEqual(table.to_account("d1"), account)
@@ -0,0 +1,76 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import requests
+from jobcoin.api_client import ApiClient
+from jobcoin.constants import API_TIMEOUT_SEC
+
+
+@patch("jobcoin.api_client.time.sleep")
+@patch("jobcoin.api_client.requests.Session.post")
+@patch("jobcoin.api_client.requests.Session.get")
+class TestApiClient(TestCase):
+    def setUp(self):
+        self.client = ApiClient(base_url="http://jobcoin", retries=2)
+
+    def test_get_retries_retryable_status(self, mock_get, mock_post, mock_sleep):
+        mock_get.side_effect = [MagicMock(status_code=503), MagicMock(status_code=200)]
+        response = self.client.get_address_info("a1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_get.call_count, 2)
+        mock_get.assert_called_with(
+            "http://jobcoin/addresses/a1", timeout=API_TIMEOUT_SEC
+        )
+        mock_sleep.assert_called_once()
+        self.assertLess(
+            self.client.rate_limiter.rate, self.client.rate_limiter.max_rate
+        )
+
+    def test_get_returns_last_response_when_retries_exhausted(
+        self, mock_get, mock_post, mock_sleep
+    ):
+        mock_get.return_value = MagicMock(status_code=500)
+        response = self.client.get_transactions()
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(mock_get.call_count, 3)
+
+    def test_get_raises_connection_error_when_retries_exhausted(
+        self, mock_get, mock_post, mock_sleep
+    ):
+        mock_get.side_effect = requests.ConnectionError()
+        with self.assertRaises(requests.ConnectionError):
+            self.client.get_transactions()
+        self.assertEqual(mock_get.call_count, 3)
+
+    def test_get_does_not_retry_client_errors(self, mock_get, mock_post, mock_sleep):
+        mock_get.return_value = MagicMock(status_code=404)
+        self.client.get_address_info("a1")
+        self.assertEqual(mock_get.call_count, 1)
+        mock_sleep.assert_not_called()
+
+    def test_send_jobcoins_is_not_retried(self, mock_get, mock_post, mock_sleep):
+        mock_post.return_value = MagicMock(status_code=503)
+        self.client.send_jobcoins("a1", "a2", 2.5)
+        mock_post.assert_called_once_with(
+            "http://jobcoin/transactions",
+            data={"fromAddress": "a1", "toAddress": "a2", "amount": "2.5"},
+            timeout=API_TIMEOUT_SEC,
+        )
+
+    def test_rate_limit_can_be_disabled(self, mock_get, mock_post, mock_sleep):
+        client = ApiClient(base_url="http://jobcoin", rate_limit=None)
+        self.assertIsNone(client.rate_limiter)
+        client.get_address_info("a1")
+        mock_get.assert_called_once()
+
+    def test_backoff_is_capped(self, mock_get, mock_post, mock_sleep):
+        for attempt in range(10):
+            self.assertLessEqual(
+                self.client._get_backoff(attempt), self.client.backoff_max
+            )
+
+    def test_share_rate_limit(self, mock_get, mock_post, mock_sleep):
+        client = ApiClient(base_url="http://jobcoin", rate_limit=50)
+        client.share_rate_limit(0.2)
+        self.assertEqual(client.rate_limiter.max_rate, 10)
+        self.assertEqual(client.rate_limiter.rate, 10)
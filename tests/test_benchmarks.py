@@ -0,0 +1,25 @@
+from unittest import TestCase
+
+from benchmarks.run import run_scenario
+from jobcoin.constants import (
+    DEPOSIT_DETECTION_MODE_ADDRESS,
+    DEPOSIT_DETECTION_MODE_FEED,
+)
+
+
+class TestBenchmarks(TestCase):
+    def test_run_scenario(self):
+        for mode in [DEPOSIT_DETECTION_MODE_ADDRESS, DEPOSIT_DETECTION_MODE_FEED]:
+            result = run_scenario(
+                num_addresses=10,
+                mode=mode,
+                deposit_ratio=0.5,
+                latency=0,
+                error_rate=0,
+                history_depth=4,
+                concurrency=4,
+            )
+            # One house sweep and one payout for each of the 5 funded addresses.
+            self.assertEqual(result["distribute_deposits_requests"], 5)
+            expected_polls = 10 if mode == DEPOSIT_DETECTION_MODE_ADDRESS else 1
+            self.assertEqual(result["get_new_deposits_requests"], expected_polls + 5)
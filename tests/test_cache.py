@@ -0,0 +1,26 @@
+from unittest import TestCase
+
+from jobcoin.cache import TTLCache
+
+
+class TestTTLCache(TestCase):
+    def setUp(self):
+        self.now = 0
+        self.cache = TTLCache(max_size=2, ttl=10, clock=lambda: self.now)
+
+    def test_entries_expire(self):
+        self.cache.add("a1")
+        self.now = 9
+        self.assertIn("a1", self.cache)
+        self.now = 10
+        self.assertNotIn("a1", self.cache)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.add("a1")
+        self.cache.add("a2")
+        self.assertIn("a1", self.cache)
+        self.cache.add("a3")
+        self.assertIn("a1", self.cache)
+        self.assertNotIn("a2", self.cache)
+        self.assertIn("a3", self.cache)
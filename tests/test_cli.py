@@ -2,9 +2,15 @@ import re
 from unittest import TestCase
 from unittest.mock import patch
 
+import requests
 from click.testing import CliRunner
 from jobcoin import cli
-from jobcoin.exceptions import WithdrawalAddressInUseException
+from jobcoin.constants import MIXER_SERVICE_TIMEOUT_SEC
+from jobcoin.exceptions import (
+    MixerServiceRequestException,
+    MixerServiceUnavailableException,
+    WithdrawalAddressInUseException,
+)
 
 
 class TestCli(TestCase):
@@ -15,9 +21,10 @@ class TestCli(TestCase):
         assert "Welcome to the Jobcoin mixer" in result.output
 
     @patch(
-        "jobcoin.cli.convert_input_to_withdrawal_addresses", return_value=["1234,4321"]
+        "jobcoin.cli.create_deposit_address",
+        return_value="deposit_address_0123456789abcdef0123456789abcdef",
     )
-    def test_cli_creates_address(self, mock_convert):
+    def test_cli_creates_address(self, mock_create):
         runner = CliRunner()
         address_create_output = runner.invoke(cli.main, input="1234,4321").output
         output_re = re.compile(
@@ -25,12 +32,15 @@ class TestCli(TestCase):
             "They will be mixed and sent to your destination addresses."
         )
         assert output_re.search(address_create_output) is not None
+        mock_create.assert_called_once_with(["1234", "4321"], cli.MIXER_SERVICE_URL)
 
     @patch(
-        "jobcoin.cli.convert_input_to_withdrawal_addresses",
-        side_effect=WithdrawalAddressInUseException("1234"),
+        "jobcoin.cli.create_deposit_address",
+        side_effect=MixerServiceRequestException(
+            str(WithdrawalAddressInUseException("1234"))
+        ),
     )
-    def test_cli_creates_address_in_use(self, mock_convert):
+    def test_cli_creates_address_in_use(self, mock_create):
         runner = CliRunner()
         address_create_output = runner.invoke(cli.main, input="1234,4321").output
         output_re = re.compile(
@@ -38,3 +48,16 @@ class TestCli(TestCase):
             "Please provide only new and unused addresses."
         )
         assert output_re.search(address_create_output) is not None
+
+    @patch("jobcoin.cli.create_deposit_address")
+    def test_cli_rejects_empty_address_locally(self, mock_create):
+        runner = CliRunner()
+        address_create_output = runner.invoke(cli.main, input="1234,").output
+        assert "Empty addresses found" in address_create_output
+        mock_create.assert_not_called()
+
+    @patch("jobcoin.cli.requests.post", side_effect=requests.Timeout("stalled"))
+    def test_create_deposit_address_times_out(self, mock_post):
+        with self.assertRaises(MixerServiceUnavailableException):
+            cli.create_deposit_address(["1234"])
+        assert mock_post.call_args[1]["timeout"] == MIXER_SERVICE_TIMEOUT_SEC
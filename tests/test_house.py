@@ -0,0 +1,82 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import requests
+from jobcoin.amounts import to_units
+from jobcoin.constants import API_ADDRESS_URL, API_TIMEOUT_SEC, TRANSFER_SENT
+from jobcoin.house import HouseAddressPool
+from jobcoin.jobcoin_mixer import JobCoinMixer
+
+
+class TestHouseAddressPool(TestCase):
+    def setUp(self):
+        self.pool = HouseAddressPool(["h1", "h2", "h3"])
+
+    def test_sweeps_are_spread_by_deposit_address(self):
+        addresses = {
+            self.pool.get_sweep_address(f"deposit_address_{i}") for i in range(100)
+        }
+        self.assertEqual(addresses, {"h1", "h2", "h3"})
+        self.assertEqual(
+            self.pool.get_sweep_address("deposit_address_1"),
+            self.pool.get_sweep_address("deposit_address_1"),
+        )
+
+    def test_payouts_are_funded_from_the_richest_address(self):
+        self.pool.credit("h1", 10)
+        self.pool.credit("h2", 30)
+        self.assertEqual(self.pool.reserve(25), "h2")
+        self.assertEqual(self.pool.reserve(8), "h1")
+        self.assertEqual(self.pool.get_balance("h2"), 5)
+
+        self.pool.release("h1", 8)
+        self.assertEqual(self.pool.get_balance("h1"), 10)
+
+    @patch("jobcoin.api_client.requests.Session.get")
+    def test_load_balances(self, mock_get):
+        responses = {
+            f"{API_ADDRESS_URL}/h1": {"balance": "1.5", "transactions": []},
+            f"{API_ADDRESS_URL}/h3": {"balance": "2", "transactions": []},
+        }
+
+        def get(url, timeout):
+            response = MagicMock()
+            if url in responses:
+                response.json.return_value = responses[url]
+            else:
+                response.raise_for_status.side_effect = requests.HTTPError(
+                    response=MagicMock(text="blah")
+                )
+            return response
+
+        mock_get.side_effect = get
+        self.pool.credit("h2", 7)
+        self.pool.load_balances(JobCoinMixer().client)
+        self.assertEqual(self.pool.get_balance("h1"), 150000000)
+        self.assertEqual(self.pool.get_balance("h2"), 7)
+        self.assertEqual(self.pool.get_balance("h3"), 200000000)
+        mock_get.assert_any_call(f"{API_ADDRESS_URL}/h1", timeout=API_TIMEOUT_SEC)
+
+
+@patch("jobcoin.api_client.requests.Session.post")
+class TestMixerHouseAddresses(TestCase):
+    def test_sweeps_fund_payouts(self, mock_post):
+        pool = HouseAddressPool(["h1", "h2"])
+        mixer = JobCoinMixer(house_addresses=pool)
+        deposit_address = mixer.get_new_deposit_address(["a1"])
+        house_address = pool.get_sweep_address(deposit_address)
+
+        self.assertEqual(
+            mixer.transfer_to_house_address(deposit_address, to_units("10")),
+            TRANSFER_SENT,
+        )
+        self.assertEqual(pool.get_balance(house_address), 1000000000)
+        self.assertTrue(mixer.transfer_to_withdrawal_address("a1", to_units("2.5")))
+        self.assertEqual(mock_post.call_args[1]["data"]["fromAddress"], house_address)
+        self.assertEqual(pool.get_balance(house_address), 750000000)
+
+        mock_post.return_value.raise_for_status.side_effect = requests.HTTPError(
+            response=MagicMock(status_code=500, text="blah")
+        )
+        self.assertFalse(mixer.transfer_to_withdrawal_address("a1", to_units("2.5")))
+        self.assertEqual(pool.get_balance(house_address), 750000000)
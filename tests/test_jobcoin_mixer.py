@@ -1,20 +1,35 @@
 import datetime
+import time
 from dataclasses import asdict
 from unittest import TestCase
 from unittest.mock import MagicMock, call, patch
 
 import requests
+from jobcoin.amounts import to_units
+from jobcoin.cache import in_use_addresses
 from jobcoin.constants import (
+    ACCOUNT_IDLE_AFTER_SEC,
+    ACCOUNT_STATE_ACTIVE,
+    ACCOUNT_STATE_ARCHIVED,
+    ACCOUNT_STATE_DRAINED,
+    ACCOUNT_STATE_IDLE,
+    ADDRESS_POLL_BACKOFF_FACTOR,
+    ADDRESS_POLL_INTERVAL_MAX_SEC,
+    ADDRESS_POLL_INTERVAL_MIN_SEC,
+    API_TIMEOUT_SEC,
     API_TRANSACTIONS_URL,
+    DISTRIBUTE_DEPOSITS_INTERVAL_SEC,
     FIRST_WITHDRAWAL_ADDRESS_INDEX,
     HOUSE_ADDRESS,
     WITHDRAWAL_INCREMENT,
 )
+from jobcoin.exceptions import WithdrawalAddressInUseException
 from jobcoin.jobcoin_mixer import JobCoinMixer
+from jobcoin.transactions import Transaction, parse_timestamp
 
 
-@patch("jobcoin.jobcoin_mixer.requests.post")
-@patch("jobcoin.jobcoin_mixer.requests.get")
+@patch("jobcoin.api_client.requests.Session.post")
+@patch("jobcoin.api_client.requests.Session.get")
 class TestJobCoinMixer(TestCase):
     def setUp(self):
         self.mixer = JobCoinMixer()
@@ -38,11 +53,32 @@ class TestJobCoinMixer(TestCase):
             {
                 "withdrawal_addresses": self.withdrawal_addresses_1,
                 "total_amount": 0,
-                "withdrawal_amount": WITHDRAWAL_INCREMENT,
+                "withdrawal_amount": to_units(WITHDRAWAL_INCREMENT),
                 "withdrawal_addresses_index": FIRST_WITHDRAWAL_ADDRESS_INDEX,
+                "distributed_amount": 0,
+                "last_transaction_timestamp": None,
+                "last_transaction_key": None,
+                "sweep_sequence": 0,
+                "credited_sweep_sequence": 0,
+                "state": ACCOUNT_STATE_ACTIVE,
+                "state_since": None,
             },
         )
 
+    def test_get_new_deposit_address_paid_withdrawal_address(self, mock_get, mock_post):
+        for withdrawal_addresses_list, conflict in [
+            ([["c1", "a2"]], "a2"),
+            ([["c1"], ["c2", "c1"]], "c1"),
+        ]:
+            with self.assertRaises(WithdrawalAddressInUseException) as context:
+                self.mixer.get_new_deposit_addresses(withdrawal_addresses_list)
+            self.assertIn(f": {conflict}.", str(context.exception))
+        self.assertEqual(len(self.mixer.deposit_address_store), 2)
+        self.assertEqual(
+            self.mixer.deposit_address_store.get_paying_account("b3"),
+            self.deposit_address_2,
+        )
+
     def test_get_new_deposits_success(self, mock_get, mock_post):
         mock_get.return_value = self._get_mock_response(
             self._get_address_info(None, self.deposit_address_1)
@@ -51,19 +87,21 @@ class TestJobCoinMixer(TestCase):
         self.mixer.get_new_deposits(offset)
         self.assertEqual(
             self.mixer.deposit_address_store[self.deposit_address_1].total_amount,
-            int(self.mock_amount),
+            to_units(self.mock_amount),
         )
         mock_post.assert_called_once_with(
             API_TRANSACTIONS_URL,
             data=self._get_post_data(
                 self.deposit_address_1, HOUSE_ADDRESS, self.mock_amount
             ),
-            timeout=1,
+            timeout=API_TIMEOUT_SEC,
         )
 
     def test_get_new_deposits_http_error(self, mock_get, mock_post):
         mock_get.return_value = self._get_mock_response(
-            raise_for_status=requests.HTTPError(response=MagicMock(text="blah"))
+            raise_for_status=requests.HTTPError(
+                response=MagicMock(status_code=500, text="blah")
+            )
         )
         offset = datetime.datetime(2022, 10, 13, 3, 17, 30)
         self.mixer.get_new_deposits(offset)
@@ -98,13 +136,201 @@ class TestJobCoinMixer(TestCase):
         )
         mock_post.assert_not_called()
 
-    def test_distribute_deposits_success(self, mock_get, mock_post):
-        self.mixer.deposit_address_store[self.deposit_address_1].total_amount = int(
-            self.mock_amount
+    def test_get_new_deposits_sequential(self, mock_get, mock_post):
+        self.mixer.polling_concurrency = 1
+        mock_get.return_value = self._get_mock_response(
+            self._get_address_info(None, self.deposit_address_1)
+        )
+        offset = datetime.datetime(2022, 10, 13, 3, 17, 30)
+        self.mixer.get_new_deposits(offset)
+        self.assertEqual(
+            self.mixer.deposit_address_store[self.deposit_address_1].total_amount,
+            to_units(self.mock_amount),
+        )
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch("jobcoin.api_client.time.sleep")
+    def test_get_new_deposits_connection_error_isolated(
+        self, mock_sleep, mock_get, mock_post
+    ):
+        def get(url, timeout):
+            if url.endswith(self.deposit_address_1):
+                raise requests.ConnectionError("connection refused")
+            return self._get_mock_response(
+                self._get_address_info(None, self.deposit_address_2)
+            )
+
+        mock_get.side_effect = get
+        offset = datetime.datetime(2022, 10, 13, 3, 17, 30)
+        self.mixer.get_new_deposits(offset)
+        self.assertEqual(
+            self.mixer.deposit_address_store[self.deposit_address_1].total_amount,
+            0,
+        )
+        self.assertEqual(
+            self.mixer.deposit_address_store[self.deposit_address_2].total_amount,
+            to_units(self.mock_amount),
+        )
+
+    def test_get_new_deposits_processes_only_new_tail(self, mock_get, mock_post):
+        first = self._get_transaction(None, self.deposit_address_1)
+        second = dict(first, timestamp="2022-10-13T03:17:45.000Z")
+        mock_get.return_value = self._get_mock_response(
+            {"balance": self.mock_amount, "transactions": [first]}
+        )
+        self.mixer.get_new_deposits()
+        self.assertEqual(mock_post.call_count, 1)
+
+        mock_get.return_value = self._get_mock_response(
+            {"balance": self.mock_amount, "transactions": [first, second]}
+        )
+        self.mixer.get_new_deposits(
+            now=time.monotonic() + ADDRESS_POLL_INTERVAL_MIN_SEC
+        )
+        self.assertEqual(mock_post.call_count, 2)
+        account = self.mixer.deposit_address_store[self.deposit_address_1]
+        self.assertEqual(account.total_amount, 2 * to_units(self.mock_amount))
+        self.assertEqual(
+            account.last_transaction_timestamp, parse_timestamp(second["timestamp"])
         )
-        self.mixer.deposit_address_store[self.deposit_address_2].total_amount = int(
-            self.mock_amount
+
+    def test_get_new_deposits_retries_failed_sweep(self, mock_get, mock_post):
+        mock_get.return_value = self._get_mock_response(
+            self._get_address_info(None, self.deposit_address_1)
+        )
+        mock_post.return_value = self._get_mock_response(
+            raise_for_status=requests.HTTPError(
+                response=MagicMock(status_code=500, text="blah")
+            )
+        )
+        self.mixer.get_new_deposits()
+        account = self.mixer.deposit_address_store[self.deposit_address_1]
+        self.assertEqual(account.total_amount, 0)
+        self.assertIsNone(account.last_transaction_key)
+
+        mock_post.return_value = self._get_mock_response()
+        self.mixer.get_new_deposits(
+            now=time.monotonic() + ADDRESS_POLL_INTERVAL_MIN_SEC
+        )
+        self.assertEqual(account.total_amount, to_units(self.mock_amount))
+
+    def test_get_new_deposits_coalesces_sweeps(self, mock_get, mock_post):
+        first = self._get_transaction(None, self.deposit_address_1)
+        second = dict(first, timestamp="2022-10-13T03:17:45.000Z", amount="0.5")
+        outgoing = dict(
+            first,
+            timestamp="2022-10-13T03:17:50.000Z",
+            fromAddress=self.deposit_address_1,
+            toAddress="elsewhere",
+        )
+        mock_get.return_value = self._get_mock_response(
+            {"balance": "0", "transactions": [first, second, outgoing]}
+        )
+        self.mixer.get_new_deposits()
+        mock_post.assert_called_once_with(
+            API_TRANSACTIONS_URL,
+            data=self._get_post_data(self.deposit_address_1, HOUSE_ADDRESS, "50.5"),
+            timeout=API_TIMEOUT_SEC,
+        )
+        account = self.mixer.deposit_address_store[self.deposit_address_1]
+        self.assertEqual(account.total_amount, to_units("50.5"))
+        self.assertEqual(
+            account.last_transaction_timestamp,
+            parse_timestamp(outgoing["timestamp"]),
+        )
+
+    def test_get_new_deposits_sweeps_each_deposit(self, mock_get, mock_post):
+        self.mixer.coalesce_sweeps = False
+        first = self._get_transaction(None, self.deposit_address_1)
+        second = dict(first, timestamp="2022-10-13T03:17:45.000Z")
+        mock_get.return_value = self._get_mock_response(
+            {"balance": "0", "transactions": [first, second]}
+        )
+        self.mixer.get_new_deposits()
+        self.assertEqual(mock_post.call_count, 2)
+        account = self.mixer.deposit_address_store[self.deposit_address_1]
+        self.assertEqual(account.total_amount, 2 * to_units(self.mock_amount))
+
+    def test_get_new_deposits_backs_off_idle_addresses(self, mock_get, mock_post):
+        mock_get.return_value = self._get_mock_response(
+            {"balance": "0", "transactions": []}
+        )
+        now = time.monotonic()
+        self.mixer.get_new_deposits(now=now)
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(
+            self.mixer.poll_intervals[self.deposit_address_1],
+            ADDRESS_POLL_INTERVAL_MIN_SEC * ADDRESS_POLL_BACKOFF_FACTOR,
         )
+
+        self.mixer.get_new_deposits(now=now + ADDRESS_POLL_INTERVAL_MIN_SEC)
+        self.assertEqual(mock_get.call_count, 2)
+
+        for _ in range(20):
+            now += ADDRESS_POLL_INTERVAL_MAX_SEC
+            self.mixer.get_new_deposits(now=now)
+        self.assertEqual(
+            self.mixer.poll_intervals[self.deposit_address_1],
+            ADDRESS_POLL_INTERVAL_MAX_SEC,
+        )
+
+    def test_get_new_deposits_polls_active_addresses_fast(self, mock_get, mock_post):
+        self.mixer.poll_intervals[self.deposit_address_1] = (
+            ADDRESS_POLL_INTERVAL_MAX_SEC
+        )
+        mock_get.return_value = self._get_mock_response(
+            self._get_address_info(None, self.deposit_address_1)
+        )
+        self.mixer.get_new_deposits()
+        self.assertEqual(
+            self.mixer.poll_intervals[self.deposit_address_1],
+            ADDRESS_POLL_INTERVAL_MIN_SEC,
+        )
+
+    def test_get_new_deposits_from_feed(self, mock_get, mock_post):
+        mock_get.return_value = self._get_mock_response(
+            [
+                self._get_transaction(None, "someone_else"),
+                self._get_transaction(None, self.deposit_address_2),
+            ]
+        )
+        offset = datetime.datetime(2022, 10, 13, 3, 17, 30)
+        self.mixer.get_new_deposits_from_feed(offset)
+        mock_get.assert_called_once_with(API_TRANSACTIONS_URL, timeout=API_TIMEOUT_SEC)
+        self.assertIn("someone_else", in_use_addresses)
+        mock_post.assert_called_once_with(
+            API_TRANSACTIONS_URL,
+            data=self._get_post_data(
+                self.deposit_address_2, HOUSE_ADDRESS, self.mock_amount
+            ),
+            timeout=API_TIMEOUT_SEC,
+        )
+        self.assertEqual(
+            self.mixer.deposit_address_store[self.deposit_address_2].total_amount,
+            to_units(self.mock_amount),
+        )
+
+    def test_get_new_deposits_from_feed_skips_seen_transactions(
+        self, mock_get, mock_post
+    ):
+        seen = self._get_transaction(None, self.deposit_address_1)
+        new = dict(seen, timestamp="2022-10-13T03:17:45.000Z")
+        self.mixer.last_seen_feed_transaction = Transaction.from_json(seen)
+        mock_get.return_value = self._get_mock_response([seen, new])
+        offset = datetime.datetime(2022, 10, 13, 3, 17, 30)
+        self.mixer.get_new_deposits_from_feed(offset)
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(
+            self.mixer.last_seen_feed_transaction.key, Transaction.from_json(new).key
+        )
+
+        mock_post.reset_mock()
+        self.mixer.get_new_deposits_from_feed(offset)
+        mock_post.assert_not_called()
+
+    def test_distribute_deposits_success(self, mock_get, mock_post):
+        self.mixer.credit_deposit(self.deposit_address_1, to_units(self.mock_amount))
+        self.mixer.credit_deposit(self.deposit_address_2, to_units(self.mock_amount))
         self.mixer.distribute_deposits()
         self.assertEqual(mock_post.call_count, 2)
         self.assertEqual(
@@ -115,7 +341,11 @@ class TestJobCoinMixer(TestCase):
         )
         self.assertEqual(
             self.mixer.deposit_address_store[self.deposit_address_1].total_amount,
-            int(self.mock_amount) - WITHDRAWAL_INCREMENT,
+            to_units(self.mock_amount) - to_units(WITHDRAWAL_INCREMENT),
+        )
+        self.assertEqual(
+            self.mixer.deposit_address_store[self.deposit_address_1].distributed_amount,
+            to_units(WITHDRAWAL_INCREMENT),
         )
         self.assertEqual(
             mock_post.call_args_list,
@@ -127,7 +357,7 @@ class TestJobCoinMixer(TestCase):
                         self.withdrawal_addresses_1[0],
                         WITHDRAWAL_INCREMENT,
                     ),
-                    timeout=1,
+                    timeout=API_TIMEOUT_SEC,
                 ),
                 call(
                     API_TRANSACTIONS_URL,
@@ -136,7 +366,7 @@ class TestJobCoinMixer(TestCase):
                         self.withdrawal_addresses_2[0],
                         WITHDRAWAL_INCREMENT,
                     ),
-                    timeout=1,
+                    timeout=API_TIMEOUT_SEC,
                 ),
             ],
         )
@@ -148,14 +378,117 @@ class TestJobCoinMixer(TestCase):
     def test_distribute_deposits_distribute_remaining_balance_if_less_than_increment(
         self, mock_get, mock_post
     ):
-        self.mixer.deposit_address_store[self.deposit_address_1].total_amount = 0.1
+        self.mixer.credit_deposit(self.deposit_address_1, to_units("0.1"))
         self.mixer.distribute_deposits()
         mock_post.assert_called_once_with(
             API_TRANSACTIONS_URL,
             data=self._get_post_data(
                 HOUSE_ADDRESS, self.withdrawal_addresses_1[0], "0.1"
             ),
-            timeout=1,
+            timeout=API_TIMEOUT_SEC,
+        )
+
+    def test_distribute_deposits_only_due_accounts(self, mock_get, mock_post):
+        self.mixer.credit_deposit(self.deposit_address_1, to_units(5), now=0)
+        self.mixer.distribute_deposits(now=0)
+        self.assertEqual(mock_post.call_count, 1)
+
+        self.mixer.distribute_deposits(now=DISTRIBUTE_DEPOSITS_INTERVAL_SEC / 2)
+        self.assertEqual(mock_post.call_count, 1)
+
+        self.mixer.distribute_deposits(now=DISTRIBUTE_DEPOSITS_INTERVAL_SEC)
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual(
+            self.mixer.deposit_address_store[self.deposit_address_1].total_amount, 0
+        )
+        self.assertNotIn(self.deposit_address_1, self.mixer.distribution_scheduler)
+
+    def test_distribute_deposits_retries_failed_transfer(self, mock_get, mock_post):
+        mock_post.return_value = self._get_mock_response(
+            raise_for_status=requests.HTTPError(
+                response=MagicMock(status_code=500, text="blah")
+            )
+        )
+        self.mixer.credit_deposit(self.deposit_address_1, to_units(5), now=0)
+        self.mixer.distribute_deposits(now=0)
+        self.assertIn(self.deposit_address_1, self.mixer.distribution_scheduler)
+        self.assertEqual(
+            self.mixer.deposit_address_store[self.deposit_address_1].total_amount,
+            to_units(5),
+        )
+
+    def test_distribute_deposits_drains_account(self, mock_get, mock_post):
+        self.mixer.credit_deposit(
+            self.deposit_address_1, to_units(WITHDRAWAL_INCREMENT), now=0
+        )
+        self.mixer.distribute_deposits(now=0)
+        self.assertEqual(
+            self.mixer.deposit_address_store[self.deposit_address_1].state,
+            ACCOUNT_STATE_DRAINED,
+        )
+
+    def test_idle_accounts_are_archived_and_reactivated(self, mock_get, mock_post):
+        store = self.mixer.deposit_address_store
+        self.mixer.credit_deposit(self.deposit_address_2, to_units(5))
+        self.mixer.manage_account_lifecycle(now=0, check_feed=False)
+        self.mixer.manage_account_lifecycle(
+            now=ACCOUNT_IDLE_AFTER_SEC, check_feed=False
+        )
+        self.assertEqual(store[self.deposit_address_1].state, ACCOUNT_STATE_IDLE)
+        self.assertEqual(store[self.deposit_address_2].state, ACCOUNT_STATE_ACTIVE)
+
+        mock_get.return_value = self._get_mock_response(
+            {"balance": "0", "transactions": []}
+        )
+        self.mixer.manage_account_lifecycle(
+            now=ACCOUNT_IDLE_AFTER_SEC + self.mixer.archive_ttl, check_feed=False
+        )
+        self.assertNotIn(self.deposit_address_1, store)
+        self.assertNotIn(self.deposit_address_1, self.mixer.polling_scheduler)
+        self.assertEqual(
+            store.get_archived(self.deposit_address_1).state, ACCOUNT_STATE_ARCHIVED
+        )
+        self.assertEqual(store.get_paying_account("a1"), self.deposit_address_1)
+        with self.assertRaises(WithdrawalAddressInUseException):
+            self.mixer.check_withdrawal_addresses([["a1"]])
+
+        # The feed is not replayed from before the mixer started.
+        old_transaction = self._get_transaction(None, self.deposit_address_1)
+        mock_get.return_value = self._get_mock_response([old_transaction])
+        self.mixer.manage_account_lifecycle()
+        self.assertNotIn(self.deposit_address_1, store)
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        new_transaction = dict(
+            old_transaction,
+            timestamp=now.strftime("%Y-%m-%dT%H:%M:%S.")
+            + f"{now.microsecond // 1000:03d}Z",
+        )
+        mock_get.return_value = self._get_mock_response(
+            [old_transaction, new_transaction]
+        )
+        self.mixer.manage_account_lifecycle()
+        self.assertEqual(store[self.deposit_address_1].state, ACCOUNT_STATE_ACTIVE)
+        self.assertIn(self.deposit_address_1, self.mixer.polling_scheduler)
+        self.assertEqual(store.get_paying_account("a1"), self.deposit_address_1)
+
+    def test_feed_is_not_read_without_archived_accounts(self, mock_get, mock_post):
+        self.mixer.manage_account_lifecycle()
+        mock_get.assert_not_called()
+
+    def test_idle_account_with_late_deposit_is_not_archived(self, mock_get, mock_post):
+        store = self.mixer.deposit_address_store
+        store[self.deposit_address_1].state = ACCOUNT_STATE_IDLE
+        store[self.deposit_address_1].state_since = 0
+        mock_get.return_value = self._get_mock_response(
+            self._get_address_info(None, self.deposit_address_1)
+        )
+        self.mixer.manage_account_lifecycle(
+            now=self.mixer.archive_ttl, check_feed=False
+        )
+        self.assertEqual(store[self.deposit_address_1].state, ACCOUNT_STATE_ACTIVE)
+        self.assertEqual(
+            store[self.deposit_address_1].total_amount, to_units(self.mock_amount)
         )
 
     def _get_mock_response(self, response_json=None, raise_for_status=None):
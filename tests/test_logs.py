@@ -0,0 +1,64 @@
+import logging
+import os
+import queue
+import tempfile
+from unittest import TestCase
+
+from jobcoin.constants import LOG_MODE_QUEUED, LOG_MODE_SYNC
+from jobcoin.logs import DeferredQueueHandler, RateLimitFilter, configure_logging
+
+
+class TestLogs(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "mixer.log")
+        self.logger = logging.getLogger(f"tests.{self.id()}")
+        self.logger.propagate = False
+
+    def tearDown(self):
+        for handler in self.logger.handlers:
+            handler.close()
+        self.directory.cleanup()
+
+    def _read_log(self):
+        with open(self.path) as log_file:
+            return log_file.read()
+
+    def test_queued_mode_writes_from_the_listener(self):
+        listener = configure_logging(self.logger, self.path, LOG_MODE_QUEUED)
+        self.assertIsInstance(self.logger.handlers[0], DeferredQueueHandler)
+        self.logger.info("Transfered %s to %s.", 2.5, "a1")
+        listener.stop()
+        self.assertIn("Transfered 2.5 to a1.", self._read_log())
+
+    def test_sync_mode(self):
+        self.assertIsNone(configure_logging(self.logger, self.path, LOG_MODE_SYNC))
+        self.logger.info("Transfered %s to %s.", 2.5, "a1")
+        self.assertIn("Transfered 2.5 to a1.", self._read_log())
+
+    def test_queue_handler_defers_formatting_and_never_blocks(self):
+        handler = DeferredQueueHandler(queue.Queue(1))
+        self.logger.addHandler(handler)
+        self.logger.info("Transfered %s.", 1)
+        self.logger.info("Transfered %s.", 2)
+        record = handler.queue.get_nowait()
+        self.assertEqual(record.msg, "Transfered %s.")
+        self.assertEqual(record.getMessage(), "Transfered 1.")
+        self.assertEqual(handler.dropped, 1)
+
+
+class TestRateLimitFilter(TestCase):
+    def test_rate_limit(self):
+        now = [0.0]
+        log_filter = RateLimitFilter(2, clock=lambda: now[0])
+
+        def record(message):
+            return logging.LogRecord("t", logging.INFO, "", 0, message, (), None)
+
+        results = [log_filter.filter(record("line")) for _ in range(4)]
+        self.assertEqual(results, [True, True, False, False])
+
+        now[0] += 1
+        passed = record("line")
+        self.assertTrue(log_filter.filter(passed))
+        self.assertEqual(passed.getMessage(), "line (2 similar lines suppressed)")
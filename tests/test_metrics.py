@@ -0,0 +1,91 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import requests
+from jobcoin.api_client import ApiClient
+from jobcoin.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter(self):
+        counter = Counter("errors_total", "Errors.", registry=self.registry)
+        counter.inc(endpoint="addresses")
+        counter.inc(2, endpoint="addresses")
+        self.assertEqual(counter.get(endpoint="addresses"), 3)
+        self.assertEqual(
+            self.registry.render(),
+            "# HELP errors_total Errors.\n"
+            "# TYPE errors_total counter\n"
+            'errors_total{endpoint="addresses"} 3\n',
+        )
+
+    def test_gauge_function(self):
+        gauge = Gauge("accounts", "Accounts.", registry=self.registry)
+        gauge.set_function(lambda: 7)
+        self.assertIn("accounts 7\n", self.registry.render())
+
+    def test_histogram(self):
+        histogram = Histogram(
+            "duration_seconds", "Duration.", buckets=(1, 5), registry=self.registry
+        )
+        histogram.observe(0.5, task="poll")
+        histogram.observe(3, task="poll")
+        histogram.observe(10, task="poll")
+        self.assertEqual(histogram.get_count(task="poll"), 3)
+        rendered = self.registry.render()
+        self.assertIn('duration_seconds_bucket{task="poll",le="1"} 1\n', rendered)
+        self.assertIn('duration_seconds_bucket{task="poll",le="5"} 2\n', rendered)
+        self.assertIn('duration_seconds_bucket{task="poll",le="+Inf"} 3\n', rendered)
+        self.assertIn('duration_seconds_sum{task="poll"} 13.5\n', rendered)
+        self.assertIn('duration_seconds_count{task="poll"} 3\n', rendered)
+
+    def test_render_adds_values_collected_elsewhere(self):
+        counter = Counter("errors_total", "Errors.", registry=self.registry)
+        histogram = Histogram(
+            "duration_seconds", "Duration.", buckets=(1,), registry=self.registry
+        )
+        gauge = Gauge("accounts", "Accounts.", registry=self.registry)
+        counter.inc(endpoint="addresses")
+        histogram.observe(0.5, task="poll")
+        gauge.set(2)
+        other = MetricsRegistry()
+        Counter("errors_total", "Errors.", registry=other).inc(4, endpoint="addresses")
+        Histogram(
+            "duration_seconds", "Duration.", buckets=(1,), registry=other
+        ).observe(3, task="poll")
+        Gauge("accounts", "Accounts.", registry=other).set(5)
+
+        rendered = self.registry.render([other.collect()])
+        self.assertIn('errors_total{endpoint="addresses"} 5\n', rendered)
+        self.assertIn('duration_seconds_bucket{task="poll",le="1"} 1\n', rendered)
+        self.assertIn('duration_seconds_count{task="poll"} 2\n', rendered)
+        self.assertIn('duration_seconds_sum{task="poll"} 3.5\n', rendered)
+        self.assertIn("accounts 2\n", rendered)
+        self.assertEqual(counter.get(endpoint="addresses"), 1)
+
+
+@patch("jobcoin.api_client.requests.Session.get")
+class TestApiClientMetrics(TestCase):
+    @patch("jobcoin.api_client.api_request_errors_total")
+    @patch("jobcoin.api_client.api_request_duration_seconds")
+    def test_requests_are_measured_by_endpoint(
+        self, mock_duration, mock_errors, mock_get
+    ):
+        client = ApiClient(base_url="http://jobcoin", retries=0)
+        mock_get.return_value = MagicMock(ok=False, status_code=404)
+        client.get_address_info("a1")
+        mock_get.side_effect = requests.ConnectionError()
+        with self.assertRaises(requests.ConnectionError):
+            client.get_transactions()
+
+        self.assertEqual(
+            [call.kwargs for call in mock_duration.observe.call_args_list],
+            [
+                {"method": "GET", "endpoint": "addresses"},
+                {"method": "GET", "endpoint": "transactions"},
+            ],
+        )
+        self.assertEqual(mock_errors.inc.call_count, 2)
@@ -0,0 +1,96 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from jobcoin.account import Account
+from jobcoin.amounts import to_units
+from jobcoin.constants import WITHDRAWAL_INCREMENT
+from jobcoin.jobcoin_mixer import JobCoinMixer
+from jobcoin.planner import PayoutPlanner
+
+
+class TestPayoutPlanner(TestCase):
+    def setUp(self):
+        self.planner = PayoutPlanner(
+            target_drain_sec=100, max_transfers_per_sec=10, interval=5
+        )
+
+    def test_small_balance_pays_one_increment(self):
+        account = Account(withdrawal_addresses=["a1", "a2"], total_amount=to_units(10))
+        self.assertEqual(
+            self.planner.plan([("d1", account)], now=0),
+            {"d1": [to_units(WITHDRAWAL_INCREMENT)]},
+        )
+
+    def test_large_balance_drains_by_the_deadline(self):
+        account = Account(
+            withdrawal_addresses=["a1", "a2", "a3"], total_amount=to_units(9000)
+        )
+        # 20 ticks to the deadline, so 450 this tick over the three addresses.
+        self.assertEqual(
+            self.planner.plan([("d1", account)], now=0), {"d1": [to_units(150)] * 3}
+        )
+
+        account.total_amount = to_units(900)
+        self.assertEqual(
+            self.planner.plan([("d1", account)], now=95), {"d1": [to_units(300)] * 3}
+        )
+        self.assertEqual(
+            self.planner.plan([("d1", account)], now=500), {"d1": [to_units(300)] * 3}
+        )
+
+    def test_budget_goes_to_earliest_deadlines(self):
+        accounts = [
+            (
+                "d1",
+                Account(
+                    withdrawal_addresses=["a1", "a2"], total_amount=to_units(10000)
+                ),
+            ),
+            (
+                "d2",
+                Account(
+                    withdrawal_addresses=["b1", "b2"], total_amount=to_units(10000)
+                ),
+            ),
+        ]
+        self.planner.plan([accounts[1]], now=0)
+        self.planner.max_transfers_per_sec = 0.6
+        self.assertEqual(
+            {
+                deposit_address: len(amounts)
+                for deposit_address, amounts in self.planner.plan(
+                    accounts, now=5
+                ).items()
+            },
+            {"d2": 2, "d1": 1},
+        )
+
+    @patch("jobcoin.api_client.requests.Session.post")
+    def test_mixer_pays_planned_payouts(self, mock_post):
+        mixer = JobCoinMixer(payout_planner=self.planner)
+        deposit_address = mixer.get_new_deposit_address(["a1", "a2"])
+        mixer.credit_deposit(deposit_address, to_units(2000), now=0)
+        mixer.distribute_deposits(now=0)
+        self.assertEqual(mock_post.call_count, 2)
+        account = mixer.deposit_address_store[deposit_address]
+        self.assertEqual(account.total_amount, to_units(1900))
+        self.assertEqual(account.withdrawal_addresses_index, 0)
+        self.assertEqual(account.withdrawal_amount, to_units(2 * WITHDRAWAL_INCREMENT))
+
+        mixer.distribute_deposits(now=1000)
+        self.assertEqual(account.total_amount, 0)
+        self.assertNotIn(deposit_address, mixer.distribution_scheduler)
+
+    @patch("jobcoin.api_client.requests.Session.post")
+    def test_large_payouts_do_not_drift(self, mock_post):
+        planner = PayoutPlanner(target_drain_sec=700, max_transfers_per_sec=10)
+        mixer = JobCoinMixer(payout_planner=planner)
+        deposit_address = mixer.get_new_deposit_address(["a1", "a2", "a3"])
+        mixer.credit_deposit(deposit_address, to_units("12747.88677301"), now=0)
+        for tick in range(200):
+            mixer.distribute_deposits(now=tick * planner.interval)
+        account = mixer.deposit_address_store[deposit_address]
+        self.assertEqual(account.total_amount, 0)
+        self.assertEqual(account.distributed_amount, to_units("12747.88677301"))
+        for payout in mock_post.call_args_list:
+            self.assertLessEqual(len(payout[1]["data"]["amount"].partition(".")[2]), 8)
@@ -0,0 +1,47 @@
+import threading
+import time
+from unittest import TestCase
+
+from jobcoin.constants import API_PRIORITY_INTERACTIVE, API_PRIORITY_POLL
+from jobcoin.rate_limiter import RateLimiter
+
+
+class TestRateLimiter(TestCase):
+    def test_burst_is_granted_immediately(self):
+        now = [0.0]
+        limiter = RateLimiter(max_rate=1, burst=3, clock=lambda: now[0])
+        for _ in range(3):
+            limiter.acquire(API_PRIORITY_POLL)
+        self.assertLess(limiter._tokens, 1)
+        now[0] += 1
+        limiter.acquire(API_PRIORITY_POLL)
+
+    def test_higher_priority_is_served_first(self):
+        limiter = RateLimiter(max_rate=20, burst=1)
+        limiter.acquire(API_PRIORITY_POLL)
+        served = []
+
+        def acquire(priority):
+            limiter.acquire(priority)
+            served.append(priority)
+
+        poll = threading.Thread(target=acquire, args=(API_PRIORITY_POLL,))
+        poll.start()
+        while not limiter._waiters:
+            time.sleep(0.001)
+        interactive = threading.Thread(target=acquire, args=(API_PRIORITY_INTERACTIVE,))
+        interactive.start()
+        poll.join()
+        interactive.join()
+        self.assertEqual(served, [API_PRIORITY_INTERACTIVE, API_PRIORITY_POLL])
+
+    def test_throttle_and_recover(self):
+        limiter = RateLimiter(max_rate=10, min_rate=2, decrease_factor=0.5, recovery=1)
+        limiter.throttle()
+        self.assertEqual(limiter.rate, 5)
+        limiter.throttle()
+        limiter.throttle()
+        self.assertEqual(limiter.rate, 2)
+        for _ in range(20):
+            limiter.recover()
+        self.assertEqual(limiter.rate, 10)
@@ -0,0 +1,31 @@
+from unittest import TestCase
+
+from jobcoin.scheduler import DueTimeScheduler
+
+
+class TestDueTimeScheduler(TestCase):
+    def setUp(self):
+        self.scheduler = DueTimeScheduler()
+
+    def test_pop_due_returns_due_keys_in_order(self):
+        self.scheduler.schedule("b", 2)
+        self.scheduler.schedule("a", 1)
+        self.scheduler.schedule("c", 3)
+        self.assertEqual(self.scheduler.pop_due(2), ["a", "b"])
+        self.assertEqual(len(self.scheduler), 1)
+        self.assertEqual(self.scheduler.pop_due(2), [])
+        self.assertEqual(self.scheduler.pop_due(3), ["c"])
+
+    def test_schedule_moves_existing_key(self):
+        self.scheduler.schedule("a", 1)
+        self.scheduler.schedule("a", 5)
+        self.assertEqual(self.scheduler.pop_due(1), [])
+        self.assertIn("a", self.scheduler)
+        self.assertEqual(self.scheduler.pop_due(5), ["a"])
+        self.assertNotIn("a", self.scheduler)
+
+    def test_unschedule(self):
+        self.scheduler.schedule("a", 1)
+        self.scheduler.unschedule("a")
+        self.assertNotIn("a", self.scheduler)
+        self.assertEqual(self.scheduler.pop_due(1), [])
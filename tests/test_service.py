@@ -0,0 +1,150 @@
+import os
+import tempfile
+from threading import Thread
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import requests
+from jobcoin.account import Account
+from jobcoin.amounts import to_units
+from jobcoin.exceptions import WithdrawalAddressInUseException
+from jobcoin.jobcoin_mixer import JobCoinMixer
+from jobcoin.service import bind_metrics, create_server
+from jobcoin.store import SQLiteAccountStore
+
+
+@patch("jobcoin.service.check_addresses_in_use")
+class TestService(TestCase):
+    def setUp(self):
+        self.mixer = JobCoinMixer()
+        self.server = create_server("127.0.0.1", 0, self.mixer)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_bulk_create_deposit_addresses(self, mock_check):
+        withdrawal_addresses_list = [[f"a{i}", f"b{i}"] for i in range(100)]
+        response = requests.post(
+            f"{self.url}/deposit_addresses",
+            json={"withdrawal_addresses": withdrawal_addresses_list},
+        )
+        self.assertEqual(response.status_code, 201)
+        deposit_addresses = response.json()["deposit_addresses"]
+        self.assertEqual(len(deposit_addresses), 100)
+        self.assertEqual(
+            self.mixer.deposit_address_store[deposit_addresses[1]].withdrawal_addresses,
+            ["a1", "b1"],
+        )
+        mock_check.assert_called_once()
+        self.assertEqual(len(mock_check.call_args[0][0]), 200)
+
+    def test_create_deposit_addresses_in_use(self, mock_check):
+        mock_check.side_effect = WithdrawalAddressInUseException("a1")
+        response = requests.post(
+            f"{self.url}/deposit_addresses",
+            json={"withdrawal_addresses": [["a1"], ["a2"]]},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("a1", response.json()["error"])
+        self.assertEqual(len(self.mixer.deposit_address_store), 0)
+
+    def test_create_deposit_addresses_already_paid(self, mock_check):
+        self.mixer.get_new_deposit_address(["a1"])
+        response = requests.post(
+            f"{self.url}/deposit_addresses",
+            json={"withdrawal_addresses": [["a2", "a1"]]},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("a1", response.json()["error"])
+        self.assertEqual(len(self.mixer.deposit_address_store), 1)
+        mock_check.assert_not_called()
+
+    def test_create_deposit_addresses_bad_request(self, mock_check):
+        for body in [
+            {},
+            {"withdrawal_addresses": ["a1"]},
+            {"withdrawal_addresses": [[]]},
+        ]:
+            response = requests.post(f"{self.url}/deposit_addresses", json=body)
+            self.assertEqual(response.status_code, 400)
+        mock_check.assert_not_called()
+
+    def test_status(self, mock_check):
+        deposit_address = self.mixer.get_new_deposit_address(["a1"])
+        self.mixer.deposit_address_store[deposit_address].total_amount = to_units("7.5")
+        self.mixer.deposit_address_store[deposit_address].distributed_amount = to_units(
+            "2.5"
+        )
+
+        response = requests.get(f"{self.url}/deposit_addresses/{deposit_address}")
+        self.assertEqual(
+            response.json(),
+            {
+                "deposit_address": deposit_address,
+                "withdrawal_addresses": ["a1"],
+                "balance": 7.5,
+                "distributed": 2.5,
+                "state": "active",
+            },
+        )
+
+        status = requests.get(f"{self.url}/status").json()
+        self.assertEqual(status["total_balance"], 7.5)
+        self.assertEqual(status["total_distributed"], 2.5)
+        self.assertEqual(len(status["accounts"]), 1)
+
+    def test_unknown_deposit_address(self, mock_check):
+        response = requests.get(f"{self.url}/deposit_addresses/nope")
+        self.assertEqual(response.status_code, 404)
+
+    def test_metrics(self, mock_check):
+        bind_metrics(self.mixer)
+        self.mixer.get_new_deposit_address(["a1"])
+        response = requests.get(f"{self.url}/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("jobcoin_live_accounts 1\n", response.text)
+        self.assertIn("# TYPE jobcoin_task_duration_seconds histogram", response.text)
+
+
+class TestWorkerModeMetrics(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(self.directory.name, "accounts.db")
+        self.worker_store = SQLiteAccountStore(path)
+        self.mixer = JobCoinMixer(store=SQLiteAccountStore(path), shards=())
+        self.worker_pool = MagicMock()
+        self.server = create_server(
+            "127.0.0.1", 0, self.mixer, worker_pool=self.worker_pool
+        )
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.mixer.deposit_address_store.close()
+        self.worker_store.close()
+        self.directory.cleanup()
+
+    def test_metrics_include_workers_and_current_balances(self):
+        bind_metrics(self.mixer)
+        self.worker_store["d1"] = Account(withdrawal_addresses=["a1"])
+        self.worker_store.commit()
+        self.mixer.reload_unowned_accounts()
+        self.worker_store["d1"].total_amount = to_units("7.5")
+        self.worker_store.save("d1")
+        self.worker_store.commit()
+        key = (("task", "worker_task"),)
+        self.worker_pool.collect_metrics.return_value = [
+            {"jobcoin_task_overruns_total": {key: 2}},
+            {"jobcoin_task_overruns_total": {key: 3}},
+        ]
+
+        response = requests.get(f"{self.url}/metrics")
+        self.assertIn("jobcoin_undistributed_balance 7.5\n", response.text)
+        self.assertIn(
+            'jobcoin_task_overruns_total{task="worker_task"} 5\n', response.text
+        )
@@ -0,0 +1,56 @@
+from unittest import TestCase
+
+from jobcoin.sharding import HashRing, ShardCoordinator, get_shard
+
+
+class TestHashRing(TestCase):
+    def test_get_node_is_stable(self):
+        ring = HashRing(["w1", "w2", "w3"])
+        other = HashRing(["w3", "w1", "w2"])
+        for i in range(100):
+            self.assertEqual(ring.get_node(f"k{i}"), other.get_node(f"k{i}"))
+
+    def test_removing_a_node_only_moves_its_keys(self):
+        ring = HashRing(["w1", "w2", "w3"])
+        before = {f"k{i}": ring.get_node(f"k{i}") for i in range(1000)}
+        ring.remove("w2")
+        self.assertEqual(len(ring), 2)
+        for key, node in before.items():
+            if node != "w2":
+                self.assertEqual(ring.get_node(key), node)
+            else:
+                self.assertIn(ring.get_node(key), ("w1", "w3"))
+
+    def test_empty_ring(self):
+        self.assertIsNone(HashRing().get_node("k"))
+
+
+class TestShardCoordinator(TestCase):
+    def test_get_shard(self):
+        self.assertEqual(get_shard("d1", 16), get_shard("d1", 16))
+        self.assertTrue(0 <= get_shard("d1", 16) < 16)
+
+    def test_join_assigns_every_shard_once(self):
+        coordinator = ShardCoordinator(shard_count=64)
+        old_assignment, new_assignment = coordinator.join("w1")
+        self.assertEqual(old_assignment, {})
+        self.assertEqual(new_assignment, {"w1": set(range(64))})
+
+        coordinator.join("w2")
+        _, assignment = coordinator.join("w3")
+        shards = [shard for owned in assignment.values() for shard in owned]
+        self.assertEqual(sorted(shards), list(range(64)))
+        self.assertTrue(all(assignment.values()))
+
+    def test_join_and_leave_move_few_shards(self):
+        coordinator = ShardCoordinator(shard_count=256)
+        coordinator.join("w1")
+        coordinator.join("w2")
+        old_assignment, new_assignment = coordinator.join("w3")
+        for worker_id in ("w1", "w2"):
+            self.assertTrue(new_assignment[worker_id] <= old_assignment[worker_id])
+
+        old_assignment, new_assignment = coordinator.leave("w1")
+        self.assertNotIn("w1", new_assignment)
+        for worker_id in ("w2", "w3"):
+            self.assertTrue(old_assignment[worker_id] <= new_assignment[worker_id])
@@ -0,0 +1,343 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from jobcoin.account import Account
+from jobcoin.amounts import to_units
+from jobcoin.jobcoin_mixer import JobCoinMixer
+from jobcoin.store import AccountStore, SQLiteAccountStore
+from jobcoin.sweeper import Sweep
+
+
+class TestSQLiteAccountStore(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "accounts.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_accounts_survive_reopen(self):
+        store = SQLiteAccountStore(self.path)
+        store["d1"] = Account(withdrawal_addresses=["a1", "a2"])
+        store.commit()
+        store["d1"].total_amount = to_units("12.5")
+        store["d1"].withdrawal_addresses_index = 1
+        store.save("d1")
+        store.close()
+
+        reopened = SQLiteAccountStore(self.path, load_batch_size=1)
+        self.assertEqual(
+            reopened["d1"],
+            Account(
+                withdrawal_addresses=["a1", "a2"],
+                total_amount=to_units("12.5"),
+                withdrawal_addresses_index=1,
+            ),
+        )
+        reopened.close()
+
+    def test_amounts_stored_as_jobcoins_are_read_as_units(self):
+        SQLiteAccountStore(self.path).close()
+        connection = sqlite3.connect(self.path)
+        with connection:
+            connection.execute(
+                "INSERT INTO accounts (deposit_address, account) VALUES (?, ?)",
+                (
+                    "d1",
+                    json.dumps(
+                        {
+                            "withdrawal_addresses": ["a1"],
+                            "total_amount": 12.5,
+                            "withdrawal_amount": 5.0,
+                            "distributed_amount": 0,
+                        }
+                    ),
+                ),
+            )
+        connection.close()
+
+        store = SQLiteAccountStore(self.path)
+        self.assertEqual(store["d1"].total_amount, to_units("12.5"))
+        self.assertEqual(store["d1"].withdrawal_amount, to_units("5"))
+        self.assertEqual(store["d1"].distributed_amount, 0)
+        store.close()
+
+    def test_uncommitted_changes_are_not_written(self):
+        store = SQLiteAccountStore(self.path)
+        store["d1"] = Account(withdrawal_addresses=["a1"])
+        store.commit()
+        store["d1"].total_amount = 10
+        store.save("d1")
+
+        reopened = SQLiteAccountStore(self.path)
+        self.assertEqual(reopened["d1"].total_amount, 0)
+        reopened.close()
+        store.close()
+
+    def test_commit_writes_all_changes_in_one_batch(self):
+        store = SQLiteAccountStore(self.path)
+        store._connection = MagicMock()
+        store["d1"] = Account(withdrawal_addresses=["a1"])
+        store["d2"] = Account(withdrawal_addresses=["b1"])
+        store.commit()
+        store._connection.executemany.assert_called_once()
+        self.assertEqual(len(store._connection.executemany.call_args[0][1]), 2)
+
+        store._connection.reset_mock()
+        store.commit()
+        store._connection.executemany.assert_not_called()
+
+    def test_commit_skips_accounts_archived_after_save(self):
+        store = SQLiteAccountStore(self.path)
+        store["d1"] = Account(withdrawal_addresses=["a1"])
+        store["d2"] = Account(withdrawal_addresses=["b1"])
+        store.commit()
+        store["d2"].total_amount = 5
+        store.save("d2")
+        store.archive("d1")
+        store.save("d1")
+        store.commit()
+        store.close()
+
+        reopened = SQLiteAccountStore(self.path)
+        self.assertEqual(list(reopened), ["d2"])
+        self.assertEqual(reopened["d2"].total_amount, 5)
+        self.assertEqual(reopened.get_archived_addresses(["d1"]), ["d1"])
+        reopened.close()
+
+    def test_save_does_not_wait_for_commit(self):
+        store = SQLiteAccountStore(self.path)
+        store["d1"] = Account(withdrawal_addresses=["a1"])
+        store["d2"] = Account(withdrawal_addresses=["b1"])
+        store.commit()
+        writing = threading.Event()
+        release = threading.Event()
+        connection = store._connection
+        store._connection = MagicMock()
+
+        def executemany(*args):
+            writing.set()
+            release.wait(5)
+
+        store._connection.executemany.side_effect = executemany
+        store.save("d1")
+        committer = threading.Thread(target=store.commit)
+        committer.start()
+        self.assertTrue(writing.wait(5))
+
+        saver = threading.Thread(
+            target=lambda: [store.save("d2"), store.add_sweep(Sweep("d2", 1, 5))]
+        )
+        saver.start()
+        saver.join(5)
+        self.assertFalse(saver.is_alive())
+        release.set()
+        committer.join(5)
+
+        store._connection = connection
+        store.commit()
+        self.assertEqual(
+            [
+                (sweep.deposit_address, sweep.sequence, sweep.amount)
+                for sweep in store.get_pending_sweeps()
+            ],
+            [("d2", 1, 5)],
+        )
+        reopened = SQLiteAccountStore(self.path)
+        self.assertEqual(len(reopened.get_pending_sweeps()), 1)
+        reopened.close()
+        store.close()
+
+
+class TestAccountStore(TestCase):
+    def test_snapshot_is_copied_only_after_inserts(self):
+        store = AccountStore()
+        store["d1"] = Account(withdrawal_addresses=["a1"])
+        snapshot = store.snapshot()
+        self.assertIs(store.snapshot(), snapshot)
+
+        store["d2"] = Account(withdrawal_addresses=["b1"])
+        self.assertEqual([address for address, _ in snapshot], ["d1"])
+        self.assertEqual([address for address, _ in store.snapshot()], ["d1", "d2"])
+
+    def test_concurrent_credits_and_payouts_are_not_lost(self):
+        mixer = JobCoinMixer()
+        mixer.deposit_address_store["d1"] = Account(
+            withdrawal_addresses=["a1"], total_amount=1000
+        )
+        account = mixer.deposit_address_store["d1"]
+
+        def credit():
+            for _ in range(1000):
+                mixer.credit_deposit("d1", 1, now=0)
+
+        def pay_out():
+            for _ in range(1000):
+                mixer._apply_payout("d1", account, 1)
+
+        threads = [threading.Thread(target=credit), threading.Thread(target=pay_out)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(account.total_amount, 1000)
+        self.assertEqual(account.distributed_amount, 1000)
+
+    def test_paying_account_index_follows_accounts(self):
+        store = AccountStore()
+        store["d1"] = Account(withdrawal_addresses=["a1", "a2"])
+        store._update([("d2", Account(withdrawal_addresses=["b1"]))])
+        self.assertEqual(store.get_paying_account("a2"), "d1")
+        self.assertEqual(store.get_paying_account("b1"), "d2")
+        self.assertEqual(store.get_paid_addresses(["a1", "c1", "b1"]), ["a1", "b1"])
+
+        store["d1"] = Account(withdrawal_addresses=["a3"])
+        self.assertIsNone(store.get_paying_account("a1"))
+        self.assertEqual(store.get_paying_account("a3"), "d1")
+        del store["d2"]
+        self.assertEqual(store.get_paid_addresses(["b1", "a3"]), ["a3"])
+
+
+class RecordingAccountStore(AccountStore):
+    def __init__(self):
+        super().__init__()
+        self.saved = []
+        self.commits = 0
+
+    def save(self, deposit_address):
+        self.saved.append(deposit_address)
+
+    def commit(self):
+        self.commits += 1
+
+
+class TestMixerStore(TestCase):
+    @patch("jobcoin.api_client.requests.Session.post")
+    def test_distribute_deposits_commits_once(self, mock_post):
+        store = RecordingAccountStore()
+        store["d1"] = Account(withdrawal_addresses=["a1"], total_amount=to_units(5))
+        store["d2"] = Account(withdrawal_addresses=["b1"], total_amount=to_units(5))
+        mixer = JobCoinMixer(store=store)
+        mixer.distribute_deposits()
+        self.assertEqual(store.saved, ["d1", "d2"])
+        self.assertEqual(store.commits, 1)
+
+
+class TestSharedSQLiteAccountStore(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "accounts.db")
+        self.writer = SQLiteAccountStore(self.path)
+        self.reader = SQLiteAccountStore(self.path)
+
+    def tearDown(self):
+        self.writer.close()
+        self.reader.close()
+        self.directory.cleanup()
+
+    def test_refresh_loads_accounts_added_elsewhere(self):
+        self.writer["d1"] = Account(withdrawal_addresses=["a1"])
+        self.writer.commit()
+        self.assertEqual(self.reader.refresh(), ["d1"])
+        self.assertEqual(self.reader.refresh(), [])
+
+        # Updates to accounts already in memory are left to reload().
+        self.writer["d1"].total_amount = 5
+        self.writer.save("d1")
+        self.writer.commit()
+        self.assertEqual(self.reader.refresh(), [])
+        self.assertEqual(self.reader["d1"].total_amount, 0)
+
+    def test_reload(self):
+        self.writer["d1"] = Account(withdrawal_addresses=["a1"])
+        self.writer["d2"] = Account(withdrawal_addresses=["b1"])
+        self.writer.commit()
+        self.reader.reload(["d1"])
+        self.assertEqual(list(self.reader), ["d1"])
+        # d2 was not read, so refresh still picks it up.
+        self.assertEqual(self.reader.refresh(), ["d2"])
+
+        self.writer["d1"].total_amount = 5
+        self.writer.save("d1")
+        self.writer.commit()
+        self.reader.reload()
+        self.assertEqual(self.reader["d1"].total_amount, 5)
+
+    def test_archived_accounts_are_not_loaded(self):
+        self.writer["d1"] = Account(withdrawal_addresses=["a1"])
+        self.writer["d2"] = Account(withdrawal_addresses=["b1"])
+        self.writer.commit()
+        self.reader.refresh()
+        self.writer.archive("d1")
+        self.writer.commit()
+
+        reopened = SQLiteAccountStore(self.path)
+        self.assertEqual(list(reopened), ["d2"])
+        self.assertEqual(reopened.get_archived_addresses(["d1", "d2", "x"]), ["d1"])
+        self.assertEqual(reopened.get_archived("d1").withdrawal_addresses, ["a1"])
+        self.reader.reload(["d1", "d2"])
+        self.assertEqual(list(self.reader), ["d2"])
+
+        reopened.unarchive("d1").total_amount = 5
+        reopened.commit()
+        self.assertEqual(reopened.get_archived_addresses(["d1"]), [])
+        self.assertEqual(self.reader.refresh(), ["d1"])
+        self.assertEqual(self.reader["d1"].total_amount, 5)
+        reopened.close()
+
+    def test_archived_accounts_keep_their_withdrawal_addresses(self):
+        self.writer["d1"] = Account(withdrawal_addresses=["a1", "a2"])
+        self.writer.commit()
+        self.reader.refresh()
+        self.writer.archive("d1")
+        self.assertEqual(self.writer.get_paying_account("a1"), "d1")
+        self.writer.commit()
+
+        self.reader.refresh()
+        self.assertNotIn("d1", self.reader)
+        self.assertEqual(self.reader.get_archived_addresses(), ["d1"])
+        self.assertEqual(
+            self.reader.get_paid_addresses(["a1", "a2", "x"]), ["a1", "a2"]
+        )
+        reopened = SQLiteAccountStore(self.path)
+        self.assertNotIn("d1", reopened)
+        self.assertEqual(reopened.get_paying_account("a2"), "d1")
+        self.assertEqual(reopened.get_archived_addresses(), ["d1"])
+        reopened.unarchive("d1")
+        self.assertEqual(reopened.get_archived_addresses(), [])
+        self.assertEqual(reopened.get_paying_account("a2"), "d1")
+        del reopened["d1"]
+        self.assertIsNone(reopened.get_paying_account("a2"))
+        reopened.close()
+
+    def test_sweeps_are_journaled_with_the_accounts(self):
+        self.writer["d1"] = Account(withdrawal_addresses=["a1"])
+        self.writer.add_sweep(Sweep("d1", 1, 500))
+        self.writer.add_sweep(Sweep("d1", 2, 700))
+        self.assertEqual(self.reader.get_pending_sweeps(), [])
+        self.writer.commit()
+
+        self.assertEqual(
+            [(s.key, s.amount) for s in self.reader.get_pending_sweeps()],
+            [(("d1", 1), 500), (("d1", 2), 700)],
+        )
+        self.writer.complete_sweep(Sweep("d1", 1, 500))
+        self.assertEqual(len(self.writer.get_pending_sweeps()), 1)
+        self.writer.commit()
+        self.assertEqual([s.key for s in self.reader.get_pending_sweeps()], [("d1", 2)])
+
+        self.writer.add_sweep(Sweep("d1", 3, 900))
+        self.writer.fail_sweep(Sweep("d1", 2, 700))
+        self.writer.fail_sweep(Sweep("d1", 3, 900))
+        self.assertEqual(self.writer.get_pending_sweeps(), [])
+        self.writer.commit()
+        self.assertEqual(self.reader.get_pending_sweeps(), [])
+        self.assertEqual(
+            sorted((s.key, s.amount) for s in self.reader.get_failed_sweeps()),
+            [(("d1", 2), 700), (("d1", 3), 900)],
+        )
@@ -0,0 +1,203 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import requests
+from jobcoin.account import Account
+from jobcoin.constants import AMOUNT_SCALE, API_PRIORITY_SWEEP, HOUSE_ADDRESS
+from jobcoin.jobcoin_mixer import JobCoinMixer
+from jobcoin.sweeper import Sweep, Sweeper
+from jobcoin.transactions import Transaction
+
+
+class TestSweeper(TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.mixer = JobCoinMixer(client=self.client)
+        self.mixer.deposit_address_store["d1"] = Account(withdrawal_addresses=["a1"])
+        self.sleeps = []
+        self.sweeper = Sweeper(
+            self.mixer, concurrency=1, queue_size=2, sleep=self.sleeps.append
+        )
+        self.mixer.sweeper = self.sweeper
+        self.account = self.mixer.deposit_address_store["d1"]
+
+    def _deposit(self, amount, timestamp=1):
+        return Transaction(timestamp, "u1", "d1", amount * AMOUNT_SCALE)
+
+    def _set_sent(self, *amounts):
+        # Outgoing transfers from d1 the API knows about.
+        self.client.get_address_info.return_value.json.return_value = {
+            "balance": "0",
+            "transactions": [
+                {"fromAddress": "d1", "toAddress": HOUSE_ADDRESS, "amount": str(amount)}
+                for amount in amounts
+            ],
+        }
+
+    def _failed_response(self, status_code):
+        failed = MagicMock()
+        failed.raise_for_status.side_effect = requests.exceptions.HTTPError(
+            response=MagicMock(status_code=status_code, text="error")
+        )
+        return failed
+
+    def _drain(self):
+        sweep_queue = self.sweeper.queues[0]
+        while not sweep_queue.empty():
+            self.sweeper.process(sweep_queue.get_nowait())
+
+    def test_polling_does_not_wait_for_the_transfer(self):
+        self.assertTrue(self.mixer._process_new_transactions("d1", [self._deposit(5)]))
+        self.client.send_jobcoins.assert_not_called()
+        self.assertEqual(self.account.sweep_sequence, 1)
+        self.assertIsNotNone(self.account.last_transaction_key)
+        self.assertEqual(len(self.mixer.deposit_address_store.get_pending_sweeps()), 1)
+
+        self._drain()
+        self.client.send_jobcoins.assert_called_once_with(
+            "d1", HOUSE_ADDRESS, "5", API_PRIORITY_SWEEP
+        )
+        self.assertEqual(self.account.total_amount, 5 * AMOUNT_SCALE)
+        self.assertEqual(self.account.credited_sweep_sequence, 1)
+        self.assertEqual(self.mixer.deposit_address_store.get_pending_sweeps(), [])
+
+    def test_full_queue_defers_the_deposit(self):
+        self.assertTrue(self.sweeper.submit("d1", AMOUNT_SCALE))
+        self.assertTrue(self.sweeper.submit("d1", AMOUNT_SCALE))
+        self.assertFalse(self.mixer._process_new_transactions("d1", [self._deposit(1)]))
+        self.assertEqual(self.account.sweep_sequence, 2)
+        self.assertIsNone(self.account.last_transaction_key)
+
+    def test_failed_transfer_is_retried_until_it_succeeds(self):
+        self.client.send_jobcoins.side_effect = [
+            self._failed_response(503),
+            MagicMock(),
+        ]
+        self._set_sent()
+        self.sweeper.submit("d1", 5 * AMOUNT_SCALE)
+        self._drain()
+        self.assertEqual(self.client.send_jobcoins.call_count, 2)
+        self.assertEqual(len(self.sleeps), 1)
+        self.assertEqual(self.account.total_amount, 5 * AMOUNT_SCALE)
+
+    def test_rejected_transfer_is_not_credited(self):
+        self.client.send_jobcoins.side_effect = [
+            self._failed_response(422),
+            self._failed_response(422),
+        ]
+        self.sweeper.submit("d1", 5 * AMOUNT_SCALE)
+        sweep = self.sweeper.queues[0].get_nowait()
+        self.assertFalse(self.sweeper._send(sweep))
+        self.assertFalse(self.sweeper._send(sweep))
+        self.client.get_address_info.assert_not_called()
+        self.assertEqual(self.account.total_amount, 0)
+        self.assertEqual(self.client.send_jobcoins.call_count, 2)
+
+    def test_sweep_is_given_up_after_max_attempts(self):
+        self.sweeper.max_attempts = 3
+        self.client.send_jobcoins.side_effect = [
+            self._failed_response(422),
+            self._failed_response(422),
+            self._failed_response(422),
+            MagicMock(),
+        ]
+        self.sweeper.submit("d1", 5 * AMOUNT_SCALE)
+        self.sweeper.submit("d1", 2 * AMOUNT_SCALE)
+        with self.assertLogs(level="ERROR"):
+            self._drain()
+        self.assertEqual(self.client.send_jobcoins.call_count, 4)
+        self.assertEqual(self.account.total_amount, 2 * AMOUNT_SCALE)
+        store = self.mixer.deposit_address_store
+        self.assertEqual(store.get_pending_sweeps(), [])
+        self.assertEqual(
+            [sweep.key for sweep in store.get_failed_sweeps()], [("d1", 1)]
+        )
+
+    def test_join_times_out(self):
+        self.sweeper.submit("d1", 5 * AMOUNT_SCALE)
+        self.assertFalse(self.sweeper.join(timeout=0.01))
+
+    def test_sent_transfer_is_not_resent_after_a_new_deposit(self):
+        # The first sweep of 5 timed out but went through; a later deposit
+        # of 5 leaves the balance covering the sweep again.
+        self.client.send_jobcoins.side_effect = [requests.exceptions.Timeout()]
+        self.sweeper.submit("d1", 5 * AMOUNT_SCALE)
+        self._set_sent(5)
+        self._drain()
+        self.assertEqual(self.client.send_jobcoins.call_count, 1)
+        self.assertEqual(self.account.total_amount, 5 * AMOUNT_SCALE)
+
+    def test_sweep_thread_survives_unexpected_errors(self):
+        self.sweeper.submit("d1", 5 * AMOUNT_SCALE)
+        sweep = self.sweeper.queues[0].get_nowait()
+        with patch.object(
+            self.sweeper, "process", side_effect=[RuntimeError("boom"), None]
+        ) as mock_process:
+            self.sweeper._process_until_done(sweep)
+        self.assertEqual(mock_process.call_count, 2)
+        self.assertEqual(len(self.sleeps), 1)
+
+        self.sweeper.max_attempts = 2
+        with patch.object(
+            self.sweeper, "process", side_effect=RuntimeError("boom")
+        ) as mock_process, self.assertLogs(level="ERROR"):
+            self.sweeper._process_until_done(sweep)
+        self.assertEqual(mock_process.call_count, 2)
+        self.assertEqual(
+            [s.key for s in self.mixer.deposit_address_store.get_failed_sweeps()],
+            [("d1", 1)],
+        )
+
+    def test_replayed_sweep_is_not_sent_twice(self):
+        store = self.mixer.deposit_address_store
+        store.add_sweep(Sweep("d1", 1, 5 * AMOUNT_SCALE))
+        self.account.sweep_sequence = 1
+        # The transfer went through before the crash.
+        self._set_sent(5)
+        self.sweeper.replay()
+        self._drain()
+        self.client.send_jobcoins.assert_not_called()
+        self.assertEqual(self.account.total_amount, 5 * AMOUNT_SCALE)
+
+        store.add_sweep(Sweep("d1", 2, 5 * AMOUNT_SCALE))
+        self.account.sweep_sequence = 2
+        # It did not.
+        self._set_sent(5)
+        self.sweeper.replay()
+        self._drain()
+        self.client.send_jobcoins.assert_called_once_with(
+            "d1", HOUSE_ADDRESS, "5", API_PRIORITY_SWEEP
+        )
+        self.assertEqual(self.account.total_amount, 10 * AMOUNT_SCALE)
+
+    def test_inline_sweep_that_went_through_is_credited(self):
+        self.mixer.sweeper = None
+        self.client.send_jobcoins.side_effect = [
+            requests.exceptions.Timeout(),
+            MagicMock(),
+        ]
+        self._set_sent(5)
+        self.assertFalse(self.mixer._process_new_transactions("d1", [self._deposit(5)]))
+        self.assertEqual(self.account.total_amount, 0)
+
+        # The next poll finds the same deposit and one more.
+        self.assertTrue(
+            self.mixer._process_new_transactions(
+                "d1", [self._deposit(5), self._deposit(3, timestamp=2)]
+            )
+        )
+        self.assertEqual(self.client.send_jobcoins.call_count, 2)
+        self.assertEqual(
+            self.client.send_jobcoins.call_args[0][:3], ("d1", HOUSE_ADDRESS, "3")
+        )
+        self.assertEqual(self.account.total_amount, 8 * AMOUNT_SCALE)
+
+    def test_credited_sweep_is_only_completed(self):
+        self.account.credited_sweep_sequence = 1
+        self.mixer.deposit_address_store.add_sweep(Sweep("d1", 1, 5 * AMOUNT_SCALE))
+        self.sweeper.replay()
+        self._drain()
+        self.client.send_jobcoins.assert_not_called()
+        self.client.get_address_info.assert_not_called()
+        self.assertEqual(self.account.total_amount, 0)
+        self.assertEqual(self.mixer.deposit_address_store.get_pending_sweeps(), [])
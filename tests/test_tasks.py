@@ -0,0 +1,75 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from jobcoin.constants import (
+    DEPOSIT_DETECTION_MODE_ADDRESS,
+    DEPOSIT_DETECTION_MODE_FEED,
+    GET_NEW_DEPOSITS_FROM_FEED_INTERVAL_SEC,
+    GET_NEW_DEPOSITS_INTERVAL_SEC,
+)
+from jobcoin.metrics import task_failures_total
+from jobcoin.tasks import get_new_deposits_interval, run_at_fixed_rate
+
+
+class StopTask(Exception):
+    pass
+
+
+class TestTasks(TestCase):
+    def setUp(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def _clock(self):
+        return self.now
+
+    def _sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+        if len(self.sleeps) == 3:
+            raise StopTask()
+
+    def _run(self, durations):
+        durations = iter(durations)
+
+        def work():
+            self.now += next(durations)
+
+        with self.assertRaises(StopTask):
+            run_at_fixed_rate("task", work, 5, clock=self._clock, sleep=self._sleep)
+
+    def test_period_does_not_drift(self):
+        self._run([1, 2, 0.5])
+        self.assertEqual(self.sleeps, [4, 3, 4.5])
+
+    def test_overrun_skips_missed_runs(self):
+        self._run([12, 1, 1])
+        # The first run ends at 112 and the next slot on the grid is 115.
+        self.assertEqual(self.sleeps, [3, 4, 4])
+
+    def test_failed_run_does_not_stop_the_task(self):
+        runs = []
+
+        def work():
+            runs.append(self.now)
+            self.now += 1
+            if len(runs) == 1:
+                raise KeyError("d1")
+
+        failures = task_failures_total.get(task="failing_task")
+        with self.assertLogs(level="ERROR"), self.assertRaises(StopTask):
+            run_at_fixed_rate(
+                "failing_task", work, 5, clock=self._clock, sleep=self._sleep
+            )
+        self.assertEqual(runs, [100, 105, 110])
+        self.assertEqual(task_failures_total.get(task="failing_task"), failures + 1)
+
+    def test_feed_mode_has_its_own_interval(self):
+        with patch("jobcoin.tasks.DEPOSIT_DETECTION_MODE", DEPOSIT_DETECTION_MODE_FEED):
+            self.assertEqual(
+                get_new_deposits_interval(), GET_NEW_DEPOSITS_FROM_FEED_INTERVAL_SEC
+            )
+        with patch(
+            "jobcoin.tasks.DEPOSIT_DETECTION_MODE", DEPOSIT_DETECTION_MODE_ADDRESS
+        ):
+            self.assertEqual(get_new_deposits_interval(), GET_NEW_DEPOSITS_INTERVAL_SEC)
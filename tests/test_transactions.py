@@ -0,0 +1,78 @@
+import datetime
+from unittest import TestCase
+
+from jobcoin.amounts import to_units
+from jobcoin.transactions import (
+    Transaction,
+    datetime_to_timestamp,
+    decode_new_transactions,
+    parse_timestamp,
+)
+
+
+class TestTransactions(TestCase):
+    def test_parse_timestamp_matches_strptime(self):
+        for timestamp in [
+            "2022-10-13T03:17:31.170Z",
+            "2022-10-13T03:17:31.170+00:00",
+            "2022-10-13T03:17:31.170123Z",
+        ]:
+            expected = datetime.datetime.strptime(
+                timestamp, "%Y-%m-%dT%H:%M:%S.%f%z"
+            ).replace(tzinfo=None, microsecond=170000)
+            self.assertEqual(
+                parse_timestamp(timestamp), datetime_to_timestamp(expected)
+            )
+
+    def test_parse_timestamp_applies_utc_offset(self):
+        self.assertEqual(
+            parse_timestamp("2022-10-13T05:17:31.170+02:00"),
+            parse_timestamp("2022-10-13T03:17:31.170Z"),
+        )
+
+    def test_from_json(self):
+        transaction = Transaction.from_json(
+            {
+                "timestamp": "1970-01-01T00:00:01.500Z",
+                "toAddress": "a1",
+                "amount": "0.1",
+            }
+        )
+        self.assertEqual(transaction.timestamp, 1500)
+        self.assertIsNone(transaction.from_address)
+        self.assertEqual(transaction.amount, to_units("0.1"))
+
+    def test_decode_new_transactions_stops_at_cursor(self):
+        transactions = [
+            self._get_transaction("2022-10-13T03:17:31.170Z", "1"),
+            self._get_transaction("2022-10-13T03:17:32.000Z", "2"),
+            self._get_transaction("2022-10-13T03:17:32.000Z", "3"),
+            self._get_transaction("2022-10-13T03:17:33.000Z", "4"),
+        ]
+        cursor = Transaction.from_json(transactions[1])
+        new_transactions = decode_new_transactions(
+            transactions, cursor.timestamp, cursor.key
+        )
+        self.assertEqual(
+            [transaction.amount for transaction in new_transactions],
+            [to_units("3"), to_units("4")],
+        )
+
+    def test_decode_new_transactions_stops_before_timestamp(self):
+        transactions = [
+            self._get_transaction("2022-10-13T03:17:31.170Z", "1"),
+            self._get_transaction("2022-10-13T03:17:32.000Z", "2"),
+        ]
+        new_transactions = decode_new_transactions(
+            transactions, parse_timestamp("2022-10-13T03:17:32.000Z")
+        )
+        self.assertEqual(len(new_transactions), 1)
+        self.assertEqual(len(decode_new_transactions(transactions)), 2)
+
+    def _get_transaction(self, timestamp, amount):
+        return {
+            "timestamp": timestamp,
+            "fromAddress": "a1",
+            "toAddress": "a2",
+            "amount": amount,
+        }
@@ -2,6 +2,7 @@ from unittest import TestCase
 from unittest.mock import MagicMock, patch
 
 import requests
+from jobcoin.cache import TTLCache
 from jobcoin.exceptions import (
     CheckAddressInUseException,
     InvalidWithdrawalAddressException,
@@ -11,7 +12,13 @@ from jobcoin.utils import convert_input_to_withdrawal_addresses
 
 
 class TestUtils(TestCase):
-    @patch("jobcoin.utils.requests.get")
+    def setUp(self):
+        self.in_use_addresses = TTLCache(max_size=2, ttl=60)
+        patcher = patch("jobcoin.utils.in_use_addresses", self.in_use_addresses)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("jobcoin.api_client.requests.Session.get")
     def test_valid_input(self, mock_get):
         mock_get.return_value = self._get_mock_response(
             {
@@ -26,7 +33,7 @@ class TestUtils(TestCase):
         with self.assertRaises(InvalidWithdrawalAddressException):
             convert_input_to_withdrawal_addresses("a1,a2,")
 
-    @patch("jobcoin.utils.requests.get")
+    @patch("jobcoin.api_client.requests.Session.get")
     def test_addresses_in_use(self, mock_get):
         mock_get.return_value = self._get_mock_response(
             {
@@ -37,7 +44,7 @@ class TestUtils(TestCase):
         with self.assertRaises(WithdrawalAddressInUseException):
             convert_input_to_withdrawal_addresses("a1,a2")
 
-    @patch("jobcoin.utils.requests.get")
+    @patch("jobcoin.api_client.requests.Session.get")
     def test_request_exception(self, mock_get):
         mock_get.return_value = self._get_mock_response(
             raise_for_status=requests.HTTPError(response=MagicMock(text="blah"))
@@ -45,6 +52,22 @@ class TestUtils(TestCase):
         with self.assertRaises(CheckAddressInUseException):
             convert_input_to_withdrawal_addresses("a1,a2")
 
+    @patch("jobcoin.api_client.requests.Session.get")
+    def test_addresses_in_use_are_cached(self, mock_get):
+        mock_get.return_value = self._get_mock_response(
+            {
+                "balance": "1",
+                "transactions": ["test"],
+            }
+        )
+        with self.assertRaises(WithdrawalAddressInUseException):
+            convert_input_to_withdrawal_addresses("a1,a2")
+        self.assertEqual(mock_get.call_count, 2)
+
+        with self.assertRaises(WithdrawalAddressInUseException):
+            convert_input_to_withdrawal_addresses("a2,a3")
+        self.assertEqual(mock_get.call_count, 2)
+
     def _get_mock_response(self, response_json=None, raise_for_status=None):
         mock_response = MagicMock()
         if raise_for_status:
@@ -0,0 +1,84 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from jobcoin.account import Account
+from jobcoin.sharding import ShardCoordinator, get_shard
+from jobcoin.store import AccountStore
+from jobcoin.workers import ASSIGN_COMMAND, METRICS_COMMAND, MixerWorker, WorkerPool
+
+
+class TestWorkerPool(TestCase):
+    def setUp(self):
+        self.pool = WorkerPool("accounts.db", ShardCoordinator(shard_count=32))
+        self.commands = []
+
+    def _add_worker(self, worker_id):
+        connection = MagicMock()
+        connection.send.side_effect = lambda command: self.commands.append(
+            (worker_id, command)
+        )
+        self.pool.workers[worker_id] = (MagicMock(), connection)
+        self.pool._rebalance(*self.pool.coordinator.join(worker_id))
+
+    def test_shards_are_revoked_before_they_are_granted(self):
+        self._add_worker("w1")
+        self.assertEqual(self.commands, [("w1", (ASSIGN_COMMAND, list(range(32))))])
+
+        self.commands.clear()
+        self._add_worker("w2")
+        (revoke_worker, (_, kept)), (grant_worker, (_, granted)) = self.commands
+        self.assertEqual((revoke_worker, grant_worker), ("w1", "w2"))
+        self.assertEqual(sorted(kept + granted), list(range(32)))
+
+        _, connection = self.pool.workers["w1"]
+        self.assertEqual(connection.recv.call_count, 2)
+
+    def test_leaving_worker_shards_go_to_the_rest(self):
+        self._add_worker("w1")
+        self._add_worker("w2")
+        self.commands.clear()
+        self.pool.workers.pop("w2")
+        self.pool._rebalance(*self.pool.coordinator.leave("w2"))
+        self.assertEqual(self.commands, [("w1", (ASSIGN_COMMAND, list(range(32))))])
+
+    def test_collect_metrics_from_every_worker(self):
+        self._add_worker("w1")
+        self._add_worker("w2")
+        self.commands.clear()
+        for worker_id, (_, connection) in self.pool.workers.items():
+            connection.recv.return_value = {"errors_total": {(): worker_id}}
+        _, failed = self.pool.workers["w2"]
+        failed.recv.side_effect = EOFError()
+
+        self.assertEqual(self.pool.collect_metrics(), [{"errors_total": {(): "w1"}}])
+        self.assertEqual(
+            self.commands,
+            [("w1", (METRICS_COMMAND, None)), ("w2", (METRICS_COMMAND, None))],
+        )
+
+    def test_worker_that_does_not_answer_is_terminated(self):
+        self._add_worker("w1")
+        process, connection = self.pool.workers["w1"]
+        connection.poll.return_value = False
+        with self.assertLogs(level="INFO"):
+            self._add_worker("w2")
+        process.terminate.assert_called_once()
+        self.assertEqual(connection.recv.call_count, 1)
+
+
+class TestMixerWorker(TestCase):
+    @patch("jobcoin.api_client.requests.Session.get")
+    def test_assign_serves_owned_accounts_only(self, mock_get):
+        mock_get.return_value.json.return_value = {"transactions": []}
+        store = AccountStore()
+        store["d1"] = Account(withdrawal_addresses=["a1"])
+        store["d2"] = Account(withdrawal_addresses=["b1"])
+        worker = MixerWorker(store)
+        worker.get_new_deposits()
+        mock_get.assert_not_called()
+
+        worker.assign([get_shard("d1")])
+        self.assertTrue(worker.mixer.owns("d1"))
+        worker.get_new_deposits()
+        polled = [call[0][0].rsplit("/", 1)[1] for call in mock_get.call_args_list]
+        self.assertEqual(polled, ["d1"])